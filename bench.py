@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Synthetic-data benchmark for parse.py.
+
+Generates realistic MacroFactor XLSX exports (Quick Export, both Muscle Groups
+sheets, Workout Log with supersets, drop sets and RIR) plus a Health Connect
+SQLite DB covering 1, 3 and 10 years, then times each pipeline stage and
+records its peak traced memory.
+
+Each run also times fit_trends alone over the dataset's trend series (every
+exercise's e1RM history, weekly muscle and group sets, trend weight and TDEE),
+so the kernel's scaling with years of history is recorded next to the stages.
+
+Usage:
+  python bench.py                          # 1y / 3y / 10y, openpyxl reader
+  python bench.py --years 1 3 --reader stream --repeat 3
+  python bench.py --compare                # last two recorded commits side by side
+  python bench.py --parity --years 1 3     # build each dataset, run exercise-parity.js
+
+Datasets are generated once into .bench/ (gitignored). Every run appends one
+line per dataset to bench-results.jsonl, tagged with the current commit.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone, date as date_cls, timedelta
+from pathlib import Path
+
+import openpyxl
+
+import parse
+
+ROOT = Path(__file__).resolve().parent
+BENCH_DIR = ROOT / ".bench"
+RESULTS_PATH = ROOT / "bench-results.jsonl"
+GEN_VERSION = 1  # bump when the generator output changes
+
+DEFAULT_YEARS = (1, 3, 10)
+STAGES = ("load_all_mf_files", "load_hc_data", "build_output", "json_dump")
+
+# ── Generators ────────────────────────────────────────────────────────────────
+
+# exercise → (workout day, start kg, {muscle: fractional sets per set})
+EXERCISES = {
+    "Barbell Bench Press":          ("A",  80.0, {"Chest": 1.0, "Triceps": 0.5, "Front Delts": 0.5}),
+    "Incline Dumbbell Press":       ("A",  30.0, {"Chest": 1.0, "Front Delts": 0.5, "Triceps": 0.5}),
+    "Cable Fly":                    ("A",  15.0, {"Chest": 1.0}),
+    "Dumbbell Lateral Raise":       ("A",  10.0, {"Side Delts": 1.0}),
+    "Cable Triceps Pushdown":       ("A",  25.0, {"Triceps": 1.0}),
+    "Chest-Supported T-Bar Row":    ("B",  60.0, {"Upper Back": 1.0, "Lats": 0.5, "Rear Delts": 0.5, "Biceps": 0.5}),
+    "Lat Pulldown":                 ("B",  65.0, {"Lats": 1.0, "Biceps": 0.5, "Upper Back": 0.5}),
+    "Pull-Up (Assisted)":           ("B", -30.0, {"Lats": 1.0, "Biceps": 0.5}),
+    "Cable Curl":                   ("B",  20.0, {"Biceps": 1.0, "Forearms": 0.5}),
+    "Reverse Pec Deck Machine":     ("B",  35.0, {"Rear Delts": 1.0, "Upper Traps": 0.5}),
+    "Back Squat":                   ("C", 100.0, {"Quads": 1.0, "Glutes": 0.5, "Adductors": 0.5, "Lower Back": 0.25}),
+    "Romanian Deadlift":            ("C",  90.0, {"Hamstrings": 1.0, "Glutes": 0.5, "Lower Back": 0.5}),
+    "eGym Leg Press":               ("C", 120.0, {"Quads": 1.0, "Glutes": 0.5}),
+    "Seated Leg Curl Machine":      ("C",  50.0, {"Hamstrings": 1.0}),
+    "Standing Calf Raise Machine":  ("C",  80.0, {"Calves": 1.0}),
+    "Cable Crunch":                 ("C",  40.0, {"Abs": 1.0, "Obliques": 0.5}),
+    "Overhead Press":               ("D",  50.0, {"Front Delts": 1.0, "Side Delts": 0.5, "Triceps": 0.5}),
+    "Weighted Dip":                 ("D",  10.0, {"Chest": 1.0, "Triceps": 1.0, "Front Delts": 0.5}),
+    "Hip Abduction Machine":        ("D",  45.0, {"Abductors": 1.0}),
+    "Hip Adduction Machine":        ("D",  45.0, {"Adductors": 1.0}),
+    "Dumbbell Shrug":               ("D",  35.0, {"Upper Traps": 1.0, "Forearms": 0.5}),
+    "Tibialis Raise":               ("D",  10.0, {"Tibialis": 1.0}),
+}
+WORKOUT_NAMES = {"A": "Push A", "B": "Pull B", "C": "Legs C", "D": "Upper D"}
+
+QE_HEADERS = ["Date", "Expenditure", "Trend Weight (kg)", "Weight (kg)", "Calories (kcal)",
+              "Protein (g)", "Fat (g)", "Carbs (g)", "Target Calories (kcal)", "Target Protein (g)",
+              "Target Fat (g)", "Target Carbs (g)", "Steps"]
+
+
+def _midnight(d: date_cls) -> datetime:
+    return datetime(d.year, d.month, d.day)
+
+
+def generate_history(years: int, seed: int) -> dict:
+    """Day-by-day nutrition, weight and training history ending yesterday."""
+    rnd = random.Random(seed)
+    end = date_cls.today() - timedelta(days=1)
+    days = [end - timedelta(days=i) for i in range(365 * years - 1, -1, -1)]
+    split = "ABCD"
+    loads = {ex: spec[1] for ex, spec in EXERCISES.items()}
+
+    trend, daily, muscle_sets, muscle_volume, log = 118.0, {}, {}, {}, {}
+    session = 0
+    for d in days:
+        trend += rnd.gauss(-0.02, 0.03)
+        tdee = rnd.gauss(2900, 120)
+        target = 2300 if trend > 100 else 2600
+        kcal = rnd.gauss(target, 250) if rnd.random() < 0.95 else None
+        daily[d] = [_midnight(d), tdee, round(trend, 2),
+                    round(trend + rnd.gauss(0, 0.6), 1) if rnd.random() < 0.85 else None,
+                    None if kcal is None else round(kcal), rnd.randint(150, 230) if kcal else None,
+                    rnd.randint(50, 90) if kcal else None, rnd.randint(150, 300) if kcal else None,
+                    target, 200, 70, 250, rnd.randint(3000, 15000) if rnd.random() < 0.9 else None]
+
+        if d.weekday() in (2, 6) or rnd.random() < 0.1:  # ~4-5 sessions a week
+            continue
+        day = split[session % 4]
+        session += 1
+        start = datetime(d.year, d.month, d.day, rnd.randint(6, 19), rnd.choice((0, 15, 30, 45)))
+        duration = rnd.randint(3000, 6000)
+        sets_by_muscle, volume_by_muscle, rows = {}, {}, []
+        exercises = [ex for ex, spec in EXERCISES.items() if spec[0] == day]
+        for i, ex in enumerate(exercises):
+            loads[ex] += rnd.choice((0.0, 0.0, 0.0, 1.25, 2.5, -2.5))
+            suffix = f" ∈ SS{i // 2 + 1}" if i >= 3 else ""  # accessories paired into supersets
+            working = rnd.randint(2, 4)
+            for n in range(working + 2):
+                if n == 0:
+                    set_type, kg, reps, rir = "Warm-up", round(loads[ex] * 0.5, 1), 10, None
+                elif n <= working:
+                    set_type = "Failure Set" if n == working and rnd.random() < 0.3 else "Standard Set"
+                    kg = loads[ex]
+                    reps = max(3, int(rnd.gauss(9, 2)))
+                    rir = 0 if set_type == "Failure Set" else rnd.choice((0, 1, 1, 2, 2, 3, 4, None))
+                elif rnd.random() < 0.25:
+                    set_type, kg, reps, rir = "Drop", round(loads[ex] * 0.7, 1), rnd.randint(6, 12), 0
+                else:
+                    continue
+                rows.append([start, duration, WORKOUT_NAMES[day], ex + suffix, n + 1, set_type,
+                             kg, reps, "" if rir is None else rir])
+                if set_type in ("Standard Set", "Failure Set", "Drop"):
+                    for muscle, frac in EXERCISES[ex][2].items():
+                        sets_by_muscle[muscle] = sets_by_muscle.get(muscle, 0.0) + frac
+                        volume_by_muscle[muscle] = volume_by_muscle.get(muscle, 0.0) + frac * abs(kg) * reps
+        log[d] = rows
+        muscle_sets[d] = [_midnight(d)] + [sets_by_muscle.get(m) for m in parse.MUSCLE_GROUPS]
+        muscle_volume[d] = [_midnight(d)] + [
+            None if m not in volume_by_muscle else round(volume_by_muscle[m], 1) for m in parse.MUSCLE_GROUPS]
+    return {"days": days, "daily": daily, "muscle_sets": muscle_sets,
+            "muscle_volume": muscle_volume, "log": log}
+
+
+def write_mf_exports(history: dict, out_dir: Path, overlap_months: int = 3) -> None:
+    """One MacroFactor-YYYY-MM.xlsx per month, each covering the trailing `overlap_months`."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    days = history["days"]
+    months = sorted({(d.year, d.month) for d in days})
+    for year, month in months:
+        end = date_cls(year + month // 12, month % 12 + 1, 1)
+        start_index = months.index((year, month)) - overlap_months + 1
+        start = date_cls(*months[max(start_index, 0)], 1)
+        in_range = [d for d in days if start <= d < end]
+
+        wb = openpyxl.Workbook()  # not write_only: that mode omits the <dimension> MF exports carry
+        ws = wb.active
+        ws.title = "Quick Export"
+        ws.append(QE_HEADERS)
+        for d in in_range:
+            ws.append(history["daily"][d])
+        for title, key, suffix in (("Muscle Groups - Sets", "muscle_sets", " (sets)"),
+                                   ("Muscle Groups - Volume", "muscle_volume", " (kg)")):
+            ws = wb.create_sheet(title)
+            ws.append(["Date"] + [m + suffix for m in parse.MUSCLE_GROUPS])
+            for d in in_range:
+                if d in history[key]:
+                    ws.append(history[key][d])
+        ws = wb.create_sheet("Workout Log")
+        ws.append(["Date", "Workout Duration", "Workout", "Exercise", "Set", "Set Type",
+                   "Weight (kg)", "Reps", "RIR"])
+        for d in in_range:
+            for row in history["log"].get(d, ()):
+                ws.append(row)
+        wb.save(out_dir / f"MacroFactor-{year}-{month:02d}.xlsx")
+
+
+def write_hc_db(history: dict, path: Path, seed: int) -> None:
+    """Health Connect export with the tables parse.py reads: weight, body fat, sessions."""
+    rnd = random.Random(seed + 1)
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE weight_record_table (weight REAL, time INTEGER, zone_offset INTEGER)")
+    conn.execute("CREATE TABLE body_fat_record_table (percentage REAL, time INTEGER, zone_offset INTEGER)")
+    conn.execute("CREATE TABLE exercise_session_record_table (title TEXT, start_time INTEGER, "
+                 "end_time INTEGER, start_zone_offset INTEGER, exercise_type INTEGER)")
+    weights, fats, sessions = [], [], []
+    for d in history["days"]:
+        t = int(datetime(d.year, d.month, d.day, 7, tzinfo=timezone.utc).timestamp() * 1000)
+        trend = history["daily"][d][2]
+        for k in range(rnd.choice((0, 1, 1, 2))):
+            weights.append((round((trend + rnd.gauss(0, 0.5)) * 1000), t + k * 3_600_000, 3600))
+        if rnd.random() < 0.15:
+            fats.append((round(rnd.gauss(27, 1.5), 1), t + 60_000, 3600))
+        if rnd.random() < 0.35:
+            title, kind = rnd.choice((("VO2 Bike", 8), ("Padel", 0), ("Walk", 79), (None, 8)))
+            start = t + 10 * 3_600_000
+            sessions.append((title, start, start + rnd.randint(1200, 5400) * 1000, 3600, kind))
+    conn.executemany("INSERT INTO weight_record_table VALUES (?,?,?)", weights)
+    conn.executemany("INSERT INTO body_fat_record_table VALUES (?,?,?)", fats)
+    conn.executemany("INSERT INTO exercise_session_record_table VALUES (?,?,?,?,?)", sessions)
+    conn.commit()
+    conn.close()
+
+
+def ensure_dataset(years: int, seed: int) -> Path:
+    """Generate .bench/<years>y-s<seed>-g<GEN_VERSION>/ once; reuse it afterwards."""
+    root = BENCH_DIR / f"{years}y-s{seed}-g{GEN_VERSION}"
+    done = root / ".complete"
+    if done.exists():
+        return root
+    print(f"  generating {years}y dataset in {root.relative_to(ROOT)} ...", flush=True)
+    history = generate_history(years, seed)
+    write_mf_exports(history, root / parse.MF_DIR)
+    write_hc_db(history, root / "health_connect_export.db", seed)
+    (root / parse.CONFIG_PATH).write_text(json.dumps(parse.DEFAULT_CONFIG, indent=2))
+    done.touch()
+    return root
+
+
+# ── Stage timing ──────────────────────────────────────────────────────────────
+
+def run_pipeline(root: Path, reader: str, jobs: int, trace: bool = False) -> dict:
+    """Run every stage once against the dataset in `root`; {stage: seconds | peak MB}."""
+    cwd = os.getcwd()
+    os.chdir(root)
+    parse.HC_DB_PATH = Path("health_connect_export.db")
+    results = {}
+
+    def stage(name, fn):
+        if trace:
+            tracemalloc.reset_peak()
+            value = fn()
+            results[name] = tracemalloc.get_traced_memory()[1] / 2**20
+        else:
+            t0 = time.perf_counter()
+            value = fn()
+            results[name] = time.perf_counter() - t0
+        return value
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            config = parse.ensure_config()
+            files = parse.find_mf_files()
+            mf = stage("load_all_mf_files",
+                       lambda: parse.load_all_mf_files(files, use_cache=False, jobs=jobs, reader=reader))
+            hc = stage("load_hc_data", lambda: parse.load_hc_data(use_cache=False))
+            # the same two loads overlapped, as parse.py runs them
+            stage("load_sources", lambda: parse.load_sources(
+                lambda: parse.load_all_mf_files(files, use_cache=False, jobs=jobs, reader=reader),
+                use_cache=False))
+            data = stage("build_output", lambda: parse.build_output(mf, hc, config))
+            stage("json_dump", lambda: json.dumps(data, separators=(",", ":")))
+            v = parse.run_stages(parse.stage_sources(mf, hc), config, edges=False)
+            families = parse.trend_series(v["exercises"], v["push_pull_weekly"], v["body_comp"], v["mf_daily"])
+            stage("fit_trends", lambda: [parse.fit_trends(series, **kw) for series, kw in families.values()])
+            results["trend_series"] = sum(len(series) for series, _ in families.values())
+            results["trend_points"] = sum(len(ys) for series, _ in families.values() for ys in series.values())
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def dataset_stats(root: Path) -> dict:
+    files = sorted((root / parse.MF_DIR).glob("MacroFactor-*.xlsx"))
+    return {
+        "mf_files": len(files),
+        "xlsx_mb": round(sum(f.stat().st_size for f in files) / 2**20, 2),
+        "hc_db_mb": round((root / "health_connect_export.db").stat().st_size / 2**20, 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        # the results file itself doesn't make a run dirty: it changes after the first dataset
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no", "--",
+                                ".", f":!{RESULTS_PATH.name}"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{sha}-dirty" if dirty else sha
+
+
+def bench(years: int, args) -> dict:
+    root = ensure_dataset(years, args.seed)
+    timings = [run_pipeline(root, args.reader, args.jobs) for _ in range(args.repeat)]
+    seconds = {s: min(t[s] for t in timings) for s in STAGES}
+    concurrent = min(t["load_sources"] for t in timings)
+    trends = min(t["fit_trends"] for t in timings)
+    serial = seconds["load_all_mf_files"] + seconds["load_hc_data"]
+
+    tracemalloc.start()
+    peaks = run_pipeline(root, args.reader, args.jobs, trace=True)
+    tracemalloc.stop()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "dataset": f"{years}y",
+        "seed": args.seed,
+        "gen_version": GEN_VERSION,
+        "reader": args.reader,
+        "jobs": args.jobs,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()}-{platform.machine()}-{os.cpu_count()}cpu",
+        **dataset_stats(root),
+        "stages": {s: {"seconds": round(seconds[s], 4), "peak_mb": round(peaks[s], 1)} for s in STAGES},
+        "total_seconds": round(sum(seconds.values()), 4),
+        "ingest": {"serial_s": round(serial, 4), "concurrent_s": round(concurrent, 4),
+                   "saved_s": round(serial - concurrent, 4)},
+        "fit_trends": {"series": timings[0]["trend_series"], "points": timings[0]["trend_points"],
+                       "seconds": round(trends, 5), "peak_mb": round(peaks["fit_trends"], 2)},
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def print_result(r: dict) -> None:
+    print(f"\n  {r['dataset']}  ({r['mf_files']} files, {r['xlsx_mb']} MB xlsx, {r['hc_db_mb']} MB HC db)"
+          f"  reader={r['reader']} jobs={r['jobs']}")
+    for name, s in r["stages"].items():
+        print(f"    {name:<18} {s['seconds']:>8.3f} s   peak {s['peak_mb']:>7.1f} MB")
+    print(f"    {'total':<18} {r['total_seconds']:>8.3f} s   max RSS {r['max_rss_mb']:.0f} MB")
+    if "ingest" in r:
+        i = r["ingest"]
+        print(f"    {'MF ∥ HC ingest':<18} {i['concurrent_s']:>8.3f} s   "
+              f"vs {i['serial_s']:.3f} s back to back ({i['saved_s']:+.3f} s saved)")
+    if "fit_trends" in r:
+        t = r["fit_trends"]
+        print(f"    {'fit_trends':<18} {t['seconds'] * 1000:>8.2f} ms  "
+              f"{t['series']} series, {t['points']:,} points")
+
+
+# ── Parity ────────────────────────────────────────────────────────────────────
+
+def parity(years: int, seed: int) -> bool:
+    """Build the dataset's data.json with parse.py and check it with exercise-parity.js."""
+    root = ensure_dataset(years, seed)
+    build = subprocess.run([sys.executable, str(ROOT / "parse.py"), "--no-cache"], cwd=root,
+                           capture_output=True, text=True)
+    if build.returncode:
+        print(f"  {years}y: parse.py failed\n{build.stdout}{build.stderr}")
+        return False
+    print(f"  {years}y:", flush=True)
+    check = subprocess.run(["node", str(ROOT / "exercise-parity.js"), str(root / parse.OUT_PATH)])
+    return check.returncode == 0
+
+
+# ── Comparison ────────────────────────────────────────────────────────────────
+
+def compare(path: Path) -> None:
+    """Print stage times of the two most recent commits per dataset/reader."""
+    if not path.exists():
+        print(f"No results in {path.name} yet — run python bench.py first.")
+        return
+    # (dataset, reader, jobs, machine) → {commit: result}, last run wins; timings from
+    # different machines (core counts) aren't comparable
+    latest: dict[tuple, dict] = {}
+    for line in path.read_text().splitlines():
+        r = json.loads(line)
+        runs = latest.setdefault((r["dataset"], r["reader"], r["jobs"], r["machine"]), {})
+        runs.pop(r["commit"], None)
+        runs[r["commit"]] = r
+    for (dataset, reader, jobs, machine), runs in sorted(latest.items()):
+        if len(runs) < 2:
+            continue
+        old, new = list(runs.values())[-2:]
+        print(f"\n  {dataset} reader={reader} jobs={jobs} on {machine}:  {old['commit']} → {new['commit']}")
+        for name in STAGES:
+            a, b = old["stages"][name]["seconds"], new["stages"][name]["seconds"]
+            ratio = f"{b / a:5.2f}×" if a else "   - "
+            print(f"    {name:<18} {a:>8.3f} s → {b:>8.3f} s  {ratio}")
+        print(f"    {'total':<18} {old['total_seconds']:>8.3f} s → {new['total_seconds']:>8.3f} s")
+        if "fit_trends" in old and "fit_trends" in new:
+            a, b = old["fit_trends"]["seconds"], new["fit_trends"]["seconds"]
+            print(f"    {'fit_trends':<18} {a * 1000:>6.2f} ms → {b * 1000:>6.2f} ms")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark parse.py stages on synthetic data.")
+    p.add_argument("--years", type=int, nargs="+", default=list(DEFAULT_YEARS),
+                   help="history lengths to benchmark (default: 1 3 10)")
+    p.add_argument("--reader", choices=parse.XLSX_READERS, default="openpyxl")
+    p.add_argument("--jobs", "-j", type=int, default=1)
+    p.add_argument("--repeat", type=int, default=1, help="timing runs per dataset; the fastest is kept")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--no-save", action="store_true", help=f"don't append to {RESULTS_PATH.name}")
+    p.add_argument("--compare", action="store_true", help="compare the last two recorded commits and exit")
+    p.add_argument("--parity", action="store_true",
+                   help="check the exercises section against the previous JS implementation and exit")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(RESULTS_PATH)
+        return
+    if args.parity:
+        print("=== exercises parity ===")
+        return 0 if all([parity(years, args.seed) for years in args.years]) else 1
+    commit = git_commit()
+    if not args.no_save and (commit == "unknown" or commit.endswith("-dirty")):
+        raise SystemExit(f"Working tree has uncommitted changes ({commit}): results couldn't be tied "
+                         f"to a revision. Commit first, or pass --no-save.")
+    print("=== parse.py benchmark ===")
+    for years in args.years:
+        result = bench(years, args)
+        print_result(result)
+        if not args.no_save:
+            with open(RESULTS_PATH, "a") as f:
+                f.write(json.dumps(result) + "\n")
+    if not args.no_save:
+        print(f"\n  results appended to {RESULTS_PATH.name}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env node
+// Parity check for the precomputed exercises section.
+//
+// parse.py builds data.exercises (session-best e1RM histories, PRs, set counts and
+// credibility inputs) that the dashboard used to derive in the browser. This script
+// runs the previous browser implementation, kept verbatim below, over a data.json's
+// workouts and compares its output with data.exercises and with what public/app.js's
+// computeCredibility now makes of it.
+//
+// One difference is intended and reported rather than failed: the old PR loop took
+// the e1RM and date of the best session but weight_kg/reps from that session's first
+// working set of the exercise. parse.py reports the set that produced the best e1RM,
+// so the PR badge and strength standards name the set that actually set the record.
+//
+// Usage:
+//   node exercise-parity.js [public/data.json]
+//   python bench.py --parity --years 1 3     # synthetic fixtures, see bench.py
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+
+const APP_JS = path.join(__dirname, "public", "app.js");
+
+function round1(v) { return Math.round(v * 10) / 10; }
+
+// `new Date()` pinned to one instant so both implementations see the same "today".
+function pinnedDate(nowMs) {
+  return class extends Date {
+    constructor(...args) { if (args.length) super(...args); else super(nowMs); }
+  };
+}
+
+// A top-level declaration block of app.js, from `start` up to `end`.
+function appSlice(src, start, end) {
+  const i = src.indexOf(start), j = src.indexOf(end, i);
+  if (i < 0 || j < 0) throw new Error(`app.js: can't find ${JSON.stringify(start)} … ${JSON.stringify(end)}`);
+  return src.slice(i, j);
+}
+
+// ── Previous browser implementation (app.js before parse.py computed exercises) ──
+
+function legacyExercises(data, Date) {
+  let _exMap = null;
+  let _exOrder = [];
+  let _bwByDate = {};
+  let _latestBW = null;
+  let _exCred = {};
+
+  function getBW(date) {
+    if (_bwByDate[date]) return _bwByDate[date];
+    const prior = Object.keys(_bwByDate).filter(d => d <= date).sort();
+    return prior.length ? _bwByDate[prior[prior.length - 1]] : _latestBW;
+  }
+
+  function buildExMap() {
+    if (_exMap) return;
+    _exMap = {};
+    const counts = {};
+
+    if (data.body_comp) {
+      for (const bc of data.body_comp) _bwByDate[bc.date] = bc.trend_kg;
+      const dates = Object.keys(_bwByDate).sort();
+      if (dates.length) _latestBW = _bwByDate[dates[dates.length - 1]];
+    }
+
+    for (const w of data.workouts) {
+      const bw = getBW(w.date);
+      const best = {};
+      for (const s of w.sets) {
+        if (!s.weight_kg || !s.reps || s.set_type === "Drop") continue;
+        const ex = s.exercise;
+        const isAssisted = s.weight_kg < 0;
+        const effectiveW = isAssisted
+          ? ((bw ?? _latestBW ?? 80) - Math.abs(s.weight_kg))
+          : s.weight_kg;
+        const e1rm = effectiveW * (1 + s.reps / 30);
+        if (!best[ex] || e1rm > best[ex].e1rm) {
+          best[ex] = { date: w.date, weight_kg: s.weight_kg, effective_kg: round1(effectiveW), reps: s.reps, e1rm, rir: s.rir, isAssisted };
+        }
+      }
+      for (const [ex, entry] of Object.entries(best)) {
+        if (!_exMap[ex]) _exMap[ex] = [];
+        _exMap[ex].push(entry);
+        counts[ex] = _exMap[ex].length;
+      }
+    }
+    _exOrder = Object.entries(counts).sort((a, b) => b[1] - a[1]).map(([ex]) => ex);
+    computeCredibility();
+  }
+
+  function classifyEquipment(ex) {
+    if (/\begym\b/i.test(ex)) return "egym";
+    if (/\bbarbell\b|\bdumbbell\b|\bez bar\b|\bplate.weighted\b/i.test(ex)) return "free";
+    if (/\bcable\b/i.test(ex)) return "cable";
+    if (/\bpin.loaded\b|\bplate.loaded\b/i.test(ex)) return "machine";
+    if (/\bmachine\b/i.test(ex)) return "machine";
+    return "other";
+  }
+
+  const EQUIP_TRUST = { free: 1.0, cable: 0.92, machine: 0.82, egym: 0.55, other: 0.78 };
+
+  function flagOutliers(values) {
+    const n = values.length;
+    if (n < 4) return values.map(() => false);
+    const sorted = [...values].sort((a, b) => a - b);
+    const med = sorted[Math.floor(n / 2)];
+    const absDevs = values.map(v => Math.abs(v - med));
+    const mad = [...absDevs].sort((a, b) => a - b)[Math.floor(n / 2)];
+    const sigma = 1.4826 * mad;
+    if (sigma < 2) return values.map(() => false);
+    return values.map(v => Math.abs(v - med) > 2.5 * sigma);
+  }
+
+  function computeCredibility() {
+    _exCred = {};
+    const today = new Date();
+
+    for (const [ex, history] of Object.entries(_exMap)) {
+      const n = history.length;
+      const e1rms = history.map(e => e.e1rm);
+      const dates = history.map(e => e.date);
+
+      const outliers = flagOutliers(e1rms);
+
+      const cleanE1rms = [], cleanDates = [];
+      for (let i = 0; i < n; i++) {
+        if (!outliers[i]) { cleanE1rms.push(e1rms[i]); cleanDates.push(dates[i]); }
+      }
+
+      const hl = Math.LN2 / 30;
+      let wSum = 0, wTotal = 0;
+      for (let i = 0; i < cleanE1rms.length; i++) {
+        const age = (today - new Date(cleanDates[i])) / 86400000;
+        const w = Math.exp(-hl * age);
+        wSum += w * cleanE1rms[i]; wTotal += w;
+      }
+      const weightedMean = wTotal > 0 ? wSum / wTotal : e1rms[e1rms.length - 1];
+
+      const sc = [...cleanE1rms].sort((a, b) => a - b);
+      const robustPeak = sc.length >= 2 ? sc[Math.min(Math.floor(sc.length * 0.9), sc.length - 1)] : (sc[0] || Math.max(...e1rms));
+
+      const equipType = classifyEquipment(ex);
+      const equipFactor = EQUIP_TRUST[equipType];
+      const sessionFactor = 1 - Math.exp(-n / 5);
+      const daysSinceLast = (today - new Date(dates[dates.length - 1])) / 86400000;
+      const recencyFactor = Math.exp(-daysSinceLast / 45);
+
+      let cv = 0;
+      if (cleanE1rms.length >= 3) {
+        const mean = cleanE1rms.reduce((a, b) => a + b, 0) / cleanE1rms.length;
+        const std = Math.sqrt(cleanE1rms.reduce((s, v) => s + (v - mean) ** 2, 0) / cleanE1rms.length);
+        cv = mean > 0 ? std / mean : 0;
+      }
+      const consistencyFactor = 1 / (1 + cv * 4);
+
+      const confidence = Math.min(1, sessionFactor * recencyFactor * equipFactor * consistencyFactor);
+      const credibleE1rm = round1(confidence * robustPeak + (1 - confidence) * weightedMean);
+
+      const cleanStd = cleanE1rms.length >= 2
+        ? Math.sqrt(cleanE1rms.reduce((s, v) => s + (v - weightedMean) ** 2, 0) / cleanE1rms.length)
+        : robustPeak * 0.1;
+      const ci = round1((cleanStd / Math.sqrt(Math.max(cleanE1rms.length, 1))) / equipFactor * 1.96);
+
+      _exCred[ex] = {
+        confidence: round1(confidence * 100) / 100,
+        credibleE1rm, ci,
+        rawBest: round1(Math.max(...e1rms)),
+        weightedMean: round1(weightedMean),
+        equipType, equipFactor,
+        outliers,
+        outlierCount: outliers.filter(Boolean).length,
+      };
+    }
+  }
+
+  // renderTraining's all-time PR map and set counts
+  buildExMap();
+  const allTimePR = {};
+  const setCount = {};
+  for (const w of data.workouts) {
+    for (const s of w.sets) {
+      if (!s.weight_kg || !s.reps || s.set_type === "Drop") continue;
+      const ex = s.exercise;
+      setCount[ex] = (setCount[ex] || 0) + 1;
+      const mapEntry = _exMap?.[ex]?.find(e => e.date === w.date);
+      const e1rm = mapEntry ? mapEntry.e1rm : s.weight_kg * (1 + s.reps / 30);
+      if (!allTimePR[ex] || e1rm > allTimePR[ex].e1rm) {
+        allTimePR[ex] = { weight_kg: s.weight_kg, reps: s.reps, e1rm, date: w.date, isAssisted: s.weight_kg < 0 };
+      }
+    }
+  }
+  return { exMap: _exMap, order: _exOrder, cred: _exCred, pr: allTimePR, setCount };
+}
+
+// ── Current client: decodeWorkouts + computeCredibility from public/app.js ───
+
+function clientCredibility(appSrc, data, Date) {
+  const src = appSlice(appSrc, "let _exCred = {};", "// ── Progressive Overload chart");
+  return new Function("data", "Date", "round1", `${src}\ncomputeCredibility();\nreturn _exCred;`)(data, Date, round1);
+}
+
+function decodeWorkouts(appSrc, workouts) {
+  const src = appSlice(appSrc, "function decodeWorkouts(", "function cutoffDate(");
+  return new Function("w", `${src}\nreturn decodeWorkouts(w);`)(workouts);
+}
+
+// ── Comparison ───────────────────────────────────────────────────────────────
+
+function main() {
+  const dataPath = process.argv[2] || path.join(__dirname, "public", "data.json");
+  const doc = JSON.parse(fs.readFileSync(dataPath, "utf8"));
+  if (!doc.exercises) {
+    console.error(`${dataPath} has no exercises section`);
+    return 2;
+  }
+  if (doc.rollups && doc.rollups.full_from) {
+    console.error(`${dataPath} was built with retention: old workouts are rolled up, so the ` +
+                  "previous implementation can't see them. Check a build without \"retention\".");
+    return 2;
+  }
+  const appSrc = fs.readFileSync(APP_JS, "utf8");
+  const data = { ...doc, workouts: decodeWorkouts(appSrc, doc.workouts) };
+  const Pinned = pinnedDate(Date.now());
+
+  const old = legacyExercises(data, Pinned);
+  const cred = clientCredibility(appSrc, data, Pinned);
+  const byEx = data.exercises.by_exercise;
+
+  const failures = [];
+  const same = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+  const check = (ok, what, a, b) => {
+    if (!ok) failures.push(`${what}\n    previous: ${JSON.stringify(a).slice(0, 240)}\n    parse.py: ${JSON.stringify(b).slice(0, 240)}`);
+  };
+
+  check(same(old.order, data.exercises.order), "order", old.order, data.exercises.order);
+  check(same(Object.keys(old.exMap).sort(), Object.keys(byEx).sort()), "exercise set",
+        Object.keys(old.exMap).sort(), Object.keys(byEx).sort());
+
+  let prSetChanged = 0;
+  for (const [ex, history] of Object.entries(old.exMap)) {
+    const x = byEx[ex];
+    if (!x) continue;
+    const oldHistory = history.map(({ isAssisted, ...e }) => ({ ...e, is_assisted: isAssisted }));
+    check(same(oldHistory, x.history), `history: ${ex}`, oldHistory, x.history);
+    check(same(old.cred[ex], cred[ex]), `credibility: ${ex}`, old.cred[ex], cred[ex]);
+    check(old.setCount[ex] === x.set_count, `set_count: ${ex}`, old.setCount[ex], x.set_count);
+
+    const p = old.pr[ex], q = x.pr;
+    check(p.e1rm === q.e1rm && p.date === q.date && p.isAssisted === q.is_assisted,
+          `pr e1rm/date: ${ex}`, p, q);
+    // parse.py's PR is the session-best entry of the PR session (see the header)
+    const best = x.history.find(e => e.date === q.date && e.e1rm === q.e1rm);
+    check(best && best.weight_kg === q.weight_kg && best.reps === q.reps, `pr set: ${ex}`, best, q);
+    if (p.weight_kg !== q.weight_kg || p.reps !== q.reps) prSetChanged++;
+  }
+
+  const n = data.exercises.order.length;
+  if (failures.length) {
+    console.log(`✗ ${failures.length} mismatch(es) over ${n} exercises:`);
+    for (const f of failures.slice(0, 20)) console.log(`  ${f}`);
+    return 1;
+  }
+  console.log(`✓ exercises match the previous implementation (${n} exercises, ` +
+              `${data.workouts.length} sessions): histories, order, set counts, credibility, PR e1RM/date`);
+  console.log(`  ${prSetChanged} PR(s) now name the session's best set instead of its first working set (intended)`);
+  return 0;
+}
+
+process.exitCode = main();
@@ -5,14 +5,39 @@ Reads MacroFactor XLSX exports + Health Connect SQLite DB
 Outputs public/data.json
 
 Usage: uv run python parse.py
+       uv run python parse.py --rebuild-cache
+       uv run python parse.py --no-cache --jobs 4
+       uv run python parse.py --reader stream
+       uv run python parse.py --watch --reader stream
        HC_DB_PATH=./path/to.db uv run python parse.py
 """
 
+import argparse
+import codecs
+import cProfile
+import hashlib
+import html
+import io
 import json
+import math
 import os
+import pickle
 import re
+import select
 import sqlite3
+import struct
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+import zipfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext, redirect_stdout
 from datetime import datetime, timezone, date as date_cls, timedelta
+from functools import partial
 from pathlib import Path
 
 import openpyxl
@@ -20,7 +45,16 @@ import openpyxl
 MF_DIR = Path("drive_export/workout")
 HC_DB_PATH = Path(os.environ.get("HC_DB_PATH", "health_connect_export.db"))
 OUT_PATH = Path("public/data.json")
+METRICS_PATH = OUT_PATH.with_name("parse-metrics.json")
+MANIFEST_PATH = OUT_PATH.with_name("manifest.json")
+PATCH_DIR = OUT_PATH.with_name("patches")
 CONFIG_PATH = Path("workout-config.json")
+CACHE_DIR = Path(os.environ.get("PARSE_CACHE_DIR", ".parse-cache"))
+WAREHOUSE_PATH = Path(os.environ.get("WAREHOUSE_PATH", "warehouse.sqlite"))
+
+# Bump when parse_* output changes shape so stale cache entries are discarded
+MF_CACHE_VERSION = 3
+HC_CACHE_VERSION = 2
 
 # 22 muscle groups in display order (matches MF column names without unit suffix)
 MUSCLE_GROUPS = [
@@ -64,6 +98,16 @@ PULL_MUSCLES  = {"Upper Back", "Lats", "Biceps", "Rear Delts"}
 UPPER_MUSCLES = PUSH_MUSCLES | PULL_MUSCLES
 LOWER_MUSCLES = {"Quads", "Hamstrings", "Glutes", "Calves", "Adductors", "Abductors", "Lower Back"}
 
+# Default weekly volume groups; "volume_groups" in workout-config.json overrides or
+# extends these (e.g. "Arms": ["Biceps", "Triceps", "Forearms"]). Each group is
+# reported as <key>_mps / <key>_raw / <key>_zone, zoned against volume_landmarks.
+DEFAULT_VOLUME_GROUPS = {
+    "Push":  sorted(PUSH_MUSCLES),
+    "Pull":  sorted(PULL_MUSCLES),
+    "Upper": sorted(UPPER_MUSCLES),
+    "Lower": sorted(LOWER_MUSCLES),
+}
+
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
@@ -97,6 +141,423 @@ def safe_int(val) -> int | None:
         return None
 
 
+# ── Profiling ─────────────────────────────────────────────────────────────────
+# --profile turns PROFILER on: each stage records wall/CPU time, rows produced and
+# the peak of tracemalloc-traced allocations above what was live when it started.
+# Stages nest ("build_output/trends"); a child's peak also counts toward its parent.
+# Stages run on the main thread and cpu_s is that thread's CPU time only (the HC
+# load overlapping load_all_mf_files isn't billed to it); work on other threads is
+# added with record().
+
+class StageProfiler:
+    """Per-stage metrics collector; every method is a cheap no-op while disabled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.cprofile = False
+        self.stages: list[dict] = []
+        self._stack: list[dict] = []
+        self._profiles: dict[str, cProfile.Profile] = {}
+
+    def start(self, cprofile: bool = False) -> None:
+        self.enabled, self.cprofile = True, cprofile
+        tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, **meta):
+        """Time the block; the yielded dict takes extra fields (e.g. rec["rows"] = n)."""
+        if not self.enabled:
+            yield {}
+            return
+        parent = self._stack[-1] if self._stack else None
+        if parent is not None:
+            parent["_peak"] = max(parent["_peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        path = f"{parent['stage']}/{name}" if parent else name
+        rec = {"stage": path, **meta, "_base": tracemalloc.get_traced_memory()[0], "_peak": 0}
+        profile = None
+        if self.cprofile and parent is None:
+            profile = self._profiles[path] = cProfile.Profile()
+            profile.enable()
+        self._stack.append(rec)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield rec
+        finally:
+            rec["wall_s"] = round(time.perf_counter() - wall, 4)
+            rec["cpu_s"] = round(time.thread_time() - cpu, 4)
+            if profile is not None:
+                profile.disable()
+            self._stack.pop()
+            rec["_peak"] = max(rec["_peak"], tracemalloc.get_traced_memory()[1])
+            rec["peak_alloc_mb"] = round((rec["_peak"] - rec.pop("_base")) / 2**20, 2)
+            if parent is not None:
+                parent["_peak"] = max(parent["_peak"], rec["_peak"])
+            del rec["_peak"]
+            self.stages.append(rec)
+
+    def call(self, name: str, fn, *args, **kwargs):
+        """fn(*args, **kwargs) as a stage; rows = len(result) for lists and tables."""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        with self.stage(name) as rec:
+            result = fn(*args, **kwargs)
+            if isinstance(result, (list, DailyTable)):
+                rec["rows"] = len(result)
+        return result
+
+    def record(self, name: str, **fields) -> None:
+        """Add a stage timed elsewhere (e.g. on another thread) under the current one."""
+        if not self.enabled:
+            return
+        parent = self._stack[-1] if self._stack else None
+        path = f"{parent['stage']}/{name}" if parent else name
+        self.stages.append({"stage": path, **fields})
+
+    def write(self, path: Path) -> Path | None:
+        """Write the metrics JSON; with cProfile also dump the top-level stage with the most CPU."""
+        top = [s for s in self.stages if "/" not in s["stage"]]
+        metrics = {
+            "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "total_wall_s": round(sum(s["wall_s"] for s in top), 4),
+            "total_cpu_s": round(sum(s["cpu_s"] for s in top), 4),
+            "stages": self.stages,
+        }
+        dump = None
+        if self._profiles and top:
+            busiest = max(top, key=lambda s: s["cpu_s"])["stage"]
+            dump = path.with_name(f"profile-{busiest}.prof")
+            self._profiles[busiest].dump_stats(dump)
+            metrics["cprofile"] = {"stage": busiest, "path": str(dump)}
+        _write_json_atomic(path, metrics)
+        return dump
+
+    def report(self, limit: int = 12) -> None:
+        print(f"\n  {'stage':<44} {'wall s':>8} {'cpu s':>8} {'rows':>7} {'peak MB':>8}")
+        for s in sorted(self.stages, key=lambda s: -s["wall_s"])[:limit]:
+            rows = s.get("rows", "")
+            peak = f"{s['peak_alloc_mb']:.2f}" if "peak_alloc_mb" in s else "–"
+            print(f"  {s['stage']:<44} {s['wall_s']:>8.3f} {s['cpu_s']:>8.3f} {rows:>7} {peak:>8}")
+
+
+PROFILER = StageProfiler()
+
+
+# ── Streaming XLSX reader ─────────────────────────────────────────────────────
+# Alternative to openpyxl for the four fixed MF sheets. Streams the sheet XML out
+# of the zip in chunks, scans rows/cells with regexes instead of building a DOM or
+# Cell objects, resolves shared strings once per workbook, and memoises the
+# serial→datetime conversion of the date column. It yields the same row tuples as
+# openpyxl's iter_rows(values_only=True), so the parse_* functions run unchanged
+# on either backend (select with --reader, compare with --check-reader).
+
+_XL_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Built-in numFmtIds that openpyxl treats as dates/times (46 = [h]:mm:ss duration)
+_BUILTIN_DATE_FMTS = {14, 15, 16, 17, 18, 19, 20, 21, 22, 45, 46, 47}
+_BUILTIN_TIMEDELTA_FMTS = {46}
+_FMT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_FMT_DATE_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_FMT_TIMEDELTA_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+
+_EXCEL_EPOCH_1900 = datetime(1899, 12, 30)
+_EXCEL_EPOCH_1904 = datetime(1904, 1, 1)
+
+
+def _col_index(ref: str) -> int:
+    """'AB12' → 27 (0-based column index)."""
+    idx = 0
+    for ch in ref:
+        if ch.isdigit():
+            break
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx - 1
+
+
+def _excel_to_datetime(value: float, epoch: datetime, as_timedelta: bool):
+    """Excel serial → datetime/time/timedelta, mirroring openpyxl.utils.datetime.from_excel."""
+    if as_timedelta:
+        td = timedelta(days=value)
+        if td.microseconds:
+            td = timedelta(seconds=td.total_seconds() // 1, microseconds=round(td.microseconds, -3))
+        return td
+    day, fraction = divmod(value, 1)
+    diff = timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.min + diff).time()
+    if 0 < value < 60 and epoch == _EXCEL_EPOCH_1900:
+        day += 1
+    return epoch + timedelta(days=day) + diff
+
+
+# Fast path: Excel and openpyxl both write cell attributes in r, s, t order, so one
+# findall over a chunk pulls out every cell as (col, row, style, type, v, inline).
+# Chunks where that doesn't account for every <c> (formulas, other attribute
+# orders) fall back to the order-agnostic _CELL_RE + _ATTR_RE scan.
+_FAST_CELL_RE = re.compile(
+    r'<c r="([A-Z]+)(\d+)"(?: s="(\d+)")?(?: t="(\w+)")? ?'
+    r"(?:/>|><v>([^<]*)</v></c>|><is>(.*?)</is></c>|></c>)",
+    re.S,
+)
+# Same shape, column A only — the date column the coverage planner needs
+_COL_A_CELL_RE = re.compile(
+    r'<c r="(A)(\d+)"(?: s="(\d+)")?(?: t="(\w+)")? ?'
+    r"(?:/>|><v>([^<]*)</v></c>|><is>(.*?)</is></c>|></c>)",
+    re.S,
+)
+_ROW_RE = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_ATTR_RE = re.compile(r'\b([rst])="([^"]*)"')
+_V_RE = re.compile(r"<v>([^<]*)</v>")
+_IS_RE = re.compile(r"<is>(.*?)</is>", re.S)
+_T_RE = re.compile(r"<t\b[^>]*>([^<]*)</t>")
+_DIM_RE = re.compile(r'<dimension\b[^>]*\bref="([^"]*)"')
+_ROW_NUM_RE = re.compile(r'<row\b[^>]*?\br="(\d+)"')
+
+
+def _xml_text(raw: str) -> str:
+    return html.unescape(raw) if "&" in raw else raw
+
+
+def _generic_cells(chunk: str) -> list:
+    """Attribute-order-agnostic cell scan; same tuple shape as _FAST_CELL_RE.findall."""
+    cells = []
+    expected = 1
+    for row_m in _ROW_RE.finditer(chunk):
+        rnum = dict(_ATTR_RE.findall(row_m.group(1))).get("r") or str(expected)
+        expected = int(rnum) + 1
+        for attrs, inner in _CELL_RE.findall(row_m.group(2) or ""):
+            a = dict(_ATTR_RE.findall(attrs))
+            ref = a.get("r", "")
+            col = ref.rstrip("0123456789")
+            v = _V_RE.search(inner) if inner else None
+            inline = _IS_RE.search(inner) if inner else None
+            cells.append((col, rnum, a.get("s", ""), a.get("t", ""),
+                          v.group(1) if v else "", inline.group(1) if inline else ""))
+    return cells
+
+
+class XlsxStreamSheet:
+    """Read-only sheet exposing the iter_rows(min_row, max_row, values_only=True) subset we use."""
+
+    FIRST_CHUNK = 1 << 14  # small first read so header-only passes stay cheap
+    CHUNK = 1 << 20
+
+    def __init__(self, wb: "XlsxStreamWorkbook", member: str):
+        self._wb = wb
+        self._member = member
+
+    def _row_chunks(self):
+        """Yield decoded XML text cut on </row> boundaries, one zip read at a time."""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        buf = ""
+        size = self.FIRST_CHUNK
+        with self._wb.zip.open(self._member) as f:
+            while True:
+                block = f.read(size)
+                size = self.CHUNK
+                buf += decoder.decode(block, final=not block)
+                if not block:
+                    yield buf
+                    return
+                cut = buf.rfind("</row>")
+                if cut >= 0:
+                    cut += len("</row>")
+                    yield buf[:cut]
+                    buf = buf[cut:]
+
+    def iter_rows(self, min_row: int = 1, max_row: int | None = None,
+                  max_col: int | None = None, values_only: bool = True):
+        wb = self._wb
+        shared = None
+        date_styles = wb.date_styles
+        epoch = wb.epoch
+        col_idx = {}    # column letters → 0-based index
+        converted = {}  # (raw, style) → date value; MF repeats a date on every set row
+        width = 0       # rows are padded to the sheet width, like openpyxl
+        expected = 1    # next row number openpyxl would yield
+        inline_text = {}  # raw <is> body → text; exercise/set-type strings repeat a lot
+        cur_row = None
+        skip = False
+        values = None
+        last_chunk = False
+
+        if max_col == 1:
+            cell_re, cell_marker = _COL_A_CELL_RE, '<c r="A'
+        else:
+            cell_re, cell_marker = _FAST_CELL_RE, "<c "
+
+        for chunk in self._row_chunks():
+            if expected == 1 and cur_row is None:
+                dim = _DIM_RE.search(chunk)
+                if dim:
+                    width = _col_index(dim.group(1).split(":")[-1]) + 1
+                if max_col is not None:
+                    width = max_col
+            # don't scan cells of rows outside [min_row, max_row]
+            if min_row > expected:
+                start = chunk.find(f'<row r="{min_row}"')
+                if start >= 0:
+                    chunk = chunk[start:]
+            if max_row is not None:
+                stop = chunk.find(f'<row r="{max_row + 1}"')
+                if stop >= 0:
+                    chunk = chunk[:stop]
+                    last_chunk = True
+
+            cells = cell_re.findall(chunk)
+            if len(cells) != chunk.count(cell_marker) + (chunk.count("<c>") if max_col != 1 else 0):
+                cells = _generic_cells(chunk)
+
+            for col, rnum, style, t, raw, inline in cells:
+                if rnum != cur_row:
+                    if cur_row is not None and not skip:
+                        yield tuple(values)
+                    row_idx = int(rnum)
+                    if max_row is not None and row_idx > max_row:
+                        return
+                    # openpyxl yields all-None rows for gaps in the row numbering
+                    for _ in range(max(expected, min_row), row_idx):
+                        yield (None,) * width
+                    expected = row_idx + 1
+                    cur_row = rnum
+                    skip = row_idx < min_row
+                    values = [None] * width
+
+                ci = col_idx.get(col)
+                if ci is None:
+                    ci = col_idx[col] = _col_index(col)
+                if max_col is not None and ci >= max_col:
+                    continue
+                if ci >= width:
+                    # wider than <dimension> claimed: widen this and all later rows
+                    values.extend([None] * (ci + 1 - width))
+                    width = ci + 1
+                if skip:
+                    continue
+
+                if not t or t == "n":
+                    if not raw:
+                        continue
+                    if style and style in date_styles:
+                        key = (raw, style)
+                        if key not in converted:
+                            converted[key] = _excel_to_datetime(float(raw), epoch, date_styles[style])
+                        values[ci] = converted[key]
+                    elif "." in raw or "E" in raw or "e" in raw:
+                        values[ci] = float(raw)
+                    else:
+                        values[ci] = int(raw)
+                elif t == "s":
+                    if raw:
+                        if shared is None:
+                            shared = wb.shared_strings
+                        values[ci] = shared[int(raw)]
+                elif t == "inlineStr":
+                    if inline:
+                        text = inline_text.get(inline)
+                        if text is None:
+                            text = inline_text[inline] = _xml_text("".join(_T_RE.findall(inline)))
+                        values[ci] = text
+                elif not raw:
+                    continue
+                elif t == "str" or t == "e":
+                    values[ci] = _xml_text(raw)
+                elif t == "b":
+                    values[ci] = bool(int(raw))
+                elif t == "d":
+                    values[ci] = datetime.fromisoformat(raw.rstrip("Z"))
+                else:
+                    values[ci] = raw
+            if last_chunk:
+                break
+
+        if cur_row is not None and not skip and (max_row is None or int(cur_row) <= max_row):
+            yield tuple(values)
+
+
+class XlsxStreamWorkbook:
+    """Minimal zip/XML workbook reader with the openpyxl read-only interface parse_* needs."""
+
+    def __init__(self, path: Path):
+        self.zip = zipfile.ZipFile(path)
+        self._members = self._sheet_members()
+        self.sheetnames = list(self._members)
+        self._shared_strings = None
+        self._date_styles = None
+
+    def __getitem__(self, name: str) -> XlsxStreamSheet:
+        return XlsxStreamSheet(self, self._members[name])
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def _sheet_members(self) -> dict:
+        rels = ET.fromstring(self.zip.read("xl/_rels/workbook.xml.rels"))
+        targets = {}
+        for rel in rels.iter(_PKG_REL_NS + "Relationship"):
+            target = rel.get("Target", "")
+            target = target.lstrip("/") if target.startswith("/") else "xl/" + target
+            targets[rel.get("Id")] = target
+        book = ET.fromstring(self.zip.read("xl/workbook.xml"))
+        pr = book.find(_XL_NS + "workbookPr")
+        self.epoch = (_EXCEL_EPOCH_1904 if pr is not None and pr.get("date1904") in ("1", "true")
+                      else _EXCEL_EPOCH_1900)
+        return {s.get("name"): targets[s.get(_REL_NS + "id")] for s in book.iter(_XL_NS + "sheet")}
+
+    @property
+    def shared_strings(self) -> list:
+        if self._shared_strings is None:
+            strings = []
+            if "xl/sharedStrings.xml" in self.zip.namelist():
+                si_tag, t_tag, rph_tag = _XL_NS + "si", _XL_NS + "t", _XL_NS + "rPh"
+                with self.zip.open("xl/sharedStrings.xml") as f:
+                    for _, elem in ET.iterparse(f):
+                        if elem.tag == si_tag:
+                            for ph in elem.findall(rph_tag):
+                                elem.remove(ph)
+                            strings.append("".join(t.text or "" for t in elem.iter(t_tag)))
+                            elem.clear()
+            self._shared_strings = strings
+        return self._shared_strings
+
+    @property
+    def date_styles(self) -> dict:
+        """Cell style index (as the raw 's' attribute string) → is-timedelta, for date-formatted styles."""
+        if self._date_styles is None:
+            styles = {}
+            if "xl/styles.xml" in self.zip.namelist():
+                root = ET.fromstring(self.zip.read("xl/styles.xml"))
+                custom = {}
+                fmts = root.find(_XL_NS + "numFmts")
+                if fmts is not None:
+                    for nf in fmts.iter(_XL_NS + "numFmt"):
+                        custom[int(nf.get("numFmtId"))] = nf.get("formatCode", "")
+                xfs = root.find(_XL_NS + "cellXfs")
+                if xfs is not None:
+                    for i, xf in enumerate(xfs.iter(_XL_NS + "xf")):
+                        fmt_id = int(xf.get("numFmtId", 0))
+                        if fmt_id in custom:
+                            code = custom[fmt_id].split(";")[0]
+                            if _FMT_DATE_RE.search(_FMT_STRIP_RE.sub("", code)):
+                                styles[str(i)] = _FMT_TIMEDELTA_RE.search(code) is not None
+                        elif fmt_id in _BUILTIN_DATE_FMTS:
+                            styles[str(i)] = fmt_id in _BUILTIN_TIMEDELTA_FMTS
+            self._date_styles = styles
+        return self._date_styles
+
+
+XLSX_READERS = ("openpyxl", "stream")
+
+
+def open_workbook(path: Path, reader: str = "openpyxl"):
+    if reader == "stream":
+        return XlsxStreamWorkbook(path)
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
 # ── MacroFactor XLSX parsing ──────────────────────────────────────────────────
 
 def find_mf_files() -> list[Path]:
@@ -105,39 +566,52 @@ def find_mf_files() -> list[Path]:
     return files
 
 
-def parse_quick_export(ws) -> dict:
-    """Parse Quick Export sheet → dict keyed by date string."""
+# Quick Export output key → (MF column header, converter)
+QUICK_EXPORT_FIELDS = {
+    "tdee":             ("Expenditure",            safe_float),
+    "trend_weight_kg":  ("Trend Weight (kg)",      safe_float),
+    "weight_kg":        ("Weight (kg)",            safe_float),
+    "kcal":             ("Calories (kcal)",        safe_float),
+    "protein_g":        ("Protein (g)",            safe_float),
+    "fat_g":            ("Fat (g)",                safe_float),
+    "carbs_g":          ("Carbs (g)",              safe_float),
+    "target_kcal":      ("Target Calories (kcal)", safe_float),
+    "target_protein_g": ("Target Protein (g)",     safe_float),
+    "target_fat_g":     ("Target Fat (g)",         safe_float),
+    "target_carbs_g":   ("Target Carbs (g)",       safe_float),
+    "steps":            ("Steps",                  safe_int),
+}
+
+
+def iter_quick_export(ws):
+    """Yield one {"date", field: value|None, ...} entry per Quick Export row, in sheet order."""
     headers = list(next(ws.iter_rows(max_row=1, values_only=True)))
     col = {h: i for i, h in enumerate(headers) if h}
+    # Resolve header → column once; absent columns stay None in every entry
+    present = [(key, col[h], conv) for key, (h, conv) in QUICK_EXPORT_FIELDS.items() if h in col]
+    template = {"date": None, **dict.fromkeys(QUICK_EXPORT_FIELDS)}
 
-    by_date = {}
     for row in ws.iter_rows(min_row=2, values_only=True):
         date = to_date_str(row[0])
         if not date:
             continue
-        by_date[date] = {
-            "date": date,
-            "tdee":              safe_float(row[col["Expenditure"]]) if "Expenditure" in col else None,
-            "trend_weight_kg":   safe_float(row[col["Trend Weight (kg)"]]) if "Trend Weight (kg)" in col else None,
-            "weight_kg":         safe_float(row[col["Weight (kg)"]]) if "Weight (kg)" in col else None,
-            "kcal":              safe_float(row[col["Calories (kcal)"]]) if "Calories (kcal)" in col else None,
-            "protein_g":         safe_float(row[col["Protein (g)"]]) if "Protein (g)" in col else None,
-            "fat_g":             safe_float(row[col["Fat (g)"]]) if "Fat (g)" in col else None,
-            "carbs_g":           safe_float(row[col["Carbs (g)"]]) if "Carbs (g)" in col else None,
-            "target_kcal":       safe_float(row[col["Target Calories (kcal)"]]) if "Target Calories (kcal)" in col else None,
-            "target_protein_g":  safe_float(row[col["Target Protein (g)"]]) if "Target Protein (g)" in col else None,
-            "target_fat_g":      safe_float(row[col["Target Fat (g)"]]) if "Target Fat (g)" in col else None,
-            "target_carbs_g":    safe_float(row[col["Target Carbs (g)"]]) if "Target Carbs (g)" in col else None,
-            "steps":             safe_int(row[col["Steps"]]) if "Steps" in col else None,
-        }
-    return by_date
+        entry = template.copy()
+        entry["date"] = date
+        for key, i, conv in present:
+            entry[key] = conv(row[i])
+        yield entry
 
 
-def parse_muscle_sheet(ws) -> dict:
+def parse_quick_export(ws) -> dict:
+    """Parse Quick Export sheet → dict keyed by date string."""
+    return {entry["date"]: entry for entry in iter_quick_export(ws)}
+
+
+def iter_muscle_sheet(ws):
     """
-    Parse either Muscle Groups - Sets or Muscle Groups - Volume sheet.
-    Column headers like 'Chest (sets)' or 'Chest (kg)' — strip suffix to get muscle name.
-    Returns dict keyed by date string.
+    Yield one {"date", muscle: value|None, ...} entry per row of either Muscle
+    Groups - Sets or Muscle Groups - Volume. Column headers like 'Chest (sets)' or
+    'Chest (kg)' — strip suffix to get muscle name.
     """
     headers = list(next(ws.iter_rows(max_row=1, values_only=True)))
     col = {}
@@ -145,176 +619,817 @@ def parse_muscle_sheet(ws) -> dict:
         if h and h != "Date":
             muscle = h.replace(" (sets)", "").replace(" (kg)", "").strip()
             col[muscle] = i
+    present = [(muscle, col[muscle]) for muscle in MUSCLE_GROUPS if muscle in col]
+    template = {"date": None, **dict.fromkeys(MUSCLE_GROUPS)}
 
-    by_date = {}
     for row in ws.iter_rows(min_row=2, values_only=True):
         date = to_date_str(row[0])
         if not date:
             continue
-        entry = {"date": date}
-        for muscle in MUSCLE_GROUPS:
-            val = row[col[muscle]] if muscle in col else None
-            entry[muscle] = safe_float(val)
-        by_date[date] = entry
-    return by_date
+        entry = template.copy()
+        entry["date"] = date
+        for muscle, i in present:
+            entry[muscle] = safe_float(row[i])
+        yield entry
 
 
-def parse_workout_log(ws) -> dict:
+def parse_muscle_sheet(ws) -> dict:
+    """Parse either muscle group sheet → dict keyed by date string."""
+    return {entry["date"]: entry for entry in iter_muscle_sheet(ws)}
+
+
+def parse_workout_log(ws) -> "WorkoutLog":
     """
-    Parse Workout Log sheet.
-    Groups sets by date → {date, workout_name, duration_sec, sets: [...]}
+    Parse Workout Log sheet → WorkoutLog (sessions by date, sets as typed arrays
+    with interned exercise names and set types).
     """
     headers = list(next(ws.iter_rows(max_row=1, values_only=True)))
     col = {h: i for i, h in enumerate(headers) if h}
-
-    by_date = {}
+    i_workout  = col.get("Workout", 2)
+    i_duration = col.get("Workout Duration", 1)
+    i_exercise = col.get("Exercise", 3)
+    i_set_type = col.get("Set Type", 5)
+    i_weight   = col.get("Weight (kg)", 6)
+    i_reps     = col.get("Reps", 7)
+    i_rir      = col.get("RIR", 8)
+
+    # Every set row repeats its session timestamp and exercise name — convert each once
+    dates = {}
+    exercises = {}
+
+    log = WorkoutLog()
+    session = {}  # date → session index, in first-seen order
+    set_session = array("I")
     for row in ws.iter_rows(min_row=2, values_only=True):
-        date = to_date_str(row[0])
+        date = dates.get(row[0])
+        if date is None:
+            date = dates[row[0]] = to_date_str(row[0])
         if not date:
             continue
 
-        workout_name = row[col.get("Workout", 2)] or ""
-        duration_sec = safe_int(row[col.get("Workout Duration", 1)])
-        exercise = clean_exercise(row[col.get("Exercise", 3)] or "")
-        set_type = row[col.get("Set Type", 5)] or ""
-        weight_kg = safe_float(row[col.get("Weight (kg)", 6)])
-        reps = safe_int(row[col.get("Reps", 7)])
-        rir_raw = row[col.get("RIR", 8)]
+        k = session.get(date)
+        if k is None:
+            k = session[date] = len(log.dates)
+            log.dates.append(date)
+            log.names.append(row[i_workout] or "")
+            log.durations.append(safe_int(row[i_duration]))
+
+        ex_raw = row[i_exercise] or ""
+        ex_id = exercises.get(ex_raw)
+        if ex_id is None:
+            ex_id = exercises[ex_raw] = log.exercise_id(clean_exercise(ex_raw))
+        weight_kg = safe_float(row[i_weight])
+        reps = safe_int(row[i_reps])
+        rir_raw = row[i_rir]
         # RIR may be empty string, None, or int
         rir = safe_int(rir_raw) if rir_raw not in (None, "", "None") else None
 
-        set_entry = {
-            "exercise": exercise,
-            "set_type": set_type,
-            "weight_kg": weight_kg,
-            "reps": reps,
-            "rir": rir,
+        set_session.append(k)
+        log.exercise.append(ex_id)
+        log.set_type.append(log.set_type_id(row[i_set_type] or ""))
+        log.weight_kg.append(NAN if weight_kg is None else weight_kg)
+        log.reps.append(NO_INT if reps is None else reps)
+        log.rir.append(NO_INT if rir is None else rir)
+
+    return log.grouped(set_session)
+
+
+# section key in the merged MF dict → (sheet name, parser)
+MF_SHEETS = {
+    "daily":         ("Quick Export",           parse_quick_export),
+    "muscle_sets":   ("Muscle Groups - Sets",   parse_muscle_sheet),
+    "muscle_volume": ("Muscle Groups - Volume", parse_muscle_sheet),
+    "workouts":      ("Workout Log",            parse_workout_log),
+}
+
+# daily/muscle sections → per-row generator (--stream folds rows without a by-date dict)
+MF_ROW_ITERS = {
+    "daily":         iter_quick_export,
+    "muscle_sets":   iter_muscle_sheet,
+    "muscle_volume": iter_muscle_sheet,
+}
+
+
+def parse_mf_file(path: Path, reader: str = "openpyxl", plan: dict | None = None) -> dict:
+    """
+    Parse one MF workbook → {section: by_date dict} for each sheet present.
+    With a plan (see plan_mf_files) only the planned row ranges are parsed.
+    """
+    wb = open_workbook(path, reader)
+    parsed = {}
+    try:
+        for section, (sheet, parser) in MF_SHEETS.items():
+            if sheet in wb.sheetnames:
+                ws = wb[sheet]
+                if plan is not None:
+                    ws = RowRangeSheet(ws, plan[section]["rows"])
+                with PROFILER.stage(f"{path.name}:{sheet}") as rec:
+                    parsed[section] = parser(ws)
+                    rec["rows"] = len(parsed[section])
+    finally:
+        wb.close()
+    return parsed
+
+
+def parse_mf_sheet(path: Path, section: str, reader: str = "openpyxl",
+                   plan: dict | None = None) -> dict | None:
+    """Parse a single sheet of one workbook (process-pool work unit). None if absent."""
+    sheet, parser = MF_SHEETS[section]
+    wb = open_workbook(path, reader)
+    try:
+        if sheet not in wb.sheetnames:
+            return None
+        ws = wb[sheet]
+        if plan is not None:
+            ws = RowRangeSheet(ws, plan[section]["rows"])
+        return parser(ws)
+    finally:
+        wb.close()
+
+
+def iter_mf_files_parallel(files: list[Path], jobs: int, reader: str = "openpyxl",
+                           plans: dict | None = None):
+    """
+    Parse every (workbook, sheet) pair in a process pool and yield (path, parsed) in
+    file order, each as soon as that workbook and every earlier one are done, so the
+    caller merges while later workbooks are still parsing.
+    Sections are in MF_SHEETS order, same as parse_mf_file.
+    """
+    plans = plans or {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(parse_mf_sheet, path, section, reader, plans.get(path)): (path, section)
+            for path in files
+            for section in MF_SHEETS
         }
+        sheets = {path: {} for path in files}
+        pending = {path: len(MF_SHEETS) for path in files}
+        head = 0
+        for fut in as_completed(futures):
+            path, section = futures[fut]
+            sheets[path][section] = fut.result()
+            pending[path] -= 1
+            while head < len(files) and pending[files[head]] == 0:
+                done = sheets.pop(files[head])
+                yield files[head], {s: done[s] for s in MF_SHEETS if done[s] is not None}
+                head += 1
+
+
+def iter_mf_parsed(files: list[Path], ready: dict, jobs: int = 1, reader: str = "openpyxl",
+                   plans: dict | None = None):
+    """
+    Yield (path, sheets) for every file in order: entries of ready (already parsed or
+    cached) right away, the rest parsed here or, with jobs > 1, in a process pool.
+    """
+    plans = plans or {}
+    todo = [path for path in files if path not in ready]
+    if jobs > 1 and todo:
+        print(f"  Parsing {len(todo)} workbook(s) with {jobs} worker(s)...")
+        fresh = iter_mf_files_parallel(todo, jobs, reader, plans)
+    else:
+        fresh = ((path, parse_mf_file(path, reader, plans.get(path))) for path in todo)
+    i = 0
+    for path, parsed in fresh:
+        while files[i] != path:
+            yield files[i], ready[files[i]]
+            i += 1
+        yield path, parsed
+        i += 1
+    for path in files[i:]:
+        yield path, ready[path]
+
+
+def check_reader_parity(files: list[Path]) -> bool:
+    """Parse each workbook with every backend and compare section by section."""
+    ok = True
+    for path in files:
+        results = {reader: parse_mf_file(path, reader) for reader in XLSX_READERS}
+        ref_reader, ref = XLSX_READERS[0], results[XLSX_READERS[0]]
+        diffs = [
+            f"{section}: {reader} differs from {ref_reader}"
+            for reader, parsed in results.items()
+            for section in MF_SHEETS
+            if parsed.get(section) != ref.get(section)
+        ]
+        print(f"  {'✗' if diffs else '✓'} {path.name}")
+        for d in diffs:
+            print(f"      {d}")
+        ok = ok and not diffs
+    return ok
+
+
+# ── Overlap planning ──────────────────────────────────────────────────────────
+# Monthly MF exports overlap heavily, and merging newest-wins means any row whose
+# date a newer export also has is parsed only to be overwritten. The planner reads
+# just the date column of each workbook, walks them newest→oldest, and hands each
+# sheet parser the row ranges whose dates no newer export covers. Skipping is by
+# exact date per section, so the merged result is identical to a full parse.
+
+class RowRangeSheet:
+    """Sheet view whose data rows (min_row ≥ 2) are limited to 1-based row ranges."""
+
+    def __init__(self, ws, ranges: list):
+        self._ws = ws
+        self._ranges = ranges
+
+    def iter_rows(self, min_row: int = 1, max_row: int | None = None, values_only: bool = True):
+        if min_row == 1:  # header
+            yield from self._ws.iter_rows(min_row=1, max_row=max_row, values_only=True)
+            return
+        if not self._ranges:
+            return
+        bounds = iter(self._ranges)
+        first, last = next(bounds)
+        rows = self._ws.iter_rows(min_row=first, max_row=self._ranges[-1][1], values_only=True)
+        for idx, row in enumerate(rows, start=first):
+            while idx > last:
+                first, last = next(bounds)
+            if idx >= first:
+                yield row
+
+
+def scan_mf_coverage(path: Path, reader: str = "openpyxl") -> dict:
+    """Date column only → {section: [(row number, date), ...]} for each sheet present."""
+    wb = open_workbook(path, reader)
+    coverage = {}
+    try:
+        for section, (sheet, _) in MF_SHEETS.items():
+            if sheet not in wb.sheetnames:
+                continue
+            rows = wb[sheet].iter_rows(min_row=2, max_col=1, values_only=True)
+            coverage[section] = [
+                (i, d) for i, row in enumerate(rows, start=2)
+                if row and (d := to_date_str(row[0]))
+            ]
+    finally:
+        wb.close()
+    return coverage
 
-        if date not in by_date:
-            by_date[date] = {
-                "date": date,
-                "workout_name": workout_name,
-                "duration_sec": duration_sec,
-                "sets": [],
+
+def _row_ranges(rows: list) -> list:
+    """Sorted row numbers → [(first, last), ...] runs."""
+    ranges = []
+    for r in rows:
+        if ranges and ranges[-1][1] == r - 1:
+            ranges[-1][1] = r
+        else:
+            ranges.append([r, r])
+    return [tuple(x) for x in ranges]
+
+
+def plan_mf_files(files: list[Path], cached: dict, reader: str = "openpyxl") -> dict:
+    """
+    Plan which rows of each uncached workbook survive the newest-wins merge.
+    `cached` maps path → cache entry; entries whose skipped dates are no longer all
+    covered by newer files (e.g. a newer export was removed) are dropped from it.
+    Returns {path: {section: {"rows", "skipped_dates", "skipped_rows", "total_rows"}}}.
+    """
+    newer = {section: set() for section in MF_SHEETS}
+    plans = {}
+    for path in reversed(files):
+        entry = cached.get(path)
+        if entry is not None:
+            skipped = entry["skipped"]
+            if all(newer[s].issuperset(skipped.get(s, ())) for s in MF_SHEETS):
+                for section, by_date in entry["sheets"].items():
+                    newer[section].update(by_date)
+                    newer[section].update(skipped.get(section, ()))
+                continue
+            del cached[path]
+
+        plan = {}
+        for section, rows in scan_mf_coverage(path, reader).items():
+            covered = newer[section]
+            keep = [i for i, d in rows if d not in covered]
+            plan[section] = {
+                "rows": _row_ranges(keep),
+                "skipped_dates": sorted({d for _, d in rows if d in covered}),
+                "skipped_rows": len(rows) - len(keep),
+                "total_rows": len(rows),
             }
-        by_date[date]["sets"].append(set_entry)
+            covered.update(d for _, d in rows)
+        plans[path] = plan
 
-    return by_date
+    total = sum(p["total_rows"] for plan in plans.values() for p in plan.values())
+    skipped = sum(p["skipped_rows"] for plan in plans.values() for p in plan.values())
+    if plans:
+        print(f"  Plan: {skipped} of {total} rows superseded by newer exports — skipped")
+    return plans
+
+
+# ── MF parse cache ────────────────────────────────────────────────────────────
+# One JSON file per workbook under CACHE_DIR/mf/, holding the parsed sheets plus
+# the fingerprint (path, size, mtime, sha256) they were parsed from. A size/mtime
+# match is trusted as-is; otherwise the content hash decides, so a re-downloaded
+# but identical export is still a cache hit.
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
 
-def load_all_mf_files(files: list[Path]) -> dict:
-    """Load all MF XLSX files sorted oldest→newest; later files win on duplicate dates."""
+def _write_json_atomic(path: Path, obj) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _sheets_to_json(sheets: dict) -> dict:
+    if "workouts" not in sheets:
+        return sheets
+    return {**sheets, "workouts": sheets["workouts"].to_json()}
+
+
+def mf_cache_path(path: Path) -> Path:
+    key = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:12]
+    return CACHE_DIR / "mf" / f"{path.stem}-{key}.json"
+
+
+# In-process layer over the disk cache: resolved path → (size, mtime_ns, entry).
+# Lets a long-lived process (--watch) skip re-reading JSON for unchanged exports.
+_MF_MEMO: dict[str, tuple] = {}
+
+
+def load_cached_mf(path: Path, memo: bool = True) -> dict | None:
+    """
+    Return the cache entry ({"sheets", "skipped"}) for `path` if its fingerprint still
+    matches. "skipped" lists dates the planner left out because newer files had them.
+    memo=False reads the file without keeping the entry in this process.
+    """
+    st = path.stat()
+    hit = _MF_MEMO.get(str(path.resolve()))
+    if hit is not None and hit[:2] == (st.st_size, st.st_mtime_ns):
+        return hit[2]
+    entry = _load_cached_mf_file(path, st)
+    if entry is not None and memo:
+        _MF_MEMO[str(path.resolve())] = (st.st_size, st.st_mtime_ns, entry)
+    return entry
+
+
+def _load_cached_mf_file(path: Path, st: os.stat_result) -> dict | None:
+    cache_path = mf_cache_path(path)
+    if not cache_path.exists():
+        return None
+    try:
+        with open(cache_path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    fp = entry.get("fingerprint", {})
+    if entry.get("version") != MF_CACHE_VERSION or fp.get("path") != str(path.resolve()):
+        return None
+    if "workouts" in entry["sheets"]:
+        entry["sheets"]["workouts"] = WorkoutLog.from_json(entry["sheets"]["workouts"])
+
+    if fp.get("size") == st.st_size and fp.get("mtime_ns") == st.st_mtime_ns:
+        return entry
+    if fp.get("size") == st.st_size and fp.get("sha256") == file_sha256(path):
+        # Touched or re-copied but unchanged — refresh the stat part of the key
+        fp["mtime_ns"] = st.st_mtime_ns
+        _write_json_atomic(cache_path, {**entry, "sheets": _sheets_to_json(entry["sheets"])})
+        return entry
+    return None
+
+
+def mf_cache_header(path: Path) -> dict:
+    """The version and fingerprint that start a cache entry for `path`."""
+    st = path.stat()
+    return {
+        "version": MF_CACHE_VERSION,
+        "fingerprint": {
+            "path": str(path.resolve()),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_sha256(path),
+        },
+    }
+
+
+def store_cached_mf(path: Path, sheets: dict, skipped: dict | None = None) -> None:
+    entry = {**mf_cache_header(path), "sheets": sheets, "skipped": skipped or {}}
+    _write_json_atomic(mf_cache_path(path), {**entry, "sheets": _sheets_to_json(sheets)})
+    fp = entry["fingerprint"]
+    _MF_MEMO[fp["path"]] = (fp["size"], fp["mtime_ns"], entry)
+
+
+def clear_cache() -> None:
+    """Drop cached MF workbooks, the HC high-water-mark state and cached output stages."""
+    _MF_MEMO.clear()
+    cache_dir = CACHE_DIR / "mf"
+    if cache_dir.exists():
+        for p in cache_dir.glob("*.json"):
+            p.unlink()
+        print(f"  Cleared {cache_dir}")
+    if hc_cache_path().exists():
+        hc_cache_path().unlink()
+        print(f"  Cleared {hc_cache_path()}")
+    _STAGE_MEMO.clear()
+    stage_dir = CACHE_DIR / "stages"
+    if stage_dir.exists():
+        for p in stage_dir.glob("*.pickle"):
+            p.unlink()
+        print(f"  Cleared {stage_dir}")
+
+
+MF_LABELS = {
+    "daily":         ("Quick Export      ", "days"),
+    "muscle_sets":   ("Muscle Groups Sets", "days"),
+    "muscle_volume": ("Muscle Groups Vol ", "days"),
+    "workouts":      ("Workout Log       ", "workout days"),
+}
+
+
+def load_all_mf_files(files: list[Path], use_cache: bool = True, jobs: int = 1,
+                      reader: str = "openpyxl", plan: bool = False) -> dict:
+    """
+    Load all MF XLSX files sorted oldest→newest; later files win on duplicate dates.
+    Returns daily/muscle sections as DailyTables (see to_columnar).
+    With jobs > 1, uncached workbooks are parsed sheet-by-sheet in a process pool
+    and merged as they finish, still in file order, so the output is identical.
+    With plan, rows that a newer file supersedes are not parsed at all.
+    """
     merged = {
         "daily": {},
         "muscle_sets": {},
         "muscle_volume": {},
-        "workouts": {},
+        "workouts": [],  # one WorkoutLog per export, merged by to_columnar
     }
 
-    for path in files:
-        print(f"\n  [{path.name}]")
-        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    cached = {}
+    if use_cache:
+        for path in files:
+            entry = load_cached_mf(path)
+            # partial (planned) entries are only valid alongside the newer files
+            if entry is not None and (plan or not entry["skipped"]):
+                cached[path] = entry
+    plans = PROFILER.call("plan", plan_mf_files, files, cached, reader) if plan else {}
+
+    todo = [path for path in files if path not in cached]
+    ready = {path: entry["sheets"] for path, entry in cached.items()}
+    parallel = jobs > 1 and len(todo) > 0
+    with PROFILER.stage("parse_parallel", workbooks=len(todo), jobs=jobs) if parallel else nullcontext():
+        # merged file by file as each workbook arrives; later files still win
+        for path, parsed in iter_mf_parsed(files, ready, jobs, reader, plans):
+            if use_cache and path not in cached:
+                skipped = {s: p["skipped_dates"] for s, p in plans.get(path, {}).items() if p["skipped_dates"]}
+                store_cached_mf(path, parsed, skipped)
+            print(f"\n  [{path.name}]" + ("  (cached)" if path in cached else ""))
+            for section, (label, unit) in MF_LABELS.items():
+                if section not in parsed:
+                    continue
+                if section == "workouts":
+                    merged[section].append(parsed[section])
+                else:
+                    merged[section].update(parsed[section])
+                line = f"    {label} : {len(parsed[section])} {unit}"
+                skipped_rows = plans.get(path, {}).get(section, {}).get("skipped_rows")
+                if skipped_rows:
+                    line += f"  (+{skipped_rows} superseded rows skipped)"
+                print(line)
+
+    return PROFILER.call("to_columnar", to_columnar, merged)
+
+
+# ── MF warehouse ──────────────────────────────────────────────────────────────
+# With --warehouse, parsed exports are upserted into a local SQLite database that
+# becomes the canonical MF history: only new or changed exports are parsed, and
+# days stay in the warehouse after their export is deleted. Every row records the
+# export it came from; a row is only replaced by an export that sorts at or after
+# it, which is the same "later file wins" rule load_all_mf_files applies.
+
+WAREHOUSE_VERSION = 1  # schema version, stored as PRAGMA user_version
+
+_MUSCLE_COLS = ", ".join(f'"{m}" REAL' for m in MUSCLE_GROUPS)
+_DAILY_COLS = ", ".join(f"{k} {'INTEGER' if k == 'steps' else 'REAL'}" for k in QUICK_EXPORT_FIELDS)
+
+WAREHOUSE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS exports (
+    name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, ingested_at TEXT);
+CREATE TABLE IF NOT EXISTS daily (date TEXT PRIMARY KEY, source TEXT NOT NULL, {_DAILY_COLS});
+CREATE TABLE IF NOT EXISTS muscle_sets (date TEXT PRIMARY KEY, source TEXT NOT NULL, {_MUSCLE_COLS});
+CREATE TABLE IF NOT EXISTS muscle_volume (date TEXT PRIMARY KEY, source TEXT NOT NULL, {_MUSCLE_COLS});
+CREATE TABLE IF NOT EXISTS workouts (
+    date TEXT PRIMARY KEY, source TEXT NOT NULL, workout_name TEXT, duration_sec INTEGER);
+CREATE TABLE IF NOT EXISTS sets (
+    date TEXT NOT NULL, seq INTEGER NOT NULL, exercise TEXT NOT NULL, set_type TEXT,
+    weight_kg REAL, reps INTEGER, rir INTEGER, PRIMARY KEY (date, seq));
+CREATE INDEX IF NOT EXISTS sets_exercise_date ON sets (exercise, date);
+"""
 
-        if "Quick Export" in wb.sheetnames:
-            d = parse_quick_export(wb["Quick Export"])
-            merged["daily"].update(d)
-            print(f"    Quick Export       : {len(d)} days")
+# section → (table, value columns in order)
+WAREHOUSE_TABLES = {
+    "daily":         ("daily", list(QUICK_EXPORT_FIELDS)),
+    "muscle_sets":   ("muscle_sets", MUSCLE_GROUPS),
+    "muscle_volume": ("muscle_volume", MUSCLE_GROUPS),
+    "workouts":      ("workouts", ["workout_name", "duration_sec"]),
+}
+SET_FIELDS = ("exercise", "set_type", "weight_kg", "reps", "rir")
 
-        if "Muscle Groups - Sets" in wb.sheetnames:
-            d = parse_muscle_sheet(wb["Muscle Groups - Sets"])
-            merged["muscle_sets"].update(d)
-            print(f"    Muscle Groups Sets : {len(d)} days")
 
-        if "Muscle Groups - Volume" in wb.sheetnames:
-            d = parse_muscle_sheet(wb["Muscle Groups - Volume"])
-            merged["muscle_volume"].update(d)
-            print(f"    Muscle Groups Vol  : {len(d)} days")
+def open_warehouse(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        conn.executescript(WAREHOUSE_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {WAREHOUSE_VERSION}")
+    elif version != WAREHOUSE_VERSION:
+        # the warehouse may hold days whose exports are gone, so never drop it implicitly
+        conn.close()
+        raise SystemExit(f"{path} has schema v{version}, this parser expects v{WAREHOUSE_VERSION}; "
+                         f"migrate it or move it aside to re-ingest")
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
 
-        if "Workout Log" in wb.sheetnames:
-            d = parse_workout_log(wb["Workout Log"])
-            merged["workouts"].update(d)
-            print(f"    Workout Log        : {len(d)} workout days")
 
-        wb.close()
+def _quote(names) -> str:
+    return ", ".join(f'"{n}"' for n in names)
+
+
+def ingest_mf_export(conn: sqlite3.Connection, path: Path, parsed: dict) -> dict:
+    """Upsert one parsed export; returns {section: rows written} (rows a newer export owns are kept)."""
+    source = path.name
+    written = {}
+    for section, (table, cols) in WAREHOUSE_TABLES.items():
+        by_date = parsed.get(section)
+        if not by_date:
+            continue
+        owners = dict(conn.execute(f"SELECT date, source FROM {table} WHERE date BETWEEN ? AND ?",
+                                   (min(by_date), max(by_date))))
+        if section == "workouts":
+            session = {d: k for k, d in enumerate(by_date.dates)}
+            rows = {d: (by_date.names[k], by_date.durations[k]) for d, k in session.items()}
+        else:
+            rows = {d: [row[c] for c in cols] for d, row in by_date.items()}
+        dates = [d for d in rows if owners.get(d, "") <= source]
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {table} (date, source, {_quote(cols)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(cols))})",
+            ([d, source, *rows[d]] for d in dates))
+        if section == "workouts":
+            conn.executemany("DELETE FROM sets WHERE date = ?", ((d,) for d in dates))
+            conn.executemany(
+                f"INSERT INTO sets (date, seq, {', '.join(SET_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ([d, seq, *values] for d in dates for seq, values in enumerate(by_date.set_rows(session[d]))))
+        written[section] = len(dates)
+    st = path.stat()
+    conn.execute("INSERT OR REPLACE INTO exports VALUES (?, ?, ?, ?, ?)",
+                 (source, st.st_size, st.st_mtime_ns, file_sha256(path),
+                  datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")))
+    return written
+
+
+def _stale_exports(conn: sqlite3.Connection, files: list[Path]) -> list[Path]:
+    """Exports that are new, or whose size/mtime (and then SHA-256) changed since ingestion."""
+    known = {name: (size, mtime, sha) for name, size, mtime, sha in
+             conn.execute("SELECT name, size, mtime_ns, sha256 FROM exports")}
+    stale = []
+    for path in files:
+        st = path.stat()
+        prev = known.get(path.name)
+        if prev is None:
+            stale.append(path)
+        elif (st.st_size, st.st_mtime_ns) != prev[:2] and file_sha256(path) != prev[2]:
+            stale.append(path)
+    return stale
+
+
+def _table_from_sql(conn: sqlite3.Connection, table: str, names, int_columns=()) -> "DailyTable":
+    rows = conn.execute(f"SELECT date, {_quote(names)} FROM {table} ORDER BY date").fetchall()
+    columns = {name: array("d", [NAN if r[i] is None else r[i] for r in rows])
+               for i, name in enumerate(names, 1)}
+    return DailyTable([r[0] for r in rows], columns, int_columns)
+
+
+def query_warehouse(conn: sqlite3.Connection) -> dict:
+    """The warehouse as load_all_mf_files' return value (DailyTables + a WorkoutLog)."""
+    workouts = WorkoutLog()
+    sets = conn.execute(f"SELECT date, {', '.join(SET_FIELDS)} FROM sets ORDER BY date, seq")
+    row = next(sets, None)
+    for d, name, duration in conn.execute("SELECT date, workout_name, duration_sec FROM workouts ORDER BY date"):
+        workouts.add_session(d, name, duration)
+        while row is not None and row[0] == d:
+            workouts.add_set(*row[1:])
+            row = next(sets, None)
+    return {
+        "daily":         _table_from_sql(conn, "daily", list(QUICK_EXPORT_FIELDS), int_columns=("steps",)),
+        "muscle_sets":   _table_from_sql(conn, "muscle_sets", MUSCLE_GROUPS),
+        "muscle_volume": _table_from_sql(conn, "muscle_volume", MUSCLE_GROUPS),
+        "workouts":      workouts,
+    }
+
 
-    return merged
+def load_warehouse_mf(files: list[Path], path: Path = WAREHOUSE_PATH, use_cache: bool = True,
+                      jobs: int = 1, reader: str = "openpyxl") -> dict:
+    """Ingest new/changed exports into the warehouse, then read the whole MF history back from it."""
+    conn = open_warehouse(path)
+    try:
+        todo = _stale_exports(conn, files)
+        print(f"  Warehouse {path}: {len(files) - len(todo)} export(s) current, {len(todo)} to ingest")
+        ready = {}
+        if use_cache:
+            for p in todo:
+                entry = load_cached_mf(p)
+                if entry is not None and not entry["skipped"]:
+                    ready[p] = entry["sheets"]
+        with PROFILER.stage("ingest"), conn:
+            for p, parsed in iter_mf_parsed(todo, ready, jobs, reader):  # oldest first, like the in-memory merge
+                if use_cache and p not in ready:
+                    store_cached_mf(p, parsed)
+                written = ingest_mf_export(conn, p, parsed)
+                print(f"    ingested {p.name}: " + ", ".join(f"{n} {s}" for s, n in written.items()))
+        mf = PROFILER.call("query_warehouse", query_warehouse, conn)
+    finally:
+        conn.close()
+    print(f"    {len(mf['daily'])} days, {len(mf['workouts'])} workout days in warehouse")
+    return mf
 
 
 # ── Health Connect parsing ────────────────────────────────────────────────────
+# Day bucketing and cardio filtering run inside SQLite, and each table keeps a
+# high-water mark on time/start_time in CACHE_DIR/hc.json so later runs only fetch
+# records newer than what is already cached and merge them in. Next to the mark
+# each table stores a fingerprint of the rows at or before it; update.sh swaps
+# the DB file wholesale, so a record edited, deleted or synced late below the
+# mark changes the fingerprint and that table is read in full again.
+
+# Local calendar day of an HC record: epoch ms shifted by its zone offset (s)
+_HC_DAY_SQL = "date(({t} + COALESCE({z}, 0) * 1000) / 1000, 'unixepoch')"
+
+_HC_CARDIO_TYPE_SQL = """
+    CASE
+        WHEN exercise_type = 8 OR lower(title) LIKE '%vo2%' OR lower(title) LIKE '%bike%'
+             OR lower(title) LIKE '%cycling%' THEN 'cardio_vo2'
+        WHEN lower(title) LIKE '%padel%' THEN 'padel'
+    END
+"""
 
-def to_hc_date(time_ms: int, zone_s: int) -> str:
-    local_ts = (time_ms + (zone_s or 0) * 1000) / 1000
-    return datetime.fromtimestamp(local_ts, tz=timezone.utc).strftime("%Y-%m-%d")
 
+# State key: (table, time column, columns summed into the fingerprint)
+HC_TABLES = {
+    "weight": ("weight_record_table", "time", ("weight", "zone_offset")),
+    "body_fat": ("body_fat_record_table", "time", ("percentage", "zone_offset")),
+    "cardio": ("exercise_session_record_table", "start_time",
+               ("end_time", "start_zone_offset", "exercise_type", "length(title)")),
+}
 
-def parse_hc_weight(conn: sqlite3.Connection) -> list:
-    rows = conn.execute(
-        "SELECT weight, time, zone_offset FROM weight_record_table ORDER BY time ASC"
-    ).fetchall()
-    by_date = {}
-    for weight_g, time_ms, zone_s in rows:
-        by_date[to_hc_date(time_ms, zone_s or 0)] = round(weight_g / 1000, 2)
-    result = [{"date": d, "kg": kg} for d, kg in sorted(by_date.items())]
-    print(f"  HC weight : {len(result)} entries")
-    return result
+
+def open_hc_db(path: Path) -> sqlite3.Connection:
+    """Open the HC export read-only; immutable=1 also skips locking and change checks."""
+    return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+
+
+def query_hc_daily_last(conn: sqlite3.Connection, table: str, value_col: str, since: int) -> dict:
+    """{local date: [time, value]} for the last reading per day with time > since."""
+    # SQLite returns bare columns from the row that supplied MAX(time)
+    rows = conn.execute(f"""
+        SELECT {_HC_DAY_SQL.format(t="time", z="zone_offset")} AS day, MAX(time), {value_col}
+        FROM {table}
+        WHERE time > ?
+        GROUP BY day
+    """, (since,)).fetchall()
+    return {day: [time_ms, value] for day, time_ms, value in rows}
+
+
+def sync_hc_daily(conn: sqlite3.Connection, table: str, value_col: str, state: dict) -> dict:
+    """Fetch readings past state["hwm"] and merge into state["by_date"] (in place)."""
+    by_date = state.setdefault("by_date", {})
+    fresh = query_hc_daily_last(conn, table, value_col, state.get("hwm", -1))
+    for day, (time_ms, value) in fresh.items():
+        if day not in by_date or time_ms >= by_date[day][0]:
+            by_date[day] = [time_ms, value]
+    if fresh:
+        state["hwm"] = max(state.get("hwm", -1), max(t for t, _ in fresh.values()))
+    return by_date
 
 
-def parse_hc_body_fat(conn: sqlite3.Connection) -> list:
-    rows = conn.execute(
-        "SELECT percentage, time, zone_offset FROM body_fat_record_table ORDER BY time ASC"
-    ).fetchall()
-    by_date = {}
-    for pct, time_ms, zone_s in rows:
-        by_date[to_hc_date(time_ms, zone_s or 0)] = round(float(pct), 2)
-    result = [{"date": d, "pct": p} for d, p in sorted(by_date.items())]
-    print(f"  HC body fat : {len(result)} entries")
+def parse_hc_weight(conn: sqlite3.Connection, state: dict | None = None) -> list:
+    by_date = sync_hc_daily(conn, "weight_record_table", "weight", state if state is not None else {})
+    result = [{"date": d, "kg": round(weight_g / 1000, 2)} for d, (_, weight_g) in sorted(by_date.items())]
     return result
 
 
-def parse_hc_cardio(conn: sqlite3.Connection) -> list:
-    rows = conn.execute("""
-        SELECT title, start_time, end_time, start_zone_offset, exercise_type
-        FROM exercise_session_record_table
-        ORDER BY start_time DESC
-    """).fetchall()
+def parse_hc_body_fat(conn: sqlite3.Connection, state: dict | None = None) -> list:
+    by_date = sync_hc_daily(conn, "body_fat_record_table", "percentage", state if state is not None else {})
+    result = [{"date": d, "pct": round(float(pct), 2)} for d, (_, pct) in sorted(by_date.items())]
+    return result
 
-    result = []
-    for title, start_ms, end_ms, zone_s, ex_type in rows:
-        t = (title or "").lower()
-        if ex_type == 8 or "vo2" in t or "bike" in t or "cycling" in t:
-            session_type = "cardio_vo2"
-        elif "padel" in t:
-            session_type = "padel"
-        else:
-            continue
-        duration_min = round((end_ms - start_ms) / 1000 / 60)
-        result.append({
-            "date": to_hc_date(start_ms, zone_s or 0),
+
+def parse_hc_cardio(conn: sqlite3.Connection, state: dict | None = None) -> list:
+    state = state if state is not None else {}
+    sessions = state.setdefault("sessions", [])
+    rows = conn.execute(f"""
+        SELECT * FROM (
+            SELECT start_time, end_time, title,
+                   {_HC_DAY_SQL.format(t="start_time", z="start_zone_offset")} AS day,
+                   {_HC_CARDIO_TYPE_SQL} AS session_type
+            FROM exercise_session_record_table
+            WHERE start_time > ?
+        )
+        WHERE session_type IS NOT NULL
+    """, (state.get("hwm", -1),)).fetchall()
+
+    for start_ms, end_ms, title, day, session_type in rows:
+        sessions.append({
+            "start_time": start_ms,
+            "date": day,
             "type": session_type,
             "title": title or "",
-            "duration_min": duration_min,
+            "duration_min": round((end_ms - start_ms) / 1000 / 60),
         })
+    if rows:
+        state["hwm"] = max(state.get("hwm", -1), max(r[0] for r in rows))
+    sessions.sort(key=lambda s: s["start_time"], reverse=True)
 
-    print(f"  HC cardio : {len(result)} sessions")
+    result = [{k: v for k, v in s.items() if k != "start_time"} for s in sessions]
     return result
 
 
-def load_hc_data() -> dict:
+def hc_cache_path() -> Path:
+    return CACHE_DIR / "hc.json"
+
+
+def hc_db_stat(path: Path) -> list:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def hc_fingerprint(conn: sqlite3.Connection, key: str, hwm: int) -> list:
+    """count, max(rowid) and column totals over a table's rows with time <= hwm."""
+    table, time_col, cols = HC_TABLES[key]
+    sums = ", ".join(f"total({c})" for c in (time_col, *cols))
+    return list(conn.execute(f"SELECT count(*), max(rowid), {sums} FROM {table} WHERE {time_col} <= ?",
+                             (hwm,)).fetchone())
+
+
+def check_hc_state(conn: sqlite3.Connection, state: dict, log=print) -> None:
+    """Drop the cached series of any table whose rows below its high-water mark changed."""
+    for key in HC_TABLES:
+        table_state = state.get(key)
+        if not table_state or "hwm" not in table_state:
+            continue
+        if table_state.get("fingerprint") != hc_fingerprint(conn, key, table_state["hwm"]):
+            log(f"  HC {key}: records at or before the last sync changed — re-reading in full")
+            del state[key]
+
+
+def stamp_hc_state(conn: sqlite3.Connection, state: dict) -> None:
+    for key in HC_TABLES:
+        table_state = state.get(key)
+        if table_state and "hwm" in table_state:
+            table_state["fingerprint"] = hc_fingerprint(conn, key, table_state["hwm"])
+
+
+def load_hc_state(db_path: Path) -> dict:
+    """Cached HC series + high-water marks and fingerprints for this DB path (empty if none/stale)."""
+    try:
+        with open(hc_cache_path()) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get("version") != HC_CACHE_VERSION or state.get("db") != str(db_path.resolve()):
+        return {}
+    return state
+
+
+def load_hc_data(use_cache: bool = True, log=print) -> dict:
+    """HC weight, body fat and cardio; progress lines go to log (a list's append when run on a thread)."""
     if not HC_DB_PATH.exists():
-        print(f"  HC DB not found ({HC_DB_PATH}) — skipping cardio/weight fallback")
+        log(f"  HC DB not found ({HC_DB_PATH}) — skipping cardio/weight fallback")
         return {"hc_weight": [], "hc_body_fat": [], "cardio": []}
 
-    print(f"  Reading {HC_DB_PATH}...")
-    conn = sqlite3.connect(HC_DB_PATH)
+    state = load_hc_state(HC_DB_PATH) if use_cache else {}
+    if state:
+        log(f"  Reading {HC_DB_PATH} (incremental)...")
+    else:
+        log(f"  Reading {HC_DB_PATH}...")
+    stat = hc_db_stat(HC_DB_PATH)
+    conn = open_hc_db(HC_DB_PATH)
     try:
+        if state and state.get("stat") != stat:
+            check_hc_state(conn, state, log)
         result = {
-            "hc_weight": parse_hc_weight(conn),
-            "hc_body_fat": parse_hc_body_fat(conn),
-            "cardio": parse_hc_cardio(conn),
+            "hc_weight": parse_hc_weight(conn, state.setdefault("weight", {})),
+            "hc_body_fat": parse_hc_body_fat(conn, state.setdefault("body_fat", {})),
+            "cardio": parse_hc_cardio(conn, state.setdefault("cardio", {})),
         }
+        if use_cache:
+            stamp_hc_state(conn, state)
     finally:
         conn.close()
+    log(f"  HC weight : {len(result['hc_weight'])} entries")
+    log(f"  HC body fat : {len(result['hc_body_fat'])} entries")
+    log(f"  HC cardio : {len(result['cardio'])} sessions")
+
+    if use_cache:
+        state["version"] = HC_CACHE_VERSION
+        state["db"] = str(HC_DB_PATH.resolve())
+        state["stat"] = stat
+        _write_json_atomic(hc_cache_path(), state)
     return result
 
 
@@ -331,9 +1446,420 @@ def ensure_config() -> dict:
         return json.load(f)
 
 
+# ── Columnar tables ───────────────────────────────────────────────────────────
+# Per-day data lives in DailyTable: a sorted ISO-date index plus one float64
+# array('d') per metric/muscle, NaN for missing. Downstream stages index columns
+# by position instead of walking dicts with 12-22 keys per day; JSON rows are
+# only rebuilt at the output edge (to_records).
+
+NAN = float("nan")
+
+
+class DailyTable:
+    """Sorted date index + named array('d') columns (NaN = missing)."""
+
+    def __init__(self, dates: list, columns: dict, int_columns=()):
+        self.dates = dates
+        self.columns = columns
+        self.int_columns = frozenset(int_columns)  # serialised back as int
+
+    @classmethod
+    def from_by_date(cls, by_date: dict, names, int_columns=()) -> "DailyTable":
+        dates = sorted(by_date)
+        rows = [by_date[d] for d in dates]
+        columns = {}
+        for name in names:
+            col = array("d", bytes(8 * len(rows)))
+            for i, row in enumerate(rows):
+                v = row.get(name)
+                col[i] = NAN if v is None else v
+            columns[name] = col
+        return cls(dates, columns, int_columns)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, name: str) -> array:
+        return self.columns[name]
+
+    def since(self, date: str | None) -> "DailyTable":
+        """The rows dated `date` or later (all of them for None)."""
+        if date is None:
+            return self
+        i = bisect_left(self.dates, date)
+        return DailyTable(self.dates[i:], {name: col[i:] for name, col in self.columns.items()}, self.int_columns)
+
+    def to_records(self, lazy: bool = False):
+        """Back to [{"date", col: value|None, ...}] rows for data.json (a generator if lazy)."""
+        rows = self._records()
+        return rows if lazy else list(rows)
+
+    def _records(self):
+        names = list(self.columns)
+        ints = [name in self.int_columns for name in names]
+        for date, *values in zip(self.dates, *self.columns.values()):
+            row = {"date": date}
+            for name, is_int, v in zip(names, ints, values):
+                row[name] = None if v != v else (int(v) if is_int else v)
+            yield row
+
+
+class DailyTableBuilder:
+    """
+    Fill a DailyTable's columns row by row as entries are parsed. A later entry
+    for a date replaces the earlier one, like dict.update on by-date dicts.
+    """
+
+    def __init__(self, names, int_columns=()):
+        self.names = list(names)
+        self.int_columns = int_columns
+        self.row: dict[str, int] = {}  # date → row in the columns
+        self.columns = {name: array("d") for name in self.names}
+
+    def put(self, date: str, entry: dict) -> None:
+        i = self.row.get(date)
+        if i is None:
+            i = self.row[date] = len(self.row)
+            for col in self.columns.values():
+                col.append(NAN)
+        for name, col in self.columns.items():
+            v = entry.get(name)
+            col[i] = NAN if v is None else v
+
+    def build(self) -> DailyTable:
+        dates = sorted(self.row)
+        order = [self.row[d] for d in dates]
+        columns = {name: array("d", (col[i] for i in order)) for name, col in self.columns.items()}
+        return DailyTable(dates, columns, self.int_columns)
+
+
+def is_nan(v: float) -> bool:
+    return v != v
+
+
+NO_INT = -1  # missing reps/RIR in WorkoutLog's int columns
+
+
+class WorkoutLog:
+    """
+    The Workout Log as struct-of-arrays. Sessions are sorted by date; session k's
+    sets are rows start[k]:start[k + 1] of the set columns. Exercise names and set
+    types are interned into tables and stored per set as small ids.
+    """
+
+    def __init__(self):
+        self.dates: list[str] = []
+        self.names: list[str] = []
+        self.durations: list[int | None] = []
+        self.start = array("I", [0])
+        self.exercises: list[str] = []
+        self.set_types: list[str] = []
+        self._exercise_ids: dict[str, int] = {}
+        self._set_type_ids: dict[str, int] = {}
+        self.exercise = array("H")
+        self.set_type = array("H")
+        self.weight_kg = array("d")  # NaN = missing
+        self.reps = array("i")       # NO_INT = missing
+        self.rir = array("i")
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __iter__(self):
+        return iter(self.dates)  # like iterating the other sections' by-date dicts
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, WorkoutLog) and self.to_json() == other.to_json()
+
+    def exercise_id(self, name: str) -> int:
+        i = self._exercise_ids.get(name)
+        if i is None:
+            i = self._exercise_ids[name] = len(self.exercises)
+            self.exercises.append(name)
+        return i
+
+    def set_type_id(self, name: str) -> int:
+        i = self._set_type_ids.get(name)
+        if i is None:
+            i = self._set_type_ids[name] = len(self.set_types)
+            self.set_types.append(name)
+        return i
+
+    def add_session(self, date: str, name: str, duration_sec: int | None) -> None:
+        """Start a session; add_set appends to the latest one. Dates must be added in order."""
+        self.dates.append(date)
+        self.names.append(name)
+        self.durations.append(duration_sec)
+        self.start.append(self.start[-1])
+
+    def add_set(self, exercise: str, set_type: str, weight_kg: float | None,
+                reps: int | None, rir: int | None) -> None:
+        self.exercise.append(self.exercise_id(exercise))
+        self.set_type.append(self.set_type_id(set_type))
+        self.weight_kg.append(NAN if weight_kg is None else weight_kg)
+        self.reps.append(NO_INT if reps is None else reps)
+        self.rir.append(NO_INT if rir is None else rir)
+        self.start[-1] += 1
+
+    def grouped(self, set_session: array) -> "WorkoutLog":
+        """
+        Finish a log filled in sheet order (sessions in first-seen order, set i
+        belonging to session set_session[i]): sort sessions by date and make each
+        session's sets contiguous, keeping their sheet order.
+        """
+        counts = [0] * len(self.dates)
+        for k in set_session:
+            counts[k] += 1
+        if (all(a <= b for a, b in zip(set_session, set_session[1:]))
+                and all(a < b for a, b in zip(self.dates, self.dates[1:]))):
+            for c in counts:  # already grouped and sorted — the common case
+                self.start.append(self.start[-1] + c)
+            return self
+        members = [[] for _ in self.dates]
+        for i, k in enumerate(set_session):
+            members[k].append(i)
+        out = WorkoutLog()
+        out.exercises, out._exercise_ids = self.exercises, self._exercise_ids
+        out.set_types, out._set_type_ids = self.set_types, self._set_type_ids
+        for k in sorted(range(len(self.dates)), key=self.dates.__getitem__):
+            out.add_session(self.dates[k], self.names[k], self.durations[k])
+            for i in members[k]:
+                out.exercise.append(self.exercise[i])
+                out.set_type.append(self.set_type[i])
+                out.weight_kg.append(self.weight_kg[i])
+                out.reps.append(self.reps[i])
+                out.rir.append(self.rir[i])
+            out.start[-1] += len(members[k])
+        return out
+
+    def set_range(self, k: int) -> range:
+        return range(self.start[k], self.start[k + 1])
+
+    def set_rows(self, k: int):
+        """Session k's sets as (exercise, set_type, weight_kg, reps, rir), None for missing."""
+        for i in self.set_range(k):
+            w, r, q = self.weight_kg[i], self.reps[i], self.rir[i]
+            yield (self.exercises[self.exercise[i]], self.set_types[self.set_type[i]],
+                   None if w != w else w, None if r == NO_INT else r, None if q == NO_INT else q)
+
+    @classmethod
+    def merge(cls, logs: list) -> "WorkoutLog":
+        """One log from per-export logs (oldest first); a later log's session replaces an earlier one's."""
+        owner = {}
+        for log in logs:
+            for k, date in enumerate(log.dates):
+                owner[date] = (log, k)
+        out = cls()
+        for date in sorted(owner):
+            log, k = owner[date]
+            out.add_session(date, log.names[k], log.durations[k])
+            a, b = log.start[k], log.start[k + 1]
+            out.exercise.extend(out.exercise_id(log.exercises[e]) for e in log.exercise[a:b])
+            out.set_type.extend(out.set_type_id(log.set_types[t]) for t in log.set_type[a:b])
+            out.weight_kg.extend(log.weight_kg[a:b])
+            out.reps.extend(log.reps[a:b])
+            out.rir.extend(log.rir[a:b])
+            out.start[-1] += b - a
+        return out
+
+    def since(self, date: str | None) -> "WorkoutLog":
+        """The sessions dated `date` or later (all of them for None), sharing this log's tables."""
+        if date is None:
+            return self
+        cut = bisect_left(self.dates, date)
+        a = self.start[cut]
+        out = WorkoutLog()
+        out.exercises, out.set_types = self.exercises, self.set_types
+        out._exercise_ids, out._set_type_ids = self._exercise_ids, self._set_type_ids
+        out.dates, out.names, out.durations = self.dates[cut:], self.names[cut:], self.durations[cut:]
+        out.start = array("I", (s - a for s in self.start[cut:]))
+        out.exercise, out.set_type = self.exercise[a:], self.set_type[a:]
+        out.weight_kg, out.reps, out.rir = self.weight_kg[a:], self.reps[a:], self.rir[a:]
+        return out
+
+    def absorb(self, later: "WorkoutLog") -> None:
+        """
+        merge([self, later]) in place, for a later export: only sessions from its
+        first date on are rebuilt. The tables may keep names of replaced sessions
+        until merge([self]) re-interns them.
+        """
+        if not later.dates:
+            return
+        cut = bisect_left(self.dates, later.dates[0])
+        a = self.start[cut]
+        tail = WorkoutLog.merge([self.since(later.dates[0]), later])
+
+        del self.dates[cut:], self.names[cut:], self.durations[cut:], self.start[cut + 1:]
+        for col in (self.exercise, self.set_type, self.weight_kg, self.reps, self.rir):
+            del col[a:]
+        self.dates += tail.dates
+        self.names += tail.names
+        self.durations += tail.durations
+        self.start.extend(s + a for s in tail.start[1:])
+        self.exercise.extend(self.exercise_id(tail.exercises[e]) for e in tail.exercise)
+        self.set_type.extend(self.set_type_id(tail.set_types[t]) for t in tail.set_type)
+        self.weight_kg.extend(tail.weight_kg)
+        self.reps.extend(tail.reps)
+        self.rir.extend(tail.rir)
+
+    def to_json(self, lazy: bool = False) -> dict:
+        """
+        Columnar data.json form: session lists, interned tables, per-set columns.
+        lazy leaves the per-set columns as iterators (for JsonWriter).
+        """
+        seq = iter if lazy else list
+        return {
+            "dates": self.dates,
+            "workout_name": self.names,
+            "duration_sec": self.durations,
+            "exercises": self.exercises,
+            "set_types": self.set_types,
+            "sets": {
+                "workout": seq(k for k in range(len(self.dates)) for _ in self.set_range(k)),
+                "exercise": seq(self.exercise),
+                "set_type": seq(self.set_type),
+                "weight_kg": seq(None if w != w else w for w in self.weight_kg),
+                "reps": seq(None if r == NO_INT else r for r in self.reps),
+                "rir": seq(None if r == NO_INT else r for r in self.rir),
+            },
+        }
+
+    @classmethod
+    def from_json(cls, obj: dict) -> "WorkoutLog":
+        log = cls()
+        sets = obj["sets"]
+        for name in obj["exercises"]:
+            log.exercise_id(name)
+        for name in obj["set_types"]:
+            log.set_type_id(name)
+        log.dates, log.names, log.durations = obj["dates"], obj["workout_name"], obj["duration_sec"]
+        counts = [0] * len(log.dates)
+        for k in sets["workout"]:
+            counts[k] += 1
+        for c in counts:
+            log.start.append(log.start[-1] + c)
+        log.exercise = array("H", sets["exercise"])
+        log.set_type = array("H", sets["set_type"])
+        log.weight_kg = array("d", [NAN if w is None else w for w in sets["weight_kg"]])
+        log.reps = array("i", [NO_INT if r is None else r for r in sets["reps"]])
+        log.rir = array("i", [NO_INT if r is None else r for r in sets["rir"]])
+        return log
+
+
+def to_columnar(merged: dict) -> dict:
+    """Merged MF by-date dicts → DailyTables; per-export workout logs → one WorkoutLog."""
+    return {
+        "daily":         DailyTable.from_by_date(merged["daily"], QUICK_EXPORT_FIELDS, int_columns=("steps",)),
+        "muscle_sets":   DailyTable.from_by_date(merged["muscle_sets"], MUSCLE_GROUPS),
+        "muscle_volume": DailyTable.from_by_date(merged["muscle_volume"], MUSCLE_GROUPS),
+        "workouts":      WorkoutLog.merge(merged["workouts"]),
+    }
+
+
+# ── Rolling windows ───────────────────────────────────────────────────────────
+# Prefix sums and counts over a dense daily calendar: any N-day window ending on
+# any day is two subtractions, and missing days simply contribute nothing.
+
+ROLLING_WINDOWS = (7, 14, 30, 90)
+ADHERENCE_TOLERANCE = 0.10  # kcal within ±10% of target counts as adherent
+
+
+class RollingIndex:
+    """Prefix sum/count arrays per series over every calendar day first..last."""
+
+    def __init__(self, first: str, last: str):
+        self.start = date_cls.fromisoformat(first)
+        self.days = (date_cls.fromisoformat(last) - self.start).days + 1
+        self.sums: dict[str, array] = {}
+        self.counts: dict[str, array] = {}
+
+    def offset(self, date: str) -> int:
+        return (date_cls.fromisoformat(date) - self.start).days
+
+    def add(self, name: str, dates, values) -> None:
+        """Register a series; NaN values are treated as missing."""
+        daily_sum = array("d", [0.0]) * self.days
+        daily_n = array("l", [0]) * self.days
+        for date, v in zip(dates, values):
+            if not is_nan(v):
+                i = self.offset(date)
+                daily_sum[i] += v
+                daily_n[i] += 1
+        sums, counts = array("d", [0.0]), array("l", [0])
+        for v, c in zip(daily_sum, daily_n):
+            sums.append(sums[-1] + v)
+            counts.append(counts[-1] + c)
+        self.sums[name], self.counts[name] = sums, counts
+
+    def window(self, name: str, end: str, days: int) -> tuple[float, int]:
+        """(sum, count) of `name` over the `days` calendar days ending on `end` (inclusive)."""
+        hi = min(max(self.offset(end) + 1, 0), self.days)
+        lo = min(max(self.offset(end) + 1 - days, 0), self.days)
+        return self.sums[name][hi] - self.sums[name][lo], self.counts[name][hi] - self.counts[name][lo]
+
+    def mean(self, name: str, end: str, days: int) -> float | None:
+        total, n = self.window(name, end, days)
+        return total / n if n else None
+
+
+def build_rolling_index(mf_daily: DailyTable) -> RollingIndex | None:
+    """Deficit, high-deficit flag, kcal adherence, protein and steps per logged day."""
+    if not len(mf_daily):
+        return None
+    tdee, kcal, target = mf_daily["tdee"], mf_daily["kcal"], mf_daily["target_kcal"]
+    deficit = array("d", (t - k for t, k in zip(tdee, kcal)))  # NaN if either is missing
+    adherent = array("d", (NAN if is_nan(k) or is_nan(t) or not t else float(abs(k - t) <= ADHERENCE_TOLERANCE * t)
+                           for k, t in zip(kcal, target)))
+    index = RollingIndex(mf_daily.dates[0], mf_daily.dates[-1])
+    index.add("deficit", mf_daily.dates, deficit)
+    index.add("high_deficit", mf_daily.dates, array("d", (d if is_nan(d) else float(d > 800) for d in deficit)))
+    index.add("adherent", mf_daily.dates, adherent)
+    index.add("protein_g", mf_daily.dates, mf_daily["protein_g"])
+    index.add("steps", mf_daily.dates, mf_daily["steps"])
+    return index
+
+
+# output key → (RollingIndex series, scale)
+ROLLING_METRICS = {"deficit_avg": ("deficit", 1), "adherence_pct": ("adherent", 100),
+                   "protein_avg": ("protein_g", 1), "steps_avg": ("steps", 1)}
+
+
+def _rolling_column(index: RollingIndex, name: str, scale: int, window: int, days):
+    """The window mean ending on each day offset in `days`."""
+    sums, counts = index.sums[name], index.counts[name]
+    for day in days:
+        t = day + 1
+        lo = max(t - window, 0)
+        n = counts[t] - counts[lo]
+        yield round((sums[t] - sums[lo]) / n * scale) if n else None
+
+
+def _rolling_columns(index: RollingIndex, days, seq) -> dict:
+    return {key: {str(window): seq(_rolling_column(index, name, scale, window, days))
+                  for window in ROLLING_WINDOWS}
+            for key, (name, scale) in ROLLING_METRICS.items()}
+
+
+def compute_rolling(index: RollingIndex | None, retention: dict | None = None, lazy: bool = False) -> dict:
+    """
+    Columnar N-day window series for every calendar day (from full_from with
+    retention): {"windows", "dates": [...], "<metric>": {"7": [...], "14": [...], ...}}
+    with deficit_avg, adherence_pct, protein_avg and steps_avg, rounded to integers
+    (None = nothing logged in the window). lazy leaves the columns as iterators.
+    """
+    if index is None:
+        return {}
+    seq = iter if lazy else list
+    first = max(index.offset(retention["full_from"]), 0) if retention else 0
+    days = range(first, index.days)
+    return {"windows": list(ROLLING_WINDOWS),
+            "dates": seq((index.start + timedelta(days=t)).isoformat() for t in days),
+            **_rolling_columns(index, days, seq)}
+
+
 # ── Merge & output ────────────────────────────────────────────────────────────
 
-def compute_body_comp(weight_series: list, config: dict) -> list:
+def compute_body_comp(weight: DailyTable, config: dict) -> DailyTable:
     """
     Compute BF% estimates (YMCA + Deurenberg), lean mass, FFMI
     for each weight entry that has a trend_kg value.
@@ -345,10 +1871,12 @@ def compute_body_comp(weight_series: list, config: dict) -> list:
     waist_in = athlete["waist_cm"] / 2.54
     bf_manual = athlete.get("bf_pct_manual")  # optional visual/caliper override
 
-    result = []
-    for entry in weight_series:
-        trend_kg = entry.get("trend_kg")
-        if trend_kg is None:
+    names = ["trend_kg", "ymca_bf_pct", "deurenberg_bf_pct", "estimated_bf_pct",
+             "avg_bf_pct", "lean_kg", "ffmi"]
+    dates = []
+    cols = {name: array("d") for name in names}
+    for date, trend_kg in zip(weight.dates, weight["trend_kg"]):
+        if is_nan(trend_kg):
             continue
 
         weight_lb = trend_kg * 2.20462
@@ -369,115 +1897,101 @@ def compute_body_comp(weight_series: list, config: dict) -> list:
         lean_kg = trend_kg * (1.0 - primary_bf / 100.0)
         ffmi = lean_kg / (height_m ** 2)
 
-        result.append({
-            "date": entry["date"],
-            "trend_kg": round(trend_kg, 2),
-            "ymca_bf_pct": round(ymca_bf, 1),
-            "deurenberg_bf_pct": round(deur_bf, 1),
-            "estimated_bf_pct": round(primary_bf, 1),
-            "avg_bf_pct": round(avg_bf, 1),
-            "lean_kg": round(lean_kg, 1),
-            "ffmi": round(ffmi, 2),
-        })
+        dates.append(date)
+        cols["trend_kg"].append(round(trend_kg, 2))
+        cols["ymca_bf_pct"].append(round(ymca_bf, 1))
+        cols["deurenberg_bf_pct"].append(round(deur_bf, 1))
+        cols["estimated_bf_pct"].append(round(primary_bf, 1))
+        cols["avg_bf_pct"].append(round(avg_bf, 1))
+        cols["lean_kg"].append(round(lean_kg, 1))
+        cols["ffmi"].append(round(ffmi, 2))
+
+    return DailyTable(dates, cols)
 
-    return result
 
+def week_ago_index(dates: list) -> int:
+    """Index of the last date on or before 7 calendar days before dates[-1] (-1 if none)."""
+    week_ago = (date_cls.fromisoformat(dates[-1]) - timedelta(days=7)).isoformat()
+    return bisect_right(dates, week_ago) - 1
 
-def compute_summary(body_comp: list, mf_daily_list: list = None) -> dict:
+
+def compute_summary(body_comp: DailyTable, rolling: RollingIndex | None = None) -> dict:
     """Pre-compute latest values for the Coach Brief card."""
-    if not body_comp:
+    if not len(body_comp):
         return {}
 
-    latest = body_comp[-1]
+    trend = body_comp["trend_kg"]
+    lean = body_comp["lean_kg"]
 
-    # 7-day weight delta
+    # 7-day weight delta: latest vs the last entry on or before 7 calendar days earlier
     weight_delta_7d = None
     lean_trend = "→"
-    if len(body_comp) >= 7:
-        week_ago = body_comp[-7]
-        weight_delta_7d = round(latest["trend_kg"] - week_ago["trend_kg"], 2)
-        lean_delta = latest["lean_kg"] - week_ago["lean_kg"]
+    i = week_ago_index(body_comp.dates)
+    if i >= 0:
+        weight_delta_7d = round(trend[-1] - trend[i], 2)
+        lean_delta = lean[-1] - lean[i]
         lean_trend = "↑" if lean_delta > 0.3 else ("↓" if lean_delta < -0.3 else "→")
 
-    # avg_deficit_7d: average (tdee - kcal) over last 7 days where both exist
+    # avg_deficit_7d: average (tdee - kcal) over the 7 days ending today where both exist
     avg_deficit_7d = None
-    if mf_daily_list:
-        today_str = date_cls.today().isoformat()
-        cutoff_str = (date_cls.today() - timedelta(days=7)).isoformat()
-        deficits = []
-        for day in mf_daily_list:
-            d = day.get("date", "")
-            if d < cutoff_str or d > today_str:
-                continue
-            tdee = day.get("tdee")
-            kcal = day.get("kcal")
-            if tdee is not None and kcal is not None:
-                deficits.append(tdee - kcal)
-        if deficits:
-            avg_deficit_7d = round(sum(deficits) / len(deficits), 0)
+    if rolling is not None:
+        mean = rolling.mean("deficit", date_cls.today().isoformat(), 7)
+        if mean is not None:
+            avg_deficit_7d = round(mean, 0)
 
     return {
-        "latest_date": latest["date"],
-        "trend_kg": latest["trend_kg"],
+        "latest_date": body_comp.dates[-1],
+        "trend_kg": trend[-1],
         "weight_delta_7d": weight_delta_7d,
-        "estimated_bf_pct": latest["estimated_bf_pct"],
-        "lean_kg": latest["lean_kg"],
+        "estimated_bf_pct": body_comp["estimated_bf_pct"][-1],
+        "lean_kg": lean[-1],
         "lean_trend": lean_trend,
-        "ffmi": latest["ffmi"],
+        "ffmi": body_comp["ffmi"][-1],
         "avg_deficit_7d": avg_deficit_7d,
     }
 
 
-def compute_cut(body_comp: list, mf_daily_list: list, config: dict) -> dict:
+def trend_slope_per_day(body_comp: DailyTable) -> float | None:
+    """OLS slope (kg/day) over the last 30 body_comp entries (all have trend_kg)."""
+    fit = fit_trends({"trend": body_comp["trend_kg"][-30:]}, min_n=7).get("trend")
+    return fit["slope"] if fit else None
+
+
+def project_date(kg_remaining: float, slope_per_day: float) -> str | None:
+    """Projected date to lose kg_remaining at slope_per_day; None unless losing ≥0.05 kg/week."""
+    if slope_per_day >= -0.05 / 7:
+        return None
+    days_to_target = kg_remaining / abs(slope_per_day)
+    projected = date_cls.today() + timedelta(days=days_to_target)
+    return projected.strftime("%Y-%m-%d")
+
+
+def compute_cut(body_comp: DailyTable, rolling: RollingIndex | None, config: dict) -> dict:
     """Compute cut progress metrics: target weight, rate of loss, projected completion."""
     athlete = config["athlete"]
     start_weight = athlete["start_weight_kg"]
     target_bf = athlete["target_bf_pct"] / 100.0
 
-    if not body_comp:
+    if not len(body_comp):
         return {}
 
-    latest = body_comp[-1]
-    lean_kg = latest["lean_kg"]
-    current_trend = latest["trend_kg"]
+    lean_kg = body_comp["lean_kg"][-1]
+    current_trend = body_comp["trend_kg"][-1]
     target_weight = round(lean_kg / (1 - target_bf), 1)
     kg_lost = round(start_weight - current_trend, 1)
     kg_remaining = round(current_trend - target_weight, 1)
 
-    # Rate of loss: linear regression over last 30 body_comp entries with trend_kg
-    recent = [e for e in body_comp if e.get("trend_kg") is not None][-30:]
     rate_kg_per_week = None
     projected_date = None
-    if len(recent) >= 7:
-        n = len(recent)
-        xs = list(range(n))
-        ys = [e["trend_kg"] for e in recent]
-        mean_x = sum(xs) / n
-        mean_y = sum(ys) / n
-        num = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
-        den = sum((x - mean_x) ** 2 for x in xs)
-        slope_per_day = num / den if den else 0  # kg per day
+    slope_per_day = trend_slope_per_day(body_comp)
+    if slope_per_day is not None:
         rate_kg_per_week = round(slope_per_day * 7, 2)
+        projected_date = project_date(kg_remaining, slope_per_day)
 
-        if slope_per_day < -0.05 / 7:  # losing at least 0.05 kg/week
-            days_to_target = kg_remaining / abs(slope_per_day)
-            projected = date_cls.today() + timedelta(days=days_to_target)
-            projected_date = projected.strftime("%Y-%m-%d")
-
-    # Count high-deficit days in last 7
-    today_str = date_cls.today().isoformat()
-    cutoff_str = (date_cls.today() - timedelta(days=7)).isoformat()
+    # Count high-deficit (>800 kcal) days in the last 7
     high_deficit_days = 0
-    for day in mf_daily_list:
-        d = day.get("date", "")
-        if d < cutoff_str or d > today_str:
-            continue
-        tdee = day.get("tdee")
-        kcal = day.get("kcal")
-        if tdee is not None and kcal is not None:
-            deficit = tdee - kcal
-            if deficit > 800:
-                high_deficit_days += 1
+    if rolling is not None:
+        high_deficit_days = int(rolling.window("high_deficit", date_cls.today().isoformat(), 7)[0])
 
     return {
         "start_weight_kg": start_weight,
@@ -491,30 +2005,289 @@ def compute_cut(body_comp: list, mf_daily_list: list, config: dict) -> dict:
     }
 
 
-def set_mps(s: dict) -> float:
+def set_mps(st: str, rir: int | None) -> float:
     """Return MPS weight for a single set based on set_type and RIR."""
-    st = s.get("set_type", "")
-    rir = s.get("rir")
     if st == "Drop":          return 0.2   # continuation leg after weight drop
     if st in ("Failure Set", "Drop Set"): return 1.0
     if rir is None:           return 0.75  # unknown effort — conservative
     return MPS_BY_RIR.get(rir, 0.1)        # RIR 5+ → warm-up territory
 
 
-def compute_mps_by_date(workouts: dict) -> dict:
+def compute_mps_by_date(workouts: WorkoutLog) -> dict:
     """Per-day average MPS multiplier derived from Workout Log set quality."""
+    types, rirs = workouts.set_types, workouts.rir
     result = {}
-    for date, workout in workouts.items():
-        sets = workout.get("sets", [])
+    for k, date in enumerate(workouts.dates):
+        sets = workouts.set_range(k)
         if not sets:
             result[date] = 1.0
             continue
-        total_mps  = sum(set_mps(s) for s in sets)
+        total_mps  = sum(set_mps(types[workouts.set_type[i]], None if rirs[i] == NO_INT else rirs[i])
+                         for i in sets)
         total_sets = len(sets)
         result[date] = round(total_mps / total_sets, 3) if total_sets else 1.0
     return result
 
 
+# ── Trend regression ──────────────────────────────────────────────────────────
+# One kernel for every trend in the dashboard: slope of y against its index
+# (session / week / day), optionally exponentially weighted toward recent
+# points. Everything that depends only on (n, half-life) — weights, x-mean,
+# Sxx — is computed once and shared by all series of that length, so fitting
+# hundreds of series costs one pass over each series' values.
+
+TREND_T_THRESHOLD = 1.5  # |t| > 1.5 ≈ 87% confidence in direction
+
+_trend_designs: dict[tuple, tuple] = {}
+
+
+def _trend_design(n: int, half_life: float | None) -> tuple:
+    key = (n, half_life)
+    design = _trend_designs.get(key)
+    if design is None:
+        if half_life is None:
+            ws = [1.0] * n
+        else:
+            lam = math.log(2) / half_life
+            ws = [math.exp(lam * (i - n + 1)) for i in range(n)]  # newest = 1, no overflow
+        w_total = mx = 0.0
+        for i, w in enumerate(ws):
+            w_total += w
+            mx += w * i
+        mx /= w_total
+        dx = [i - mx for i in range(n)]
+        sxx = 0.0
+        for w, d in zip(ws, dx):
+            sxx += w * d ** 2
+        design = _trend_designs[key] = (ws, w_total, mx, dx, sxx)
+    return design
+
+
+def fit_trends(series: dict, half_life: float | None = None, min_n: int = 3) -> dict:
+    """
+    Weighted least-squares slope per series: {name: [y, ...]} →
+    {name: {"n", "slope", "t_stat", "direction", "trend_line": [y0, y1]}}.
+    half_life=None is plain OLS; otherwise point i weighs e^(ln2·i/half_life).
+    Series shorter than min_n are omitted. t_stat is None when the fit is exact.
+    """
+    out = {}
+    for name, ys in series.items():
+        n = len(ys)
+        if n < min_n:
+            continue
+        ws, w_total, mx, dx, sxx = _trend_design(n, half_life)
+        my = 0.0
+        for w, y in zip(ws, ys):
+            my += w * y
+        my /= w_total
+        sxy = 0.0
+        for w, d, y in zip(ws, dx, ys):
+            sxy += w * d * (y - my)
+        slope = sxy / sxx if sxx else 0.0
+        rss = 0.0
+        for w, d, y in zip(ws, dx, ys):
+            r = y - (my + slope * d)
+            rss += w * r * r
+        sigma2 = rss / max(n - 2, 1)
+        if sigma2 > 0 and sxx:
+            t_stat = slope / math.sqrt(sigma2 / sxx)
+        else:
+            t_stat = math.copysign(math.inf, slope) if slope else 0.0
+        out[name] = {
+            "n": n,
+            "slope": slope,
+            "t_stat": t_stat if math.isfinite(t_stat) else None,
+            "direction": 1 if t_stat > TREND_T_THRESHOLD else (-1 if t_stat < -TREND_T_THRESHOLD else 0),
+            "trend_line": [my + slope * dx[0], my + slope * dx[-1]],
+        }
+    return out
+
+
+def trend_series(exercises: dict, push_pull_weekly: list, body_comp: DailyTable,
+                 mf_daily: DailyTable) -> dict:
+    """
+    The series compute_trends fits, as {family: ({name: [y, ...]}, fit_trends kwargs)}:
+      exercises — EW (half-life 4 sessions) over session-best e1RM (rounded to 0.1)
+      muscles / groups — EW (half-life 4 weeks) over weekly MPS sets
+      daily — trend weight and TDEE, OLS over the last 30 entries, slope per day
+    """
+    e1rm = {ex: [js_round1(e["e1rm"]) for e in x["history"]]
+            for ex, x in exercises["by_exercise"].items()}
+    muscles = {m: [w["muscles"][m]["mps"] for w in push_pull_weekly] for m in MUSCLE_GROUPS}
+    group_keys = [k[:-4] for k in (push_pull_weekly[0] if push_pull_weekly else {}) if k.endswith("_mps")]
+    groups = {k: [w[f"{k}_mps"] for w in push_pull_weekly] for k in group_keys}
+    tdee = [v for v in mf_daily["tdee"] if not is_nan(v)][-30:]
+    return {
+        "exercises": (e1rm, {"half_life": 4}),
+        "muscles": (muscles, {"half_life": 4}),
+        "groups": (groups, {"half_life": 4}),
+        "daily": ({"trend_weight": body_comp["trend_kg"][-30:], "tdee": tdee}, {"min_n": 7}),
+    }
+
+
+def compute_trends(exercises: dict, push_pull_weekly: list, body_comp: DailyTable,
+                   mf_daily: DailyTable) -> dict:
+    """Batched trend fits for the dashboard, over the series trend_series picks."""
+    fits = {family: fit_trends(series, **kw)
+            for family, (series, kw) in trend_series(exercises, push_pull_weekly, body_comp, mf_daily).items()}
+    daily = fits.pop("daily")
+    return {**fits, "trend_weight": daily.get("trend_weight"), "tdee": daily.get("tdee")}
+
+
+# ── Exercise analytics ────────────────────────────────────────────────────────
+# Per-exercise best-set history, all-time PRs and credibility inputs, computed
+# once here instead of on every dashboard load. Mirrors buildExMap /
+# computeCredibility / flagOutliers in public/app.js; only the recency factor
+# (which depends on the viewer's "today") is finished client-side.
+
+EQUIP_TRUST = {"free": 1.0, "cable": 0.92, "machine": 0.82, "egym": 0.55, "other": 0.78}
+
+_EQUIP_PATTERNS = [
+    ("egym",    re.compile(r"\begym\b", re.I)),
+    ("free",    re.compile(r"\bbarbell\b|\bdumbbell\b|\bez bar\b|\bplate.weighted\b", re.I)),
+    ("cable",   re.compile(r"\bcable\b", re.I)),
+    ("machine", re.compile(r"\bpin.loaded\b|\bplate.loaded\b|\bmachine\b", re.I)),
+]
+
+
+def js_round1(v: float) -> float:
+    """Math.round(v * 10) / 10 — half-up, unlike round()."""
+    return math.floor(v * 10 + 0.5) / 10
+
+
+def classify_equipment(ex: str) -> str:
+    for kind, pattern in _EQUIP_PATTERNS:
+        if pattern.search(ex):
+            return kind
+    return "other"
+
+
+def flag_outliers(values: list) -> list:
+    """MAD-based outlier flags (|v - median| > 2.5σ, σ = 1.4826·MAD)."""
+    n = len(values)
+    if n < 4:
+        return [False] * n
+    med = sorted(values)[n // 2]
+    mad = sorted(abs(v - med) for v in values)[n // 2]
+    sigma = 1.4826 * mad
+    if sigma < 2:
+        return [False] * n
+    return [abs(v - med) > 2.5 * sigma for v in values]
+
+
+def _credibility(ex: str, history: list) -> dict:
+    n = len(history)
+    e1rms = [e["e1rm"] for e in history]
+    dates = [e["date"] for e in history]
+    outliers = flag_outliers(e1rms)
+    clean = [(v, d) for v, d, out in zip(e1rms, dates, outliers) if not out]
+    clean_e1rms = [v for v, _ in clean]
+
+    # Recency-weighted mean (half-life 30 days). Ages are taken from the last
+    # session rather than today: a common factor the normalisation cancels out.
+    hl = math.log(2) / 30
+    last = date_cls.fromisoformat(dates[-1])
+    w_sum = w_total = 0.0
+    for v, d in clean:
+        w = math.exp(-hl * (last - date_cls.fromisoformat(d)).days)
+        w_sum += w * v
+        w_total += w
+    weighted_mean = w_sum / w_total if w_total > 0 else e1rms[-1]
+
+    sc = sorted(clean_e1rms)
+    if len(sc) >= 2:
+        robust_peak = sc[min(int(len(sc) * 0.9), len(sc) - 1)]
+    else:
+        robust_peak = sc[0] if sc and sc[0] else max(e1rms)
+
+    equip_type = classify_equipment(ex)
+    equip_factor = EQUIP_TRUST[equip_type]
+    session_factor = 1 - math.exp(-n / 5)
+
+    cv = 0.0
+    if len(clean_e1rms) >= 3:
+        mean = sum(clean_e1rms) / len(clean_e1rms)
+        std = math.sqrt(sum((v - mean) ** 2 for v in clean_e1rms) / len(clean_e1rms))
+        cv = std / mean if mean > 0 else 0
+    consistency_factor = 1 / (1 + cv * 4)
+
+    if len(clean_e1rms) >= 2:
+        clean_std = math.sqrt(sum((v - weighted_mean) ** 2 for v in clean_e1rms) / len(clean_e1rms))
+    else:
+        clean_std = robust_peak * 0.1
+    ci = js_round1((clean_std / math.sqrt(max(len(clean_e1rms), 1))) / equip_factor * 1.96)
+
+    return {
+        # confidence = min(1, base_confidence · exp(-days since last_date / 45))
+        "base_confidence": session_factor * equip_factor * consistency_factor,
+        "last_date": dates[-1],
+        "robust_peak": robust_peak,
+        "weighted_mean": weighted_mean,
+        "ci": ci,
+        "raw_best": js_round1(max(e1rms)),
+        "equip_type": equip_type,
+        "equip_factor": equip_factor,
+        "outliers": outliers,
+        "outlier_count": sum(outliers),
+    }
+
+
+def compute_exercises(workouts: WorkoutLog, body_comp: DailyTable) -> dict:
+    """
+    Per-exercise session-best e1RM history (Epley, assisted lifts use trend BW
+    minus assistance), all-time PR, working-set count and credibility inputs.
+    "order" ranks exercises by session count.
+    """
+    bw_dates, bw_values = body_comp.dates, body_comp["trend_kg"]
+    latest_bw = bw_values[-1] if len(bw_values) else None
+
+    def bw_at(date: str) -> float | None:
+        i = bisect_right(bw_dates, date)
+        return bw_values[i - 1] if i else latest_bw
+
+    names, weights, reps, rirs = workouts.exercises, workouts.weight_kg, workouts.reps, workouts.rir
+    drop = workouts._set_type_ids.get("Drop")
+    histories: dict[str, list] = {}
+    set_count: dict[str, int] = {}
+    for k, date in enumerate(workouts.dates):
+        # working sets: weight and reps present and non-zero, not a drop continuation
+        sets = [i for i in workouts.set_range(k)
+                if weights[i] and weights[i] == weights[i] and reps[i] and reps[i] != NO_INT
+                and workouts.set_type[i] != drop]
+        if not sets:
+            continue
+        bw = bw_at(date)
+        best: dict[str, dict] = {}
+        for i in sets:
+            ex, w = names[workouts.exercise[i]], weights[i]
+            is_assisted = w < 0
+            effective = (bw if bw is not None else 80) - abs(w) if is_assisted else w
+            e1rm = effective * (1 + reps[i] / 30)
+            if ex not in best or e1rm > best[ex]["e1rm"]:
+                best[ex] = {"date": date, "weight_kg": w, "effective_kg": js_round1(effective),
+                            "reps": reps[i], "e1rm": e1rm, "rir": None if rirs[i] == NO_INT else rirs[i],
+                            "is_assisted": is_assisted}
+        for ex, entry in best.items():
+            histories.setdefault(ex, []).append(entry)
+        for i in sets:
+            ex = names[workouts.exercise[i]]
+            set_count[ex] = set_count.get(ex, 0) + 1
+
+    by_exercise = {}
+    for ex, history in histories.items():
+        pr = max(history, key=lambda e: e["e1rm"])  # earliest session-best set wins ties
+        by_exercise[ex] = {
+            "history": history,
+            "pr": {k: pr[k] for k in ("weight_kg", "reps", "e1rm", "date", "is_assisted")},
+            "set_count": set_count[ex],
+            "credibility": _credibility(ex, history),
+        }
+    return {
+        "order": sorted(histories, key=lambda ex: -len(histories[ex])),
+        "by_exercise": by_exercise,
+    }
+
+
 def get_iso_week(date_str: str) -> tuple[str, str]:
     """Return (ISO-week label e.g. '2026-W07', monday date string)."""
     d = date_cls.fromisoformat(date_str)
@@ -533,153 +2306,1610 @@ def _zone(value: float, lm: dict) -> str:
     return "over"
 
 
-def compute_push_pull_weekly(muscle_sets: dict, mps_by_date: dict, config: dict) -> list:
-    """Aggregate MPS-weighted sets per ISO week into Push/Pull/Upper/Lower totals."""
-    lm = config.get("volume_landmarks", {})
-    by_week: dict[str, dict] = {}
+def compute_scenarios(weight: DailyTable, body_comp: DailyTable, config: dict) -> dict:
+    """
+    Body-comp / cut scenario matrix over config["scenarios"] = {"waist_cm": [...],
+    "target_bf_pct": [...]}. YMCA BF% is linear in the waist term, so one pass over
+    the trend series yields every waist's BF%/lean/FFMI; targets then only rescale
+    the latest lean mass. Scenarios use YMCA as primary (bf_pct_manual is ignored,
+    since it would make the waist axis meaningless).
 
-    for date in sorted(muscle_sets):
-        entry  = muscle_sets[date]
+    Rows of the 2-D fields are indexed by waist_cm, columns by target_bf_pct.
+    """
+    grid = config.get("scenarios")
+    if not grid or not len(body_comp):
+        return {}
+    athlete = config["athlete"]
+    waists = grid.get("waist_cm") or [athlete["waist_cm"]]
+    targets = grid.get("target_bf_pct") or [athlete["target_bf_pct"]]
+    height_sq = (athlete["height_cm"] / 100.0) ** 2
+
+    # Per-waist intercept of the YMCA numerator; only the latest trend entry and
+    # the one a week earlier (same calendar lookup as compute_summary) are read.
+    intercepts = [-98.42 + 4.15 * (w / 2.54) for w in waists]
+    dated = [(d, t) for d, t in zip(weight.dates, weight["trend_kg"]) if not is_nan(t)]
+    if not dated:
+        return {}
+
+    def lean_per_waist(trend_kg: float) -> list:
+        inv_lb = 1.0 / (trend_kg * 2.20462)
+        lean = []
+        for a in intercepts:
+            bf = (a * inv_lb - 0.082) * 100
+            lean.append(trend_kg * (1.0 - bf / 100.0))
+        return lean
+
+    current_trend = dated[-1][1]
+    i = week_ago_index([d for d, _ in dated])
+    latest_lean = lean_per_waist(current_trend)
+    week_ago_lean = lean_per_waist(dated[i][1]) if i >= 0 else None
+    slope_per_day = trend_slope_per_day(body_comp)
+    out = {
+        "waist_cm": waists,
+        "target_bf_pct": targets,
+        "ymca_bf_pct": [],
+        "lean_kg": [],
+        "lean_delta_7d": [],
+        "ffmi": [],
+        "target_weight_kg": [],
+        "kg_remaining": [],
+        "projected_completion_date": [],
+    }
+    for k, latest in enumerate(latest_lean):
+        out["ymca_bf_pct"].append(round((1.0 - latest / current_trend) * 100, 1))
+        out["lean_kg"].append(round(latest, 1))
+        out["lean_delta_7d"].append(round(latest - week_ago_lean[k], 2) if week_ago_lean else None)
+        out["ffmi"].append(round(latest / height_sq, 2))
+        target_w, remaining, projected = [], [], []
+        for target in targets:
+            tw = round(round(latest, 1) / (1 - target / 100.0), 1)
+            kg_rem = round(current_trend - tw, 1)
+            target_w.append(tw)
+            remaining.append(kg_rem)
+            projected.append(project_date(kg_rem, slope_per_day) if slope_per_day is not None else None)
+        out["target_weight_kg"].append(target_w)
+        out["kg_remaining"].append(remaining)
+        out["projected_completion_date"].append(projected)
+    return out
+
+
+def group_key(name: str) -> str:
+    """'Posterior chain' → 'posterior_chain' (prefix for the *_mps/_raw/_zone keys)."""
+    return re.sub(r"\W+", "_", name.strip().lower()).strip("_")
+
+
+def volume_membership(config: dict) -> list:
+    """
+    Group-by-muscle membership matrix as [(name, key, [muscle index, ...])].
+    Groups come from DEFAULT_VOLUME_GROUPS updated with config["volume_groups"],
+    merged on group_key so "push" or "Push " replaces the default Push group.
+    """
+    groups = {group_key(name): (name, muscles) for name, muscles in DEFAULT_VOLUME_GROUPS.items()}
+    configured = {}
+    for name, muscles in config.get("volume_groups", {}).items():
+        key = group_key(name)
+        if not key:
+            raise SystemExit(f"volume_groups: {name!r} has no letters or digits to build its keys from")
+        if key in configured:
+            raise SystemExit(f"volume_groups: {configured[key]!r} and {name!r} both report as "
+                             f"{key}_mps/_raw/_zone; rename one")
+        configured[key] = name
+        groups[key] = (name, muscles)
+    index = {m: j for j, m in enumerate(MUSCLE_GROUPS)}
+    matrix = []
+    for key, (name, muscles) in groups.items():
+        unknown = [m for m in muscles if m not in index]
+        if unknown:
+            print(f"  Warning: volume group {name!r} ignores unknown muscles {unknown}")
+        matrix.append((name, key, sorted(index[m] for m in muscles if m in index)))
+    return matrix
+
+
+def _muscle_rows(muscle_sets: DailyTable):
+    """Yield (position, date, [raw sets per MUSCLE_GROUPS muscle]) with NaN → 0.0."""
+    cols = [muscle_sets[m] for m in MUSCLE_GROUPS]
+    for i, date in enumerate(muscle_sets.dates):
+        yield i, date, [0.0 if is_nan(v) else v for v in (col[i] for col in cols)]
+
+
+def aggregate_weekly_volume(muscle_sets: DailyTable, mps_by_date: dict, matrix: list) -> dict:
+    """
+    One pass over the muscle_sets table: per ISO week, training days plus raw and
+    MPS-weighted set vectors over MUSCLE_GROUPS and over the matrix's groups →
+    {week: {"week_start", ...}}. Group totals are added set by set, day by day,
+    so they round exactly as the original per-day accumulation did.
+    """
+    n, g = len(MUSCLE_GROUPS), len(matrix)
+    members = [m for _, _, m in matrix]
+    by_week: dict[str, dict] = {}
+    for _, date, raws in _muscle_rows(muscle_sets):
         mult   = mps_by_date.get(date, 1.0)
         wk, ws = get_iso_week(date)
-        if wk not in by_week:
-            by_week[wk] = {"week": wk, "week_start": ws,
-                           "push_mps": 0.0, "pull_mps": 0.0,
-                           "upper_mps": 0.0, "lower_mps": 0.0,
-                           "push_raw": 0.0, "pull_raw": 0.0,
-                           "upper_raw": 0.0, "lower_raw": 0.0,
-                           "training_days": 0}
-        by_week[wk]["training_days"] += 1
-
-        for muscle in MUSCLE_GROUPS:
-            raw = entry.get(muscle) or 0.0
-            mps = raw * mult
-            if muscle in PUSH_MUSCLES:
-                by_week[wk]["push_raw"] += raw;  by_week[wk]["push_mps"]  += mps
-            if muscle in PULL_MUSCLES:
-                by_week[wk]["pull_raw"] += raw;  by_week[wk]["pull_mps"]  += mps
-            if muscle in UPPER_MUSCLES:
-                by_week[wk]["upper_raw"] += raw; by_week[wk]["upper_mps"] += mps
-            if muscle in LOWER_MUSCLES:
-                by_week[wk]["lower_raw"] += raw; by_week[wk]["lower_mps"] += mps
-
+        w = by_week.get(wk)
+        if w is None:
+            w = by_week[wk] = {"week_start": ws, "training_days": 0,
+                               "raw": [0.0] * n, "mps": [0.0] * n,
+                               "group_raw": [0.0] * g, "group_mps": [0.0] * g}
+        w["training_days"] += 1
+        acc_raw, acc_mps = w["raw"], w["mps"]
+        mps = [raw * mult for raw in raws]
+        for j, raw in enumerate(raws):
+            acc_raw[j] += raw
+            acc_mps[j] += mps[j]
+        group_raw, group_mps = w["group_raw"], w["group_mps"]
+        for k, idx in enumerate(members):
+            for j in idx:
+                group_raw[k] += raws[j]
+                group_mps[k] += mps[j]
+    return by_week
+
+
+def compute_push_pull_weekly(by_week: dict, config: dict, matrix: list | None = None) -> list:
+    """
+    Round aggregate_weekly_volume's muscle and group totals (the matrix gives
+    the groups' names and keys, in the order they were accumulated) and zone
+    them against the configured landmarks.
+    """
+    lm = config.get("volume_landmarks", {})
     muscle_lm = config.get("muscle_landmarks", {})
-    # Per-muscle weekly MPS accumulator alongside group totals
-    for wk in by_week:
-        by_week[wk]["muscle_mps"]  = {m: 0.0 for m in MUSCLE_GROUPS}
-        by_week[wk]["muscle_raw"]  = {m: 0.0 for m in MUSCLE_GROUPS}
-
-    for date in sorted(muscle_sets):
-        entry  = muscle_sets[date]
-        mult   = mps_by_date.get(date, 1.0)
-        wk, _  = get_iso_week(date)
-        for muscle in MUSCLE_GROUPS:
-            raw = entry.get(muscle) or 0.0
-            by_week[wk]["muscle_mps"][muscle]  += raw * mult
-            by_week[wk]["muscle_raw"][muscle]  += raw
+    matrix = matrix or volume_membership(config)
 
     result = []
     for wk in sorted(by_week):
         w = by_week[wk]
-        push  = round(w["push_mps"],  1)
-        pull  = round(w["pull_mps"],  1)
-        upper = round(w["upper_mps"], 1)
-        lower = round(w["lower_mps"], 1)
+        acc_raw, acc_mps = w["raw"], w["mps"]
+        mps_keys, raw_keys, zone_keys = {}, {}, {}
+        totals = {}
+        for k, (name, key, _) in enumerate(matrix):
+            total = round(w["group_mps"][k], 1)
+            totals[key] = total
+            mps_keys[f"{key}_mps"] = total
+            raw_keys[f"{key}_raw"] = round(w["group_raw"][k], 1)
+            zone_keys[f"{key}_zone"] = _zone(total, lm.get(name, {}))
 
         muscles_out = {}
-        for muscle in MUSCLE_GROUPS:
-            mps = round(w["muscle_mps"][muscle], 1)
+        for j, muscle in enumerate(MUSCLE_GROUPS):
+            mps = round(acc_mps[j], 1)
             muscles_out[muscle] = {
                 "mps":  mps,
-                "raw":  round(w["muscle_raw"][muscle], 1),
+                "raw":  round(acc_raw[j], 1),
                 "zone": _zone(mps, muscle_lm.get(muscle, {})),
             }
 
+        push, pull = totals.get("push"), totals.get("pull")
         result.append({
             "week":            wk,
             "week_start":      w["week_start"],
             "training_days":   w["training_days"],
-            "push_mps":        push,
-            "pull_mps":        pull,
-            "upper_mps":       upper,
-            "lower_mps":       lower,
-            "push_raw":        round(w["push_raw"],  1),
-            "pull_raw":        round(w["pull_raw"],  1),
-            "upper_raw":       round(w["upper_raw"], 1),
-            "lower_raw":       round(w["lower_raw"], 1),
-            "push_pull_ratio": round(push / pull, 2) if pull > 0 else None,
-            "push_zone":       _zone(push,  lm.get("Push",  {})),
-            "pull_zone":       _zone(pull,  lm.get("Pull",  {})),
-            "upper_zone":      _zone(upper, lm.get("Upper", {})),
-            "lower_zone":      _zone(lower, lm.get("Lower", {})),
+            **mps_keys,
+            **raw_keys,
+            "push_pull_ratio": round(push / pull, 2) if push is not None and pull else None,
+            **zone_keys,
             "muscles":         muscles_out,
         })
     return result
 
 
-def build_weight_series(mf_daily: dict, hc_weight: list) -> list:
+def compute_volume_rolling(muscle_sets: DailyTable, mps_by_date: dict, config: dict,
+                           matrix: list | None = None) -> dict:
+    """
+    Trailing N-day group MPS for every calendar day, one series per window in
+    config["volume_rolling_days"] (e.g. [7]). Uses per-muscle prefix sums over a
+    dense calendar; zones scale the weekly landmarks by N/7.
+    """
+    windows = config.get("volume_rolling_days", [])
+    if not windows or not len(muscle_sets):
+        return {}
+    lm = config.get("volume_landmarks", {})
+    matrix = matrix or volume_membership(config)
+    n = len(MUSCLE_GROUPS)
+
+    first = date_cls.fromisoformat(muscle_sets.dates[0])
+    days = (date_cls.fromisoformat(muscle_sets.dates[-1]) - first).days + 1
+    daily = [[0.0] * n for _ in range(days)]
+    for _, date, raws in _muscle_rows(muscle_sets):
+        mult = mps_by_date.get(date, 1.0)
+        daily[(date_cls.fromisoformat(date) - first).days] = [raw * mult for raw in raws]
+
+    prefix = [[0.0] * n]
+    for row in daily:
+        prev = prefix[-1]
+        prefix.append([p + v for p, v in zip(prev, row)])
+
+    out = {}
+    for window in windows:
+        series = []
+        for t in range(days):
+            hi, lo = prefix[t + 1], prefix[max(0, t + 1 - window)]
+            muscle_sum = [h - l for h, l in zip(hi, lo)]
+            row = {"date": (first + timedelta(days=t)).isoformat()}
+            for name, key, members in matrix:
+                total = round(sum(muscle_sum[j] for j in members), 1)
+                row[f"{key}_mps"] = total
+                row[f"{key}_zone"] = _zone(total * 7 / window, lm.get(name, {}))
+            series.append(row)
+        out[str(window)] = series
+    return out
+
+
+def build_weight_series(mf_daily: DailyTable, hc_weight: list) -> DailyTable:
     """
     Unified weight series: MF trend weight preferred; HC raw weight as fallback.
+    Columns: trend_kg, mf_kg (MF scale weight), hc_kg (HC scale weight).
     """
     hc_by_date = {e["date"]: e["kg"] for e in hc_weight}
-    all_dates = sorted(set(mf_daily.keys()) | set(hc_by_date.keys()))
-    result = []
-    for date in all_dates:
-        mf = mf_daily.get(date)
-        trend = mf.get("trend_weight_kg") if mf else None
-        raw_mf = mf.get("weight_kg") if mf else None
-        hc_kg = hc_by_date.get(date)
-        result.append({
-            "date": date,
-            "trend_kg": trend,
-            "raw_kg": raw_mf if raw_mf is not None else hc_kg,
-            "source": "mf" if raw_mf is not None else ("hc" if hc_kg else "none"),
+    mf_pos = {d: i for i, d in enumerate(mf_daily.dates)}
+    dates = sorted(set(mf_pos) | set(hc_by_date))
+    trend_src, mf_src = mf_daily["trend_weight_kg"], mf_daily["weight_kg"]
+    trend, mf_kg, hc_kg = array("d"), array("d"), array("d")
+    for date in dates:
+        i = mf_pos.get(date)
+        trend.append(NAN if i is None else trend_src[i])
+        mf_kg.append(NAN if i is None else mf_src[i])
+        hc = hc_by_date.get(date)
+        hc_kg.append(NAN if hc is None else hc)
+    return DailyTable(dates, {"trend_kg": trend, "mf_kg": mf_kg, "hc_kg": hc_kg})
+
+
+def weight_records(weight: DailyTable, retention: dict | None = None, lazy: bool = False):
+    """Output-edge rows for the "weight" section: the days retention keeps (a generator if lazy)."""
+    weight = weight.since(retention and retention["full_from"])
+
+    def rows():
+        for date, trend, mf_kg, hc_kg in zip(weight.dates, weight["trend_kg"], weight["mf_kg"], weight["hc_kg"]):
+            has_mf = not is_nan(mf_kg)
+            has_hc = not is_nan(hc_kg)
+            yield {
+                "date": date,
+                "trend_kg": None if is_nan(trend) else trend,
+                "raw_kg": mf_kg if has_mf else (hc_kg if has_hc else None),
+                "source": "mf" if has_mf else ("hc" if has_hc and hc_kg else "none"),
+            }
+    return rows() if lazy else list(rows())
+
+
+def daily_records(mf_daily: DailyTable, retention: dict | None = None, lazy: bool = False):
+    """
+    Output-edge rows for "mf_daily" (the days retention keeps), each enriched with
+    a deficit field (a generator if lazy).
+    """
+    mf_daily = mf_daily.since(retention and retention["full_from"])
+
+    def rows():
+        for row, tdee, kcal in zip(mf_daily.to_records(lazy=True), mf_daily["tdee"], mf_daily["kcal"]):
+            row["deficit"] = round(tdee - kcal, 0) if not is_nan(tdee) and not is_nan(kcal) else None
+            yield row
+    return rows() if lazy else list(rows())
+
+
+# ── Downsampled series ────────────────────────────────────────────────────────
+# The range charts get each series at weekly and monthly resolution next to the
+# daily rows, so a long range draws a few hundred points instead of every day.
+# Buckets are calendar weeks/months, so a new day only changes the last bucket
+# or two (small delta patches). Line series keep one real day per bucket, picked
+# by Largest-Triangle-Three-Buckets; bar series get the bucket mean.
+
+SERIES_RESOLUTIONS = {
+    "weekly": lambda date: get_iso_week(date)[1],
+    "monthly": lambda date: date[:8] + "01",
+}
+
+# chart series → (table, columns, "lttb" | "mean")
+CHART_SERIES = {
+    "body_comp": ("body_comp", ("trend_kg", "lean_kg", "ffmi", "ymca_bf_pct", "deurenberg_bf_pct"), "lttb"),
+    "tdee": ("mf_daily", ("tdee", "kcal"), "lttb"),
+    "nutrition": ("mf_daily", ("protein_g", "target_protein_g", "kcal", "target_kcal"), "mean"),
+}
+
+
+def _buckets(dates: list, columns: list, bucket_of) -> list[list[int]]:
+    """Row indices per calendar bucket, skipping rows with nothing in `columns`."""
+    buckets, last = [], None
+    for i, date in enumerate(dates):
+        if all(is_nan(col[i]) for col in columns):
+            continue
+        key = bucket_of(date)
+        if key != last:
+            buckets.append([])
+            last = key
+        buckets[-1].append(i)
+    return buckets
+
+
+def lttb_rows(dates: list, columns: list, buckets: list[list[int]]) -> list[int]:
+    """
+    One row per bucket: the first bucket's first row, the last bucket's last row,
+    and in between the row making the largest triangle with the row picked before
+    it and the next bucket's average. Each column's area is scaled by its range so
+    every series counts equally; NaN values contribute nothing.
+    """
+    if len(buckets) < 3:
+        return [b[0] for b in buckets[:1]] + [b[-1] for b in buckets[1:]]
+    x = [date_cls.fromisoformat(d).toordinal() for d in dates]
+    scale = []
+    for col in columns:
+        vals = [v for v in col if not is_nan(v)]
+        spread = max(vals) - min(vals) if vals else 0
+        scale.append(1 / spread if spread else 1.0)
+    picked = [buckets[0][0]]
+    for k in range(1, len(buckets) - 1):
+        nxt = buckets[k + 1]
+        cx = sum(x[j] for j in nxt) / len(nxt)
+        cy = []
+        for col in columns:
+            vals = [col[j] for j in nxt if not is_nan(col[j])]
+            cy.append(sum(vals) / len(vals) if vals else NAN)
+        a = picked[-1]
+        best, best_area = buckets[k][0], -1.0
+        for i in buckets[k]:
+            area = 0.0
+            for col, s, c in zip(columns, scale, cy):
+                ya, yb = col[a], col[i]
+                if not (is_nan(ya) or is_nan(yb) or is_nan(c)):
+                    area += abs((x[a] - cx) * (yb - ya) - (x[a] - x[i]) * (c - ya)) * s
+            if area > best_area:
+                best, best_area = i, area
+        picked.append(best)
+    picked.append(buckets[-1][-1])
+    return picked
+
+
+def compute_chart_series(body_comp: DailyTable, mf_daily: DailyTable) -> dict:
+    """
+    {"<chart series>": {"weekly": [rows], "monthly": [rows]}} for CHART_SERIES.
+    LTTB rows are real days ({"date", col: value|None}); mean rows are dated by the
+    bucket's first day (Monday / the 1st), rounded to 0.1.
+    """
+    tables = {"body_comp": body_comp, "mf_daily": mf_daily}
+    out = {}
+    for name, (table_name, names, method) in CHART_SERIES.items():
+        table = tables[table_name]
+        columns = [table[n] for n in names]
+        out[name] = {}
+        for resolution, bucket_of in SERIES_RESOLUTIONS.items():
+            buckets = _buckets(table.dates, columns, bucket_of)
+            rows = []
+            if method == "lttb":
+                for i in lttb_rows(table.dates, columns, buckets):
+                    row = {"date": table.dates[i]}
+                    for n, col in zip(names, columns):
+                        v = col[i]
+                        row[n] = None if is_nan(v) else (int(v) if n in table.int_columns else v)
+                    rows.append(row)
+            else:
+                for bucket in buckets:
+                    row = {"date": bucket_of(table.dates[bucket[0]])}
+                    for n, col in zip(names, columns):
+                        vals = [col[i] for i in bucket if not is_nan(col[i])]
+                        row[n] = round(sum(vals) / len(vals), 1) if vals else None
+                    rows.append(row)
+            out[name][resolution] = rows
+    return out
+
+
+# ── Retention ─────────────────────────────────────────────────────────────────
+# With config["retention"] = {"daily_days": 90, "weekly_days": 730}, data.json
+# keeps every per-day or per-session section (mf_daily, rolling, muscle_sets,
+# muscle_volume, workouts, exercise histories, weight, body_comp) only for the
+# last daily_days, and rolls older history up into "rollups": weekly back to
+# weekly_days, monthly before that. Both spans end on the latest logged day and
+# start on a Monday, so every weekly rollup is a whole week. Only the output is
+# compacted: PRs, trends, zones and the chart series still see every day.
+
+RETENTION_DAILY_DAYS = 90  # "daily_days" when the config only sets weekly_days
+
+
+def compute_retention(mf_daily: DailyTable, workouts: WorkoutLog, config: dict) -> dict | None:
+    """{"full_from", "weekly_from"} dates for config["retention"], or None without it."""
+    tiers = config.get("retention")
+    if not tiers:
+        return None
+    if not isinstance(tiers, dict) or not set(tiers) <= {"daily_days", "weekly_days"}:
+        raise SystemExit('retention: expected {"daily_days": N, "weekly_days": M} '
+                         f"(both optional), got {tiers!r}")
+    daily_days = tiers.get("daily_days", RETENTION_DAILY_DAYS)
+    for key, days in (("daily_days", daily_days), ("weekly_days", tiers.get("weekly_days"))):
+        if days is not None and (type(days) is not int or days < 1):
+            raise SystemExit(f"retention.{key} must be a whole number of days ≥ 1, got {days!r}")
+    latest = max(mf_daily.dates[-1:] + workouts.dates[-1:], default=None)
+    if latest is None:
+        return None
+    end = date_cls.fromisoformat(latest)
+
+    def monday(days: int | None) -> str | None:
+        if days is None:
+            return None
+        d = end - timedelta(days=days - 1)
+        return (d - timedelta(days=d.weekday())).isoformat()
+
+    full_from = monday(daily_days)
+    weekly_from = monday(tiers.get("weekly_days"))  # None: weekly all the way back
+    return {"full_from": full_from, "weekly_from": weekly_from and min(weekly_from, full_from)}
+
+
+def _tiers(dates: list, retention: dict):
+    """(resolution, bucket key, row indices) for the rows older than full_from."""
+    stop = bisect_left(dates, retention["full_from"])
+    split = bisect_left(dates, retention["weekly_from"], hi=stop) if retention["weekly_from"] else 0
+    for resolution, lo, hi in (("monthly", 0, split), ("weekly", split, stop)):
+        bucket_of = SERIES_RESOLUTIONS[resolution]
+        i = lo
+        while i < hi:
+            key = bucket_of(dates[i])
+            j = i + 1
+            while j < hi and bucket_of(dates[j]) == key:
+                j += 1
+            yield resolution, key, range(i, j)
+            i = j
+
+
+def _rollup_daily(table: DailyTable, retention: dict, how: str) -> dict:
+    """Per-bucket rows of a DailyTable: column means (how="mean") or sums, with the days logged."""
+    out = {"weekly": [], "monthly": []}
+    for resolution, key, rows in _tiers(table.dates, retention):
+        row = {"date": key, "days": len(rows)}
+        for name, col in table.columns.items():
+            vals = [col[i] for i in rows if not is_nan(col[i])]
+            if not vals:
+                row[name] = None
+            elif how == "mean":
+                row[name] = round(sum(vals) / len(vals), 1)
+            else:
+                row[name] = round(sum(vals), 2)
+        out[resolution].append(row)
+    return out
+
+
+def _rollup_workouts(workouts: WorkoutLog, retention: dict) -> dict:
+    """Per-bucket sessions, sets, volume (kg × reps), duration and sets per exercise."""
+    out = {"weekly": [], "monthly": []}
+    for resolution, key, sessions in _tiers(workouts.dates, retention):
+        sets = range(workouts.start[sessions.start], workouts.start[sessions.stop])
+        per_exercise: dict[str, int] = {}
+        volume = 0.0
+        for i in sets:
+            name = workouts.exercises[workouts.exercise[i]]
+            per_exercise[name] = per_exercise.get(name, 0) + 1
+            w, r = workouts.weight_kg[i], workouts.reps[i]
+            if not is_nan(w) and r != NO_INT:
+                volume += w * r
+        durations = [workouts.durations[k] for k in sessions if workouts.durations[k] is not None]
+        out[resolution].append({
+            "date": key,
+            "sessions": len(sessions),
+            "sets": len(sets),
+            "volume_kg": round(volume),
+            "duration_sec": sum(durations) if durations else None,
+            "exercises": dict(sorted(per_exercise.items(), key=lambda kv: (-kv[1], kv[0]))),
         })
-    return result
+    return out
+
+
+def _rollup_exercises(exercises: dict, retention: dict) -> dict:
+    """Per exercise and bucket: sessions and the best session-best set (e1RM, weight, reps)."""
+    out = {"weekly": {}, "monthly": {}}
+    for ex, x in exercises["by_exercise"].items():
+        history = x["history"]
+        for resolution, key, rows in _tiers([e["date"] for e in history], retention):
+            best = max((history[i] for i in rows), key=lambda e: e["e1rm"])
+            out[resolution].setdefault(ex, []).append({
+                "date": key,
+                "sessions": len(rows),
+                "e1rm": js_round1(best["e1rm"]),
+                "weight_kg": best["weight_kg"],
+                "reps": best["reps"],
+            })
+    return out
+
+
+def _rollup_rolling(index: RollingIndex | None, retention: dict) -> dict:
+    """The rolling windows as of each bucket's last calendar day, columnar like "rolling"."""
+    out = {"weekly": {}, "monthly": {}}
+    if index is None:
+        return out
+    stop = min(max(index.offset(retention["full_from"]), 0), index.days)
+    dates = [(index.start + timedelta(days=t)).isoformat() for t in range(stop)]
+    ends = {"weekly": [], "monthly": []}
+    keys = {"weekly": [], "monthly": []}
+    for resolution, key, rows in _tiers(dates, retention):
+        keys[resolution].append(key)
+        ends[resolution].append(rows[-1])
+    for resolution in out:
+        if keys[resolution]:
+            out[resolution] = {"dates": keys[resolution], **_rolling_columns(index, ends[resolution], list)}
+    return out
+
+
+def compute_rollups(mf_daily: DailyTable, muscle_sets: DailyTable, muscle_volume: DailyTable,
+                    workouts: WorkoutLog, exercises: dict, rolling_index: RollingIndex | None,
+                    weight: DailyTable, body_comp: DailyTable, retention: dict | None) -> dict:
+    """
+    {"full_from", "weekly_from", "weekly": {section: rows}, "monthly": {...}} for the
+    history compute_retention drops from data.json; {} if it drops nothing. Each
+    row is dated by its bucket's Monday or 1st: mf_daily, weight and body_comp roll
+    up as means and muscle_sets/muscle_volume as sums (counting the days logged),
+    exercises as {name: rows} of each bucket's best set, and rolling as the window
+    values on each bucket's last day.
+    """
+    if retention is None:
+        return {}
+    deficit = array("d", (t - k for t, k in zip(mf_daily["tdee"], mf_daily["kcal"])))
+    daily = DailyTable(mf_daily.dates, {**mf_daily.columns, "deficit": deficit}, mf_daily.int_columns)
+    sections = {
+        "mf_daily": _rollup_daily(daily, retention, "mean"),
+        "muscle_sets": _rollup_daily(muscle_sets, retention, "sum"),
+        "muscle_volume": _rollup_daily(muscle_volume, retention, "sum"),
+        "workouts": _rollup_workouts(workouts, retention),
+        "exercises": _rollup_exercises(exercises, retention),
+        "rolling": _rollup_rolling(rolling_index, retention),
+        "weight": _rollup_daily(weight, retention, "mean"),
+        "body_comp": _rollup_daily(body_comp, retention, "mean"),
+    }
+    if not any(rows for s in sections.values() for rows in s.values()):
+        return {}  # nothing older than full_from yet
+    return {**retention, **{res: {name: s[res] for name, s in sections.items()} for res in ("weekly", "monthly")}}
+
+
+def recent_records(table: DailyTable, retention: dict | None, lazy: bool = False):
+    """to_records for the rows retention keeps day by day."""
+    return table.since(retention and retention["full_from"]).to_records(lazy)
+
+
+def recent_workouts(workouts: WorkoutLog, retention: dict | None, lazy: bool = False) -> dict:
+    """to_json for the sessions retention keeps set by set."""
+    return workouts.since(retention and retention["full_from"]).to_json(lazy)
+
+
+def recent_exercises(exercises: dict, retention: dict | None, lazy: bool = False) -> dict:
+    """
+    The exercises section with each e1RM history, and the outlier flags parallel
+    to it, cut at full_from. A cut entry adds "sessions" (the full count) and
+    "earlier_best_e1rm"; PRs, set counts and credibility still cover every session.
+    """
+    if retention is None:
+        return exercises
+    by_exercise = {}
+    for ex, x in exercises["by_exercise"].items():
+        history = x["history"]
+        k = bisect_left([e["date"] for e in history], retention["full_from"])
+        if not k:
+            by_exercise[ex] = x
+            continue
+        by_exercise[ex] = {
+            **x,
+            "history": history[k:],
+            "credibility": {**x["credibility"], "outliers": x["credibility"]["outliers"][k:]},
+            "sessions": len(history),
+            "earlier_best_e1rm": max(e["e1rm"] for e in history[:k]),
+        }
+    return {**exercises, "by_exercise": by_exercise}
+
+
+# ── Output stage graph ────────────────────────────────────────────────────────
+# build_output runs OUTPUT_STAGES in order. Each stage is keyed on the keys of the
+# stages/sources it consumes, the config keys it reads and (for stages that look
+# at date.today()) the date, so a landmark edit re-runs only the zoning stages.
+# Every key also covers a digest of this file, so upgrading or editing the parser
+# (a stage or any helper it calls) re-runs the stages instead of serving results
+# pickled by older code. Results persist in CACHE_DIR/stages/ between runs (and in
+# memory for --watch).
+
+STAGE_CODE_DIGEST = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()[:16]
+
+# name → {"fn", "inputs": positional args (stages, sources or "config"),
+#         "config": config keys read, "today": reads date.today(),
+#         "edge": only serialises for data.json (--stream writes these lazily instead)}
+OUTPUT_STAGES = {
+    "weight_series":    {"fn": build_weight_series, "inputs": ("mf_daily", "hc_weight")},
+    "body_comp":        {"fn": compute_body_comp, "inputs": ("weight_series", "config"), "config": ("athlete",)},
+    "rolling_index":    {"fn": build_rolling_index, "inputs": ("mf_daily",)},
+    "summary":          {"fn": compute_summary, "inputs": ("body_comp", "rolling_index"), "today": True},
+    "cut":              {"fn": compute_cut, "inputs": ("body_comp", "rolling_index", "config"),
+                         "config": ("athlete",), "today": True},
+    "scenarios":        {"fn": compute_scenarios, "inputs": ("weight_series", "body_comp", "config"),
+                         "config": ("athlete", "scenarios"), "today": True},
+    "mps_by_date":      {"fn": compute_mps_by_date, "inputs": ("workouts",)},
+    "volume_matrix":    {"fn": volume_membership, "inputs": ("config",), "config": ("volume_groups",)},
+    "weekly_volume":    {"fn": aggregate_weekly_volume, "inputs": ("muscle_sets", "mps_by_date", "volume_matrix")},
+    "push_pull_weekly": {"fn": compute_push_pull_weekly, "inputs": ("weekly_volume", "config", "volume_matrix"),
+                         "config": ("volume_landmarks", "muscle_landmarks")},
+    "volume_rolling":   {"fn": compute_volume_rolling,
+                         "inputs": ("muscle_sets", "mps_by_date", "config", "volume_matrix"),
+                         "config": ("volume_rolling_days", "volume_landmarks")},
+    "exercises":        {"fn": compute_exercises, "inputs": ("workouts", "body_comp")},
+    "trends":           {"fn": compute_trends, "inputs": ("exercises", "push_pull_weekly", "body_comp", "mf_daily")},
+    "series":           {"fn": compute_chart_series, "inputs": ("body_comp", "mf_daily")},
+    "retention":        {"fn": compute_retention, "inputs": ("mf_daily", "workouts", "config"),
+                         "config": ("retention",)},
+    "rollups":          {"fn": compute_rollups,
+                         "inputs": ("mf_daily", "muscle_sets", "muscle_volume", "workouts", "exercises",
+                                    "rolling_index", "weight_series", "body_comp", "retention")},
+    "mf_daily_records": {"fn": daily_records, "inputs": ("mf_daily", "retention"), "edge": True},
+    "rolling":          {"fn": compute_rolling, "inputs": ("rolling_index", "retention"), "edge": True},
+    "muscle_sets_records":   {"fn": recent_records, "inputs": ("muscle_sets", "retention"), "edge": True},
+    "muscle_volume_records": {"fn": recent_records, "inputs": ("muscle_volume", "retention"), "edge": True},
+    "workout_records":  {"fn": recent_workouts, "inputs": ("workouts", "retention"), "edge": True},
+    "exercise_records": {"fn": recent_exercises, "inputs": ("exercises", "retention"), "edge": True},
+    "weight_records":   {"fn": weight_records, "inputs": ("weight_series", "retention"), "edge": True},
+    "body_comp_records": {"fn": recent_records, "inputs": ("body_comp", "retention"), "edge": True},
+}
+
+_STAGE_MEMO: dict[str, dict] = {}  # name → persisted entry, for long-lived processes
+
+
+def _digest(value) -> str:
+    """Content hash of a source value (DailyTable/WorkoutLog arrays hashed as raw bytes)."""
+    h = hashlib.sha1()
+    if isinstance(value, DailyTable):
+        h.update("\0".join(value.dates).encode())
+        for name, col in value.columns.items():
+            h.update(name.encode())
+            h.update(col.tobytes())
+    elif isinstance(value, WorkoutLog):
+        h.update(json.dumps([value.dates, value.names, value.durations, value.exercises, value.set_types]).encode())
+        for col in (value.start, value.exercise, value.set_type, value.weight_kg, value.reps, value.rir):
+            h.update(col.tobytes())
+    else:
+        h.update(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode())
+    return h.hexdigest()
+
+
+def _stage_cache_path(name: str) -> Path:
+    return CACHE_DIR / "stages" / f"{name}.pickle"
+
+
+def _load_stage(name: str) -> dict | None:
+    entry = _STAGE_MEMO.get(name)
+    if entry is None:
+        try:
+            with open(_stage_cache_path(name), "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+    return entry
+
+
+def _store_stage(name: str, entry: dict) -> None:
+    _STAGE_MEMO[name] = entry
+    path = _stage_cache_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _why(parts: dict, old: dict | None) -> str:
+    if old is None:
+        return "no cached result"
+    changed = [k for k in parts if parts[k] != old.get(k)]
+    return ", ".join(changed) + " changed" if changed else "cached result unreadable"
+
+
+def run_stages(sources: dict, config: dict, use_cache: bool = False, explain: bool = False,
+               edges: bool = True) -> dict:
+    """
+    Evaluate OUTPUT_STAGES over `sources`; returns {stage or source name: value}.
+    edges=False leaves out the serialisation-only stages.
+    """
+    values = dict(sources)
+    keys = {name: _digest(value) for name, value in sources.items()} if use_cache else {}
+    today = date_cls.today().isoformat()
+    for name, spec in OUTPUT_STAGES.items():
+        if spec.get("edge") and not edges:
+            continue
+        args = [config if i == "config" else values[i] for i in spec["inputs"]]
+        if not use_cache:
+            values[name] = PROFILER.call(name, spec["fn"], *args)
+            if explain:
+                print(f"    ▶ {name:<22} ran — cache disabled")
+            continue
 
+        parts = {"code": STAGE_CODE_DIGEST}
+        parts.update({i: keys[i] for i in spec["inputs"] if i != "config"})
+        parts.update({f"config.{k}": _digest(config.get(k)) for k in spec.get("config", ())})
+        if spec.get("today"):
+            parts["date"] = today
+        key = hashlib.sha1(json.dumps([name, parts], sort_keys=True).encode()).hexdigest()
+        keys[name] = key
+
+        entry = _load_stage(name)
+        if entry is not None and entry.get("key") == key:
+            values[name] = entry["value"]
+            _STAGE_MEMO[name] = entry
+            if explain:
+                print(f"    ✓ {name:<22} cached")
+            continue
+        values[name] = PROFILER.call(name, spec["fn"], *args)
+        if explain:
+            print(f"    ▶ {name:<22} ran — {_why(parts, entry and entry.get('parts'))}")
+        _store_stage(name, {"key": key, "parts": parts, "value": values[name]})
+    return values
 
-def build_output(mf: dict, hc: dict, config: dict) -> dict:
-    mf_daily = mf["daily"]
-    weight_series = build_weight_series(mf_daily, hc["hc_weight"])
-    body_comp = compute_body_comp(weight_series, config)
 
-    # Enrich each mf_daily entry with deficit field
-    mf_daily_list = []
-    for d in sorted(mf_daily):
-        entry = dict(mf_daily[d])
-        tdee = entry.get("tdee")
-        kcal = entry.get("kcal")
-        entry["deficit"] = round(tdee - kcal, 0) if tdee is not None and kcal is not None else None
-        mf_daily_list.append(entry)
+def build_output(mf: dict, hc: dict, config: dict, use_cache: bool = False, explain: bool = False) -> dict:
+    """
+    Run the stage graph and assemble data.json. With use_cache, stages whose
+    inputs are unchanged since the last run are loaded instead of recomputed;
+    explain prints which stages ran and why.
+    """
+    return output_document(run_stages(stage_sources(mf, hc), config, use_cache, explain), config, hc)
+
 
-    cut = compute_cut(body_comp, mf_daily_list, config)
+def stage_sources(mf: dict, hc: dict) -> dict:
+    return {
+        "mf_daily": mf["daily"],
+        "muscle_sets": mf["muscle_sets"],
+        "muscle_volume": mf["muscle_volume"],
+        "workouts": mf["workouts"],
+        "hc_weight": hc["hc_weight"],
+    }
 
-    workouts_dict = mf["workouts"]
-    mps_by_date   = compute_mps_by_date(workouts_dict)
-    push_pull_weekly = compute_push_pull_weekly(mf["muscle_sets"], mps_by_date, config)
 
+def output_document(v: dict, config: dict, hc: dict) -> dict:
+    """data.json, section by section, from the stage values."""
     return {
         "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
         "config": config,
-        "summary": compute_summary(body_comp, mf_daily_list),
-        "cut": cut,
-        "mf_daily": mf_daily_list,
-        "muscle_sets": [mf["muscle_sets"][d] for d in sorted(mf["muscle_sets"])],
-        "muscle_volume": [mf["muscle_volume"][d] for d in sorted(mf["muscle_volume"])],
-        "workouts": [workouts_dict[d] for d in sorted(workouts_dict)],
-        "push_pull_weekly": push_pull_weekly,
-        "weight": weight_series,
-        "body_comp": body_comp,
+        "summary": v["summary"],
+        "cut": v["cut"],
+        **({"scenarios": v["scenarios"]} if v["scenarios"] else {}),
+        "mf_daily": v["mf_daily_records"],
+        "rolling": v["rolling"],
+        "muscle_sets": v["muscle_sets_records"],
+        "muscle_volume": v["muscle_volume_records"],
+        "workouts": v["workout_records"],
+        "exercises": v["exercise_records"],
+        "push_pull_weekly": v["push_pull_weekly"],
+        "trends": v["trends"],
+        **({"volume_rolling": v["volume_rolling"]} if v["volume_rolling"] else {}),
+        "weight": v["weight_records"],
+        "body_comp": v["body_comp_records"],
+        "series": v["series"],
+        **({"rollups": v["rollups"]} if v["rollups"] else {}),
         "hc_body_fat": hc["hc_body_fat"],
         "cardio": hc["cardio"],
     }
 
 
+# ── Watch mode ────────────────────────────────────────────────────────────────
+# --watch keeps config, parsed MF workbooks (via _MF_MEMO) and HC data in memory
+# and rebuilds data.json when an input changes: a new/changed export reparses
+# only that workbook, an HC DB change re-runs the incremental HC sync, and a
+# config change only re-runs build_output. Linux uses inotify through ctypes;
+# elsewhere (or if inotify is unavailable) inputs are polled by stat.
+
+WATCH_DEBOUNCE_S = 0.25  # quiet period that ends a burst of writes
+WATCH_POLL_S = 0.5
+
+
+def _is_mf_export(path: Path) -> bool:
+    return path.parent.resolve() == MF_DIR.resolve() and path.match("MacroFactor-*.xlsx")
+
+
+def _watch_targets() -> dict:
+    """Input kind → predicate on a changed path."""
+    hc, config = HC_DB_PATH.resolve(), CONFIG_PATH.resolve()
+    return {
+        "mf": _is_mf_export,
+        "hc": lambda p: p.resolve() == hc,
+        "config": lambda p: p.resolve() == config,
+    }
+
+
+class _InotifyWatcher:
+    """Directory watches via libc inotify; yields changed paths."""
+
+    _MASK = 0x8 | 0x40 | 0x80 | 0x200  # IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, dirs):
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for d in dirs:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(d), self._MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {d}")
+            self._dirs[wd] = Path(d)
+
+    def poll(self, timeout: float | None) -> set:
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed, pos = set(), 0
+        while pos < len(buf):
+            wd, _mask, _cookie, length = self._EVENT.unpack_from(buf, pos)
+            pos += self._EVENT.size
+            name = buf[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if name and wd in self._dirs:
+                changed.add(self._dirs[wd] / os.fsdecode(name))
+        return changed
+
+
+class _PollingWatcher:
+    """Fallback: stat every input each WATCH_POLL_S and report differences."""
+
+    def __init__(self, dirs):
+        self._dirs = list(dirs)
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        snap = {}
+        for d in self._dirs:
+            for p in Path(d).iterdir() if Path(d).is_dir() else ():
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                snap[p] = (st.st_size, st.st_mtime_ns)
+        return snap
+
+    def poll(self, timeout: float | None) -> set:
+        time.sleep(WATCH_POLL_S if timeout is None else min(timeout, WATCH_POLL_S))
+        snap = self._scan()
+        changed = {p for p in snap.keys() | self._snapshot.keys() if snap.get(p) != self._snapshot.get(p)}
+        self._snapshot = snap
+        return changed
+
+
+def _make_watcher():
+    dirs = {MF_DIR.resolve(), HC_DB_PATH.resolve().parent, CONFIG_PATH.resolve().parent}
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifyWatcher(dirs), "inotify"
+        except (OSError, AttributeError) as e:
+            print(f"  inotify unavailable ({e}); polling every {WATCH_POLL_S}s")
+    return _PollingWatcher(dirs), "polling"
+
+
+def _wait_for_changes(watcher) -> set:
+    """Block until something changes, then keep collecting until WATCH_DEBOUNCE_S of quiet."""
+    changed = watcher.poll(None)
+    while True:
+        more = watcher.poll(WATCH_DEBOUNCE_S)
+        if not more:
+            return changed
+        changed |= more
+
+
+def watch(args, jobs: int) -> None:
+    """Initial build, then rebuild data.json whenever an input changes (Ctrl-C to stop)."""
+    def load_mf():
+        return load_mf_data(find_mf_files(), args, jobs)
+
+    def build():
+        return build_output(mf, hc, config, use_cache=not args.no_cache, explain=args.explain)
+
+    load_hc = partial(load_hc_data, use_cache=not args.no_cache)
+    config = ensure_config()
+    mf, hc = load_sources(load_mf, use_cache=not args.no_cache)
+    write_output(build())
+
+    watcher, kind = _make_watcher()
+    targets = _watch_targets()
+    print(f"\nWatching {MF_DIR}/, {HC_DB_PATH}, {CONFIG_PATH} ({kind}) — Ctrl-C to stop")
+    try:
+        while True:
+            changed = _wait_for_changes(watcher)
+            kinds = {k for p in changed for k, match in targets.items() if match(p)}
+            if not kinds:
+                continue
+            t0 = time.perf_counter()
+            try:
+                with redirect_stdout(io.StringIO()):
+                    if "config" in kinds:
+                        config = ensure_config()
+                    if "mf" in kinds:
+                        mf = load_mf()
+                    if "hc" in kinds:
+                        hc = load_hc()
+                    size = write_output(build())
+            except Exception as e:  # keep watching: the next write usually completes the file
+                print(f"  ✗ rebuild after {', '.join(sorted(kinds))} change failed: {e!r}")
+                continue
+            names = ", ".join(sorted(p.name for p in changed))
+            print(f"  ↻ {datetime.now():%H:%M:%S}  {names}  → {OUT_PATH} "
+                  f"({size / 1024:.1f} KB) in {time.perf_counter() - t0:.2f}s")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+# ── Batch mode ────────────────────────────────────────────────────────────────
+# --batch DIR builds every athlete workspace under DIR: a directory laid out like
+# this checkout (drive_export/workout/, health_connect_export.db,
+# workout-config.json). Workers are long-lived processes that import parse and
+# openpyxl once and chdir into each workspace in turn, so every relative path
+# (exports, HC DB, .parse-cache/, public/data.json) resolves inside it.
+
+ROSTER_NAME = "roster.json"
+
+
+def find_workspaces(root: Path) -> list[Path]:
+    """Subdirectories of root that contain a MacroFactor export folder."""
+    return sorted(p for p in root.iterdir() if p.is_dir() and (p / MF_DIR).is_dir())
+
+
+def roster_row(data: dict) -> dict:
+    """The headline numbers of one athlete's data.json, for the roster summary."""
+    s, cut = data.get("summary") or {}, data.get("cut") or {}
+    week = data["push_pull_weekly"][-1] if data["push_pull_weekly"] else {}
+    return {
+        "latest_date": s.get("latest_date"),
+        "trend_kg": s.get("trend_kg"),
+        "weight_delta_7d": s.get("weight_delta_7d"),
+        "estimated_bf_pct": s.get("estimated_bf_pct"),
+        "ffmi": s.get("ffmi"),
+        "avg_deficit_7d": s.get("avg_deficit_7d"),
+        "kg_remaining": cut.get("kg_remaining"),
+        "rate_kg_per_week": cut.get("rate_kg_per_week"),
+        "projected_completion_date": cut.get("projected_completion_date"),
+        "last_workout": data["workouts"]["dates"][-1] if data["workouts"]["dates"] else None,
+        "week_start": week.get("week_start"),
+        "week_zones": {k[:-len("_zone")]: v for k, v in week.items() if k.endswith("_zone")},
+    }
+
+
+def build_workspace(workspace: str, use_cache: bool = True, reader: str = "openpyxl",
+                    plan: bool = False, warehouse: bool = False, stream: bool = False) -> dict:
+    """Run the whole pipeline inside one workspace; returns its roster row."""
+    t0 = time.perf_counter()
+    row = {"athlete": Path(workspace).name, "workspace": workspace}
+    cwd = os.getcwd()
+    try:
+        os.chdir(workspace)
+        # in-process memos belong to the previous workspace this worker built
+        _MF_MEMO.clear()
+        _STAGE_MEMO.clear()
+        with redirect_stdout(io.StringIO()):
+            config = ensure_config()
+            files = find_mf_files()
+            if not files:
+                raise FileNotFoundError(f"no MacroFactor-*.xlsx in {MF_DIR}/")
+            if warehouse:
+                load_mf = partial(load_warehouse_mf, files, use_cache=use_cache, reader=reader)
+            elif stream:
+                load_mf = partial(load_mf_streaming, files, use_cache=use_cache, reader=reader)
+            else:
+                load_mf = partial(load_all_mf_files, files, use_cache=use_cache, reader=reader, plan=plan)
+            mf, hc = load_sources(load_mf, use_cache=use_cache)
+            OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+            if stream:
+                size, v = write_output_stream(mf, hc, config, use_cache=use_cache)
+                data = {"summary": v["summary"], "cut": v["cut"], "push_pull_weekly": v["push_pull_weekly"],
+                        "workouts": {"dates": mf["workouts"].dates}}
+            else:
+                data = build_output(mf, hc, config, use_cache=use_cache)
+                size = write_output(data)
+        row.update(status="ok", bytes=size, **roster_row(data))
+    except (Exception, SystemExit) as e:  # one bad workspace (or config) shouldn't sink the roster
+        row.update(status="error", error=repr(e))
+    finally:
+        os.chdir(cwd)
+    row["seconds"] = round(time.perf_counter() - t0, 3)
+    return row
+
+
+def run_batch(root: Path, args, jobs: int) -> bool:
+    """Build every workspace under root on `jobs` workers, write root/roster.json; True if all succeeded."""
+    workspaces = [str(p.resolve()) for p in find_workspaces(root)]
+    if not workspaces:
+        print(f"  ✗ No athlete workspaces (with {MF_DIR}/) under {root}/")
+        return False
+    jobs = min(jobs, len(workspaces))
+    print(f"Building {len(workspaces)} workspace(s) under {root}/ with {jobs} worker(s)...\n")
+    opts = (not args.no_cache, args.reader, args.skip_superseded, args.warehouse, args.stream)
+    t0 = time.perf_counter()
+    rows = []
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(build_workspace, ws, *opts) for ws in workspaces]
+            for fut in as_completed(futures):
+                rows.append(fut.result())
+                _print_roster_line(rows[-1])
+    else:
+        for ws in workspaces:
+            rows.append(build_workspace(ws, *opts))
+            _print_roster_line(rows[-1])
+    elapsed = time.perf_counter() - t0
+
+    rows.sort(key=lambda r: r["athlete"])
+    roster = {
+        "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "seconds": round(elapsed, 3),
+        "athletes": rows,
+    }
+    _write_json_atomic(root / ROSTER_NAME, roster)
+    failed = sum(r["status"] != "ok" for r in rows)
+    print(f"\n✓ {root / ROSTER_NAME}  ({len(rows) - failed} ok, {failed} failed) in {elapsed:.2f}s")
+    return failed == 0
+
+
+def _print_roster_line(row: dict) -> None:
+    if row["status"] != "ok":
+        print(f"  ✗ {row['athlete']:<20} {row['error']}")
+        return
+    delta = f"{row['weight_delta_7d']:+.2f}" if row["weight_delta_7d"] is not None else "n/a"
+    print(f"  ✓ {row['athlete']:<20} {row['trend_kg']} kg (7d Δ {delta})  "
+          f"BF {row['estimated_bf_pct']}%  {row['seconds']:.2f}s")
+
+
+# ── Delta output ──────────────────────────────────────────────────────────────
+# Each data.json carries a "version". When the content changes, the diff from
+# the previous data.json is written to patches/<version>.json, and manifest.json
+# lists the current version and the recent patches. app.js applies the patches
+# since its cached version, or fetches the snapshot when it is too far behind.
+#
+# Patch ops address a value by its key path from the document root:
+#   {"op": "set", "path", "value"}      replace (or add) one value
+#   {"op": "del", "path"}               drop a dict key
+#   {"op": "rows", "path", "key", "upsert", "delete"}
+#                                       date-keyed rows: replace/insert by key, keep sorted
+#   {"op": "splice", "path", "at", "values"}
+#                                       truncate a list to `at` items, then append values
+
+PATCH_HISTORY = 30  # patches kept; older clients fall back to the snapshot
+ROW_KEYS = ("date", "week_start")
+_VOLATILE_KEYS = ("generated_at", "version")  # differ on every run; not content
+
+
+def _row_key(old: list, new: list) -> str | None:
+    """The key field if both lists are rows sorted by a unique date key, else None."""
+    for key in ROW_KEYS:
+        keyed = True
+        for rows in (old, new):
+            if not all(isinstance(r, dict) and key in r for r in rows):
+                keyed = False
+                break
+            keys = [r[key] for r in rows]
+            if any(a >= b for a, b in zip(keys, keys[1:])):
+                keyed = False
+                break
+        if keyed and (old or new):
+            return key
+    return None
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, separators=(",", ":")))
+
+
+def diff_output(old, new, path: list | None = None) -> list:
+    """Patch ops that turn `old` into `new` (see the section comment)."""
+    path = path or []
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{"op": "del", "path": path + [k]} for k in old if k not in new]
+        for k, v in new.items():
+            if k not in old:
+                ops.append({"op": "set", "path": path + [k], "value": v})
+            else:
+                ops.extend(diff_output(old[k], v, path + [k]))
+        if path and len(ops) > 1 and _json_size(ops) >= _json_size(new):
+            return [{"op": "set", "path": path, "value": new}]  # mostly changed: resend whole
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        key = _row_key(old, new)
+        if key is not None:
+            before = {r[key]: r for r in old}
+            after = {r[key]: r for r in new}
+            return [{"op": "rows", "path": path, "key": key,
+                     "upsert": [r for k, r in after.items() if before.get(k) != r],
+                     "delete": [k for k in before if k not in after]}]
+        at = 0
+        for a, b in zip(old, new):
+            if a != b:
+                break
+            at += 1
+        return [{"op": "splice", "path": path, "at": at, "values": new[at:]}]
+    return [{"op": "set", "path": path, "value": new}]
+
+
+def apply_patch(doc: dict, ops: list) -> dict:
+    """Apply diff_output ops to doc in place (mirrors applyPatch in app.js)."""
+    for op in ops:
+        *parents, last = op["path"]
+        target = doc
+        for k in parents:
+            target = target[k]
+        if op["op"] == "set":
+            target[last] = op["value"]
+        elif op["op"] == "del":
+            del target[last]
+        elif op["op"] == "splice":
+            target[last] = target[last][:op["at"]] + op["values"]
+        elif op["op"] == "rows":
+            key, dropped = op["key"], set(op["delete"])
+            rows = {r[key]: r for r in target[last] if r[key] not in dropped}
+            rows.update((r[key], r) for r in op["upsert"])
+            target[last] = [rows[k] for k in sorted(rows)]
+    return doc
+
+
+def _content(data: dict) -> dict:
+    return {k: v for k, v in data.items() if k not in _VOLATILE_KEYS}
+
+
+def _load_json(path: Path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def stamp_version(data: dict) -> dict | None:
+    """
+    Set data["version"]. If the previous data.json is the manifest's version and
+    the content changed, write the patch from it to PATCH_DIR. Returns the new
+    manifest's {"version", "patches"}, or None when the content is unchanged.
+    """
+    manifest = _load_json(MANIFEST_PATH) or {}
+    version = manifest.get("version", 0)
+    prev = _load_json(OUT_PATH) if manifest else None
+    ops = None
+    if prev is not None and prev.get("version") == version:
+        if _content(prev) == _content(data):
+            data["version"] = version
+            return None
+        data["version"] = version + 1
+        ops = diff_output(prev, data)
+        if apply_patch(json.loads(json.dumps(prev)), ops) != data:
+            ops = None  # never ship a patch that doesn't reproduce the output
+    version += 1
+    data["version"] = version
+
+    patches = manifest.get("patches", []) if ops is not None else []
+    if ops is not None:
+        patch_path = PATCH_DIR / f"{version}.json"
+        _write_json_atomic(patch_path, {"from": version - 1, "to": version, "ops": ops})
+        patches.append({"from": version - 1, "to": version, "file": f"{PATCH_DIR.name}/{patch_path.name}",
+                        "bytes": patch_path.stat().st_size})
+    patches = patches[-PATCH_HISTORY:]
+    prune_patches(patches)
+    return {"version": version, "patches": patches}
+
+
+def prune_patches(patches: list) -> None:
+    """Delete patch files the manifest no longer lists."""
+    if PATCH_DIR.exists():
+        keep = {Path(p["file"]).name for p in patches}
+        for path in PATCH_DIR.glob("*.json"):
+            if path.name not in keep:
+                path.unlink()
+
+
+# ── View shards ───────────────────────────────────────────────────────────────
+# data.json is also split by top-level section into shards/<name>.json, listed in
+# manifest.json. A first visit renders the default (Volume) tab from the small
+# "core" shard and fetches a tab's other shards when it opens. Every section is in
+# exactly one shard, so the shards of a version merge back into its data.json.
+
+SHARD_DIR = OUT_PATH.with_name("shards")
+
+SHARDS = {
+    "core": ("generated_at", "version", "config", "summary", "cut", "push_pull_weekly"),
+    "workouts": ("workouts", "exercises", "trends"),
+    "daily": ("mf_daily", "series", "rollups"),
+    "body": ("body_comp", "hc_body_fat"),
+}
+EXTRA_SHARD = "extra"  # every other section: not drawn by the dashboard (API, exports)
+
+
+def write_shards(data: dict) -> dict:
+    """Write data's shards, each with its "version"; returns the manifest's {"shards"} entry."""
+    placed = {key for keys in SHARDS.values() for key in keys}
+    groups = {name: [k for k in keys if k in data] for name, keys in SHARDS.items()}
+    groups[EXTRA_SHARD] = [k for k in data if k not in placed]
+    shards = {}
+    for name, keys in groups.items():
+        path = SHARD_DIR / f"{name}.json"
+        _write_json_atomic(path, {"version": data["version"], **{k: data[k] for k in keys}})
+        shards[name] = {"file": f"{SHARD_DIR.name}/{path.name}", "bytes": path.stat().st_size, "sections": keys}
+    prune_shards(shards)
+    return shards
+
+
+def prune_shards(shards: dict) -> None:
+    """Delete shard files the manifest no longer lists."""
+    if SHARD_DIR.exists():
+        keep = {Path(s["file"]).name for s in shards.values()}
+        for path in SHARD_DIR.glob("*.json"):
+            if path.name not in keep:
+                path.unlink()
+
+
+def _shards_written(manifest: dict) -> bool:
+    shards = manifest.get("shards")
+    return bool(shards) and all((OUT_PATH.parent / s["file"]).exists() for s in shards.values())
+
+
+# ── Streaming build ───────────────────────────────────────────────────────────
+# --stream keeps peak memory independent of how many exports there are and how
+# big data.json gets. Each workbook's rows go straight into DailyTableBuilders
+# and one WorkoutLog (its cache entry is written as they stream past), so only
+# the compact columnar history stays resident. data.json is then written
+# section by section: the serialisation-only stages become iterators that
+# JsonWriter drains row by row, and no whole-document string or copy is built.
+# The file is byte-identical to a normal run's. The version is bumped by content
+# digest instead of a diff, so a streamed build ships no patch.
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class JsonWriter:
+    """
+    Write one JSON document incrementally, byte-identical to json.dump(value,
+    separators=(",", ":")). Dicts and lists are written member by member and
+    iterators are drained as arrays; flat values are dumped whole. Text written
+    while `hashing` is on also feeds `digest`.
+    """
+
+    CHUNK = 4096  # scalars dumped per write in a long array
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha1()
+        self.hashing = True
+        self._first: list[bool] = []
+        self._close: list[str] = []
+
+    def _write(self, text: str) -> None:
+        self.f.write(text)
+        if self.hashing:
+            self.digest.update(text.encode())
+
+    def _member(self, key) -> None:
+        if self._first:
+            if self._first[-1]:
+                self._first[-1] = False
+            else:
+                self._write(",")
+        if key is not None:  # json.dump turns 7 / True / None keys into "7" / "true" / "null"
+            self._write(json.dumps(key if isinstance(key, str) else json.dumps(key)) + ":")
+
+    def begin(self, key=None, array: bool = False) -> None:
+        self._member(key)
+        self._write("[" if array else "{")
+        self._close.append("]" if array else "}")
+        self._first.append(True)
+
+    def end(self) -> None:
+        self._first.pop()
+        self._write(self._close.pop())
+
+    def put(self, value, key=None) -> None:
+        if isinstance(value, dict) and not all(isinstance(v, _SCALARS) for v in value.values()):
+            self.begin(key)
+            for k, v in value.items():
+                self.put(v, k)
+            self.end()
+        elif isinstance(value, (list, tuple, Iterator)):
+            self.begin(key, array=True)
+            run = []
+            for v in value:
+                if isinstance(v, _SCALARS):
+                    run.append(v)
+                    if len(run) == self.CHUNK:
+                        self._put_run(run)
+                        run = []
+                    continue
+                if run:
+                    self._put_run(run)
+                    run = []
+                self.put(v)
+            if run:
+                self._put_run(run)
+            self.end()
+        else:
+            self._member(key)
+            self._write(json.dumps(value, separators=(",", ":")))
+
+    def _put_run(self, run: list) -> None:
+        self._member(None)
+        self._write(json.dumps(run, separators=(",", ":"))[1:-1])
+
+
+def _fold_sheets(path: Path, tables: dict, workouts: WorkoutLog, reader: str,
+                 cache: JsonWriter | None) -> dict:
+    """Stream one workbook into the accumulators (and its sheets into `cache`); rows per section."""
+    counts = {}
+    wb = open_workbook(path, reader)
+    try:
+        for section, (sheet, parser) in MF_SHEETS.items():
+            if sheet not in wb.sheetnames:
+                continue
+            with PROFILER.stage(f"{path.name}:{sheet}") as rec:
+                if section == "workouts":
+                    log = parser(wb[sheet])  # one export's sets, already compact
+                    workouts.absorb(log)
+                    if cache is not None:
+                        cache.put(log.to_json(lazy=True), section)
+                    counts[section] = len(log)
+                else:
+                    if cache is not None:
+                        cache.begin(section)
+                    n = 0
+                    for entry in MF_ROW_ITERS[section](wb[sheet]):
+                        tables[section].put(entry["date"], entry)
+                        if cache is not None:
+                            cache.put(entry, entry["date"])
+                        n += 1
+                    if cache is not None:
+                        cache.end()
+                    counts[section] = n
+                rec["rows"] = counts[section]
+    finally:
+        wb.close()
+    return counts
+
+
+def fold_mf_file(path: Path, tables: dict, workouts: WorkoutLog, reader: str = "openpyxl",
+                 use_cache: bool = True) -> dict:
+    """_fold_sheets, writing the workbook's cache entry alongside when use_cache."""
+    if not use_cache:
+        return _fold_sheets(path, tables, workouts, reader, None)
+    cache_path = mf_cache_path(path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_suffix(cache_path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        w = JsonWriter(f)
+        w.begin()
+        for key, value in mf_cache_header(path).items():
+            w.put(value, key)
+        w.begin("sheets")
+        counts = _fold_sheets(path, tables, workouts, reader, w)
+        w.end()
+        w.put({}, "skipped")
+        w.end()
+    os.replace(tmp, cache_path)
+    return counts
+
+
+def load_mf_streaming(files: list[Path], use_cache: bool = True, reader: str = "openpyxl") -> dict:
+    """
+    load_all_mf_files in bounded memory: one workbook (or cache entry) at a time,
+    folded into the accumulators oldest first so later files still win.
+    """
+    tables = {
+        "daily": DailyTableBuilder(QUICK_EXPORT_FIELDS, int_columns=("steps",)),
+        "muscle_sets": DailyTableBuilder(MUSCLE_GROUPS),
+        "muscle_volume": DailyTableBuilder(MUSCLE_GROUPS),
+    }
+    workouts = WorkoutLog()
+    for path in files:
+        entry = load_cached_mf(path, memo=False) if use_cache else None
+        cached = entry is not None and not entry["skipped"]
+        if cached:
+            counts = {}
+            for section, parsed in entry["sheets"].items():
+                if section == "workouts":
+                    workouts.absorb(parsed)
+                else:
+                    for date, row in parsed.items():
+                        tables[section].put(date, row)
+                counts[section] = len(parsed)
+        else:
+            counts = fold_mf_file(path, tables, workouts, reader, use_cache)
+        entry = None
+        print(f"\n  [{path.name}]" + ("  (cached)" if cached else ""))
+        for section, (label, unit) in MF_LABELS.items():
+            if section in counts:
+                print(f"    {label} : {counts[section]} {unit}")
+    return {
+        **{section: builder.build() for section, builder in tables.items()},
+        "workouts": PROFILER.call("intern", WorkoutLog.merge, [workouts]),  # drop names of replaced sessions
+    }
+
+
+def write_output_stream(mf: dict, hc: dict, config: dict, use_cache: bool = False,
+                        explain: bool = False) -> tuple[int, dict]:
+    """
+    build_output + write_output without holding data.json in memory. Returns the
+    file size and the stage values (edge stages as spent iterators).
+    """
+    v = run_stages(stage_sources(mf, hc), config, use_cache, explain, edges=False)
+    for name, spec in OUTPUT_STAGES.items():
+        if spec.get("edge"):
+            v[name] = spec["fn"](*(v[i] for i in spec["inputs"]), lazy=True)
+    doc = output_document(v, config, hc)
+    generated_at = doc.pop("generated_at")
+
+    manifest = _load_json(MANIFEST_PATH) or {}
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = OUT_PATH.with_suffix(OUT_PATH.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        w = JsonWriter(f)
+        w.begin()
+        w.hashing = False
+        w.put(generated_at, "generated_at")
+        w.hashing = True
+        for key, value in doc.items():
+            w.put(value, key)
+        digest = w.digest.hexdigest()
+        changed = manifest.get("digest") != digest
+        version = manifest.get("version", 0) + changed
+        w.hashing = False
+        w.put(version, "version")
+        w.end()
+    os.replace(tmp, OUT_PATH)
+    size = OUT_PATH.stat().st_size
+    if changed:  # no diff or shards without the previous document in memory: clients refetch the snapshot
+        prune_patches([])
+        prune_shards({})
+        _write_json_atomic(MANIFEST_PATH, {
+            "version": version,
+            "generated_at": generated_at,
+            "snapshot": {"file": OUT_PATH.name, "bytes": size},
+            "patches": [],
+            "digest": digest,
+        })
+    return size, v
+
+
+def limit_memory(mb: int) -> None:
+    """Cap this process's data segment (heap and anonymous mappings) at `mb` MB (POSIX)."""
+    import resource
+    soft, hard = resource.getrlimit(resource.RLIMIT_DATA)
+    limit = mb << 20
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+
+
 # ── Main ──────────────────────────────────────────────────────────────────────
 
-def main():
+def write_output(data: dict) -> int:
+    """
+    Write data.json atomically (readers never see a partial file), plus its patch,
+    view shards and manifest.json when the content changed (or the shards are
+    missing); returns the data.json size.
+    """
+    manifest = stamp_version(data)
+    _write_json_atomic(OUT_PATH, data)
+    size = OUT_PATH.stat().st_size
+    if manifest is None:
+        current = _load_json(MANIFEST_PATH) or {}
+        if _shards_written(current):
+            return size
+        manifest = current
+    # manifest last, so it only points at files that exist
+    _write_json_atomic(MANIFEST_PATH, {
+        "generated_at": data["generated_at"],
+        **manifest,  # an unchanged version keeps its generated_at (and --stream digest)
+        "snapshot": {"file": OUT_PATH.name, "bytes": size},
+        "shards": write_shards(data),
+    })
+    return size
+
+
+def load_mf_data(files: list[Path], args, jobs: int) -> dict:
+    """MF history from the exports directly, through the warehouse with --warehouse, or folded with --stream."""
+    if args.warehouse:
+        return load_warehouse_mf(files, use_cache=not args.no_cache, jobs=jobs, reader=args.reader)
+    if args.stream:
+        return load_mf_streaming(files, use_cache=not args.no_cache, reader=args.reader)
+    return load_all_mf_files(files, use_cache=not args.no_cache, jobs=jobs, reader=args.reader,
+                             plan=args.skip_superseded)
+
+
+def load_sources(load_mf, use_cache: bool = True) -> tuple[dict, dict]:
+    """
+    Run load_mf() on this thread while load_hc_data runs on another; returns (mf, hc).
+    The two don't depend on each other, and the HC queries run inside SQLite without
+    the GIL, so ingestion takes about as long as the slower side instead of the sum.
+    """
+    hc_log = []
+
+    def load_hc():
+        wall, cpu = time.perf_counter(), time.thread_time()
+        hc = load_hc_data(use_cache, log=hc_log.append)
+        return hc, time.perf_counter() - wall, time.thread_time() - cpu
+
+    with PROFILER.stage("load_sources") as rec:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="hc") as pool:
+            hc_future = pool.submit(load_hc)
+            with PROFILER.stage("load_all_mf_files") as mf_rec:
+                mf = load_mf()
+                mf_rec["rows"] = sum(len(mf[k]) for k in ("daily", "muscle_sets", "muscle_volume", "workouts"))
+            mf_s = time.perf_counter() - t0
+            hc, hc_s, hc_cpu = hc_future.result()
+        wall_s = time.perf_counter() - t0
+        PROFILER.record("load_hc_data", wall_s=round(hc_s, 4), cpu_s=round(hc_cpu, 4),
+                        rows=sum(len(v) for v in hc.values()), thread="hc")
+        overlap_s = min(mf_s, hc_s)  # both start at t0
+        critical = "MF" if mf_s >= hc_s else "HC"
+        rec.update(mf_s=round(mf_s, 4), hc_s=round(hc_s, 4), overlap_s=round(overlap_s, 4), critical=critical)
+
+    print("\nHealth Connect data...")
+    for line in hc_log:
+        print(line)
+    print(f"\n  Ingestion: MF {mf_s:.2f}s ∥ HC {hc_s:.2f}s → {wall_s:.2f}s "
+          f"({overlap_s:.2f}s overlapped, critical path: {critical})")
+    return mf, hc
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Build public/data.json from MF + HC exports")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="parse every workbook and the whole HC DB without reading or writing the cache")
+    ap.add_argument("--rebuild-cache", action="store_true",
+                    help="discard the MF/HC caches and repopulate them from the exports")
+    ap.add_argument("--reader", choices=XLSX_READERS, default="openpyxl",
+                    help="XLSX backend: openpyxl, or the streaming zip/XML reader (faster)")
+    ap.add_argument("--check-reader", action="store_true",
+                    help="parse every workbook with both backends, report any difference, and exit")
+    ap.add_argument("--skip-superseded", action="store_true",
+                    help="scan date coverage first and don't parse rows a newer export replaces "
+                         "(pairs best with --reader stream)")
+    ap.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                    help="parse workbooks/sheets in N worker processes (0 = one per CPU)")
+    ap.add_argument("--watch", action="store_true",
+                    help="stay running and rebuild data.json when an export, the HC DB or the config changes")
+    ap.add_argument("--profile", action="store_true",
+                    help=f"record wall/CPU time, rows and peak allocations per stage and sheet "
+                         f"into {METRICS_PATH} (tracemalloc slows the run down)")
+    ap.add_argument("--cprofile", action="store_true",
+                    help="--profile, plus a cProfile dump of the stage with the most CPU time next to it")
+    ap.add_argument("--warehouse", action="store_true",
+                    help=f"upsert new/changed exports into {WAREHOUSE_PATH} (SQLite) and build the output "
+                         f"from the warehouse, which keeps days whose export was deleted")
+    ap.add_argument("--batch", type=Path, metavar="DIR",
+                    help=f"build every athlete workspace under DIR (each with its own {MF_DIR}/, HC DB "
+                         f"and {CONFIG_PATH}) on --jobs workers and write DIR/{ROSTER_NAME}")
+    ap.add_argument("--stream", action="store_true",
+                    help="lower memory: fold each export into compact tables as it is read and write "
+                         "data.json section by section (same output; no delta patch). Memory still "
+                         "grows with the compact history")
+    ap.add_argument("--max-memory", type=int, metavar="MB",
+                    help="cap the process's heap at MB megabytes; a run that needs more stops with an error "
+                         "(pair with --stream for large histories)")
+    ap.add_argument("--explain", action="store_true",
+                    help="print which output stages ran and why (input, config key or date changed) "
+                         "and which were loaded from the stage cache")
+    args = ap.parse_args(argv)
+    args.profile = args.profile or args.cprofile
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.max_memory:
+        limit_memory(args.max_memory)
+    try:
+        run(args)
+    except MemoryError:
+        hint = "" if args.stream else "; try --stream"
+        raise SystemExit(f"✗ Out of memory under --max-memory {args.max_memory} MB{hint}")
+
+
+def run(args) -> None:
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if args.profile:
+        PROFILER.start(cprofile=args.cprofile)
     print("=== Workout Dashboard v2 Parser ===\n")
+    if args.warehouse and args.skip_superseded:
+        raise SystemExit("--skip-superseded doesn't apply to --warehouse (each export is ingested whole)")
+    if args.stream and (args.watch or args.skip_superseded):
+        raise SystemExit("--stream can't be combined with --watch or --skip-superseded")
+    if args.batch:
+        if args.watch or args.profile or args.check_reader:
+            raise SystemExit("--batch can't be combined with --watch, --profile or --check-reader")
+        if args.rebuild_cache:
+            raise SystemExit("--batch: use --no-cache, or --rebuild-cache inside a workspace")
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        raise SystemExit(0 if run_batch(args.batch, args, jobs) else 1)
+    if args.stream and args.jobs != 1:
+        raise SystemExit("--stream parses one workbook at a time; drop --jobs")
 
     print("Config...")
     config = ensure_config()
@@ -689,29 +3919,51 @@ def main():
     if not files:
         print("  ✗ No MacroFactor files found in drive_export/workout/")
         return
-    mf = load_all_mf_files(files)
-
-    print("\nHealth Connect data...")
-    hc = load_hc_data()
+    if args.check_reader:
+        raise SystemExit(0 if check_reader_parity(files) else 1)
+    if args.rebuild_cache:
+        clear_cache()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.watch:
+        watch(args, jobs)
+        return
+    mf, hc = load_sources(partial(load_mf_data, files, args, jobs), use_cache=not args.no_cache)
 
     print("\nAssembling output...")
-    data = build_output(mf, hc, config)
-
-    with open(OUT_PATH, "w") as f:
-        json.dump(data, f, separators=(",", ":"))
-
-    size_kb = OUT_PATH.stat().st_size / 1024
-    s = data.get("summary", {})
-    print(f"\n✓ {OUT_PATH}  ({size_kb:.1f} KB)")
-    print(f"  mf_daily         : {len(data['mf_daily'])} days")
-    print(f"  muscle_sets      : {len(data['muscle_sets'])} days")
-    print(f"  muscle_volume    : {len(data['muscle_volume'])} days")
-    print(f"  workouts         : {len(data['workouts'])} days")
-    print(f"  push_pull_weekly : {len(data['push_pull_weekly'])} weeks")
-    print(f"  body_comp      : {len(data['body_comp'])} entries")
-    print(f"  weight         : {len(data['weight'])} entries")
-    print(f"  hc_body_fat    : {len(data['hc_body_fat'])} entries")
-    print(f"  cardio         : {len(data['cardio'])} sessions")
+    if args.stream:
+        with PROFILER.stage("stream_output") as rec:
+            size, v = write_output_stream(mf, hc, config, use_cache=not args.no_cache, explain=args.explain)
+            rec["bytes"] = size
+        s, rollups = v["summary"], v["rollups"]
+        cut = v["retention"] and v["retention"]["full_from"]
+        workouts = mf["workouts"].since(cut)
+        counts = [len(mf["daily"].since(cut)), len(mf["muscle_sets"].since(cut)),
+                  len(mf["muscle_volume"].since(cut)), len(workouts), len(workouts.exercise),
+                  len(v["push_pull_weekly"]), len(v["body_comp"]), len(v["weight_series"])]
+    else:
+        with PROFILER.stage("build_output"):
+            data = build_output(mf, hc, config, use_cache=not args.no_cache, explain=args.explain)
+        with PROFILER.stage("json_dump") as rec:
+            size = rec["bytes"] = write_output(data)
+        s, rollups = data.get("summary", {}), data.get("rollups")
+        counts = [len(data["mf_daily"]), len(data["muscle_sets"]), len(data["muscle_volume"]),
+                  len(data["workouts"]["dates"]), len(data["workouts"]["sets"]["workout"]),
+                  len(data["push_pull_weekly"]), len(data["body_comp"]), len(data["weight"])]
+
+    days, sets_days, vol_days, workout_days, sets, weeks, body_comp, weight = counts
+    print(f"\n✓ {OUT_PATH}  ({size / 1024:.1f} KB)" + ("  streamed" if args.stream else ""))
+    print(f"  mf_daily         : {days} days")
+    print(f"  muscle_sets      : {sets_days} days")
+    print(f"  muscle_volume    : {vol_days} days")
+    print(f"  workouts         : {workout_days} days, {sets} sets")
+    print(f"  push_pull_weekly : {weeks} weeks")
+    print(f"  body_comp      : {body_comp} entries")
+    print(f"  weight         : {weight} entries")
+    print(f"  hc_body_fat    : {len(hc['hc_body_fat'])} entries")
+    print(f"  cardio         : {len(hc['cardio'])} sessions")
+    if rollups:
+        print(f"  rollups          : {len(rollups['weekly']['mf_daily'])} weeks, "
+              f"{len(rollups['monthly']['mf_daily'])} months before {rollups['full_from']}")
     if s:
         delta = f"{s['weight_delta_7d']:+.2f}" if s.get("weight_delta_7d") is not None else "n/a"
         print(f"\n  Latest ({s['latest_date']}):")
@@ -720,6 +3972,13 @@ def main():
         print(f"    BF% (est)    : {s['estimated_bf_pct']}%")
         print(f"    FFMI         : {s['ffmi']}")
 
+    if args.profile:
+        dump = PROFILER.write(METRICS_PATH)
+        print(f"\n✓ {METRICS_PATH}")
+        PROFILER.report()
+        if dump:
+            print(f"\n  cProfile of the busiest stage: {dump}  (snakeviz / flameprof / gprof2dot)")
+
 
 if __name__ == "__main__":
     main()
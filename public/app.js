@@ -13,45 +13,198 @@ const MUTED   = "#555";
 // ── State ─────────────────────────────────────────────────────────────────────
 
 let data = null;
+let doc = null;       // data.json, or the shards of it loaded so far, as cached
+let shards = null;    // names of the loaded shards; null = the whole document
+let manifest = null;
 const charts = {};  // keyed by canvas id
 
 // ── Bootstrap ─────────────────────────────────────────────────────────────────
 
+// Each tab renders the first time it opens, once the shards it reads are loaded.
+const TAB_VIEWS = {
+  volume:      { shards: [], render: () => { renderVolume(); renderHeatmap(); } },
+  training:    { shards: ["workouts", "body"], render: () => renderTraining() },
+  strength:    { shards: ["workouts", "body"], render: () => { renderStrengthTab(); setupProgressiveOverload(); } },
+  nutrition:   { shards: ["daily"], render: () => renderNutrition(30) },
+  "body-comp": { shards: ["body", "daily"], render: () => {
+    renderCoachSummary();
+    renderBodyComp(30);
+    renderCutProgress();
+    renderTdeeChart(30);
+    renderDeficitChart();
+  } },
+};
+const renderedTabs = new Set();
+
 async function loadData() {
-  const res = await fetch("./data.json");
-  data = await res.json();
+  ({ doc, shards } = await fetchData());
+  data = { ...doc, workouts: decodeWorkouts(doc.workouts) };  // doc itself stays as cached
 
   const d = new Date(data.generated_at);
   document.getElementById("last-updated").textContent =
     `Updated ${d.toLocaleDateString()} ${d.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" })}`;
 
-  renderVolume();
-  renderHeatmap();
-  renderTraining();
-  renderStrengthTab();
-  setupProgressiveOverload();
-  renderNutrition(30);
-  renderCoachSummary();
-  renderBodyComp(30);
-  renderCutProgress();
-  renderTdeeChart(30);
-  renderDeficitChart();
   setupTabs();
   setupBodyCompRange();
   setupTdeeRange();
   setupNutRange();
+  await showTab(document.querySelector(".tab.active").dataset.tab);
+}
+
+// ── Data loading ──────────────────────────────────────────────────────────────
+// manifest.json names the current data version, the recent patches (see
+// "Delta output" in parse.py) and the view shards ("View shards"). The last
+// document is kept in IndexedDB; a later visit applies the patches since its
+// version, and fetches afresh when it's too far behind, the patches add up to
+// more, or anything fails. A fresh load starts from the small "core" shard and
+// adds a tab's shards when the tab opens.
+
+const DATA_DB = "workout-dashboard";
+const DATA_STORE = "data";
+
+function idbRequest(mode, fn) {
+  return new Promise((resolve, reject) => {
+    if (!window.indexedDB) return resolve(null);
+    const open = indexedDB.open(DATA_DB, 1);
+    open.onupgradeneeded = () => open.result.createObjectStore(DATA_STORE);
+    open.onerror = () => reject(open.error);
+    open.onsuccess = () => {
+      const db = open.result;
+      const tx = db.transaction(DATA_STORE, mode);
+      const req = fn(tx.objectStore(DATA_STORE));
+      tx.oncomplete = () => { db.close(); resolve(req.result); };
+      tx.onerror = () => { db.close(); reject(tx.error); };
+    };
+  });
+}
+
+// Stored as {doc, shards}; caches from before sharding hold the bare document
+const readCached = () => idbRequest("readonly", s => s.get("doc"))
+  .then(v => v && (v.doc ? v : { doc: v, shards: null }))
+  .catch(() => null);
+const writeCached = (doc, shards) => idbRequest("readwrite", s => s.put({ doc, shards }, "doc")).catch(() => null);
+
+async function fetchJSON(url) {
+  const res = await fetch(url, { cache: "no-cache" });
+  if (!res.ok) throw new Error(`${url}: HTTP ${res.status}`);
+  return res.json();
+}
+
+// Mirrors apply_patch in parse.py; ops on sections for which skip() is true are left out
+function applyPatch(doc, ops, skip = () => false) {
+  for (const op of ops) {
+    if (skip(op.path[0])) continue;
+    const last = op.path[op.path.length - 1];
+    const target = op.path.slice(0, -1).reduce((o, k) => o[k], doc);
+    if (op.op === "set") target[last] = op.value;
+    else if (op.op === "del") delete target[last];
+    else if (op.op === "splice") target[last] = target[last].slice(0, op.at).concat(op.values);
+    else if (op.op === "rows") {
+      const dropped = new Set(op.delete);
+      const rows = new Map();
+      for (const r of target[last]) if (!dropped.has(r[op.key])) rows.set(r[op.key], r);
+      for (const r of op.upsert) rows.set(r[op.key], r);
+      target[last] = [...rows.keys()].sort().map(k => rows.get(k));
+    }
+  }
+  return doc;
+}
+
+// Sections of the shards not loaded yet: their patch ops are skipped, and they
+// arrive at the current version when their shard is fetched.
+function unloadedSection(loaded) {
+  if (!loaded || !manifest.shards) return () => false;
+  const shardOf = {};
+  for (const [name, s] of Object.entries(manifest.shards)) for (const k of s.sections) shardOf[k] = name;
+  return section => !loaded.includes(shardOf[section]);
+}
+
+async function fetchData() {
+  try {
+    manifest = await fetchJSON("./manifest.json");
+  } catch {
+    return { doc: await fetchJSON("./data.json"), shards: null };  // deployed without patches
+  }
+  const cached = await readCached();
+  if (cached && cached.doc.version === manifest.version) return cached;
+  if (cached && cached.doc.version < manifest.version) {
+    const chain = manifest.patches.filter(p => p.from >= cached.doc.version);
+    const linked = chain.length && chain.every((p, i) => p.from === (i ? chain[i - 1].to : cached.doc.version));
+    const bytes = chain.reduce((sum, p) => sum + p.bytes, 0);
+    if (linked && bytes < manifest.snapshot.bytes) {
+      try {
+        const patches = await Promise.all(chain.map(p => fetchJSON("./" + p.file)));
+        const skip = unloadedSection(cached.shards);
+        const doc = patches.reduce((d, p) => applyPatch(d, p.ops, skip), cached.doc);
+        if (doc.version === manifest.version) {
+          writeCached(doc, cached.shards);
+          return { doc, shards: cached.shards };
+        }
+      } catch (err) {
+        console.warn("Patch update failed; loading afresh", err);
+      }
+    }
+  }
+  if (manifest.shards?.core) {
+    const core = await fetchJSON("./" + manifest.shards.core.file);
+    if (core.version === manifest.version) {
+      writeCached(core, ["core"]);
+      return { doc: core, shards: ["core"] };
+    }
+  }
+  const doc = await fetchJSON("./data.json");
+  writeCached(doc, null);
+  return { doc, shards: null };
+}
+
+// Merge the named shards into doc (and data) unless they're loaded already.
+async function ensureShards(names) {
+  const missing = shards ? names.filter(n => !shards.includes(n)) : [];
+  if (!missing.length) return;
+  // a build without shards (--stream) only has the whole document
+  const whole = missing.some(n => !manifest.shards?.[n]);
+  const parts = whole
+    ? [await fetchJSON("./data.json")]
+    : await Promise.all(missing.map(n => fetchJSON("./" + manifest.shards[n].file)));
+  if (parts.some(p => p.version !== doc.version)) {
+    location.reload();  // data.json was rebuilt since this page loaded: start over at the new version
+    return new Promise(() => {});
+  }
+  for (const part of parts) {
+    for (const [k, v] of Object.entries(part)) {
+      doc[k] = v;
+      data[k] = k === "workouts" ? decodeWorkouts(v) : v;
+    }
+  }
+  shards = whole ? null : [...shards, ...missing];
+  writeCached(doc, shards);
 }
 
 // ── Tabs ──────────────────────────────────────────────────────────────────────
 
+async function showTab(tab) {
+  const view = TAB_VIEWS[tab];
+  if (!view || renderedTabs.has(tab)) return;
+  renderedTabs.add(tab);
+  try {
+    await ensureShards(view.shards);
+  } catch (err) {
+    renderedTabs.delete(tab);  // retry on the next click
+    console.error(`Loading the ${tab} tab failed`, err);
+    return;
+  }
+  view.render();
+}
+
+function activateTab(tab) {
+  document.querySelectorAll(".tab").forEach(b => b.classList.toggle("active", b.dataset.tab === tab));
+  document.querySelectorAll(".tab-content").forEach(s => s.classList.toggle("active", s.id === tab));
+  return showTab(tab);
+}
+
 function setupTabs() {
   document.querySelectorAll(".tab").forEach(btn => {
-    btn.addEventListener("click", () => {
-      document.querySelectorAll(".tab").forEach(b => b.classList.remove("active"));
-      document.querySelectorAll(".tab-content").forEach(s => s.classList.remove("active"));
-      btn.classList.add("active");
-      document.getElementById(btn.dataset.tab).classList.add("active");
-    });
+    btn.addEventListener("click", () => activateTab(btn.dataset.tab));
   });
 }
 
@@ -59,14 +212,61 @@ function setupTabs() {
 
 function round1(v) { return Math.round(v * 10) / 10; }
 
-function filterLast(arr, days, dateKey = "date") {
-  if (!days) return arr;
+// data.json ships workouts as struct-of-arrays: per-session lists, interned
+// exercise/set-type tables, and per-set columns tagged with their session index.
+// Rebuild [{date, workout_name, duration_sec, sets: [{exercise, set_type, weight_kg, reps, rir}]}].
+function decodeWorkouts(w) {
+  if (!w || Array.isArray(w)) return w || [];
+  const out = w.dates.map((date, k) => ({
+    date, workout_name: w.workout_name[k], duration_sec: w.duration_sec[k], sets: [],
+  }));
+  const s = w.sets;
+  for (let i = 0; i < s.workout.length; i++) {
+    out[s.workout[i]].sets.push({
+      exercise: w.exercises[s.exercise[i]],
+      set_type: w.set_types[s.set_type[i]],
+      weight_kg: s.weight_kg[i],
+      reps: s.reps[i],
+      rir: s.rir[i],
+    });
+  }
+  return out;
+}
+
+function cutoffDate(days) {
   const cutoff = new Date();
   cutoff.setDate(cutoff.getDate() - days);
-  const cutStr = cutoff.toISOString().slice(0, 10);
+  return cutoff.toISOString().slice(0, 10);
+}
+
+function filterLast(arr, days, dateKey = "date") {
+  if (!days) return arr;
+  const cutStr = cutoffDate(days);
   return arr.filter(r => r[dateKey] >= cutStr);
 }
 
+// data.series holds each range chart's rows at weekly and monthly resolution
+// (see "Downsampled series" in parse.py). Use the finest resolution that keeps
+// the selected range under SERIES_MAX_POINTS, so "All" costs the same as 30d.
+// With retention (data.rollups) the daily rows start at full_from; a range
+// reaching further back goes to the weekly series, which covers all of it.
+const SERIES_MAX_POINTS = 120;
+
+function chartSeries(name, daily, days, keep = () => true) {
+  let rows = filterLast(daily, days).filter(keep);
+  let resolution = "daily";
+  const fullFrom = data.rollups?.full_from;
+  let truncated = fullFrom && daily.length && daily[0].date >= fullFrom && (!days || cutoffDate(days) < fullFrom);
+  for (const res of ["weekly", "monthly"]) {
+    const coarse = data.series?.[name]?.[res];
+    if ((rows.length <= SERIES_MAX_POINTS && !truncated) || !coarse) break;
+    rows = filterLast(coarse, days).filter(keep);
+    resolution = res;
+    truncated = false;
+  }
+  return { rows, resolution };
+}
+
 function destroyChart(id) {
   if (charts[id]) { charts[id].destroy(); delete charts[id]; }
 }
@@ -237,7 +437,7 @@ function setText(id, val) {
 // ── Body comp charts ──────────────────────────────────────────────────────────
 
 function renderBodyComp(days) {
-  const bc = filterLast(data.body_comp, days);
+  const { rows: bc } = chartSeries("body_comp", data.body_comp, days);
   if (!bc.length) return;
 
   const labels = bc.map(r => r.date.slice(5)); // MM-DD
@@ -381,9 +581,7 @@ function renderCutProgress() {
 
 function renderTdeeChart(days) {
   const TDEE_COLOR = "#ff9944";
-  const rows = filterLast(data.mf_daily, days).filter(
-    r => r.tdee != null || r.kcal != null
-  );
+  const { rows } = chartSeries("tdee", data.mf_daily, days, r => r.tdee != null || r.kcal != null);
   if (!rows.length) return;
 
   const labels = rows.map(r => r.date.slice(5));
@@ -538,9 +736,11 @@ function nutAvg(rows, key) {
 }
 
 function renderNutrition(days) {
-  const rows = filterLast(data.mf_daily, days).filter(r => r.protein_g != null || r.kcal != null);
+  const { rows, resolution } = chartSeries("nutrition", data.mf_daily, days,
+    r => r.protein_g != null || r.kcal != null);
   if (!rows.length) return;
   const labels = rows.map(r => r.date.slice(5));
+  const avgOf = resolution === "daily" ? "" : ` (${resolution} avg)`;
 
   // ── Rolling stats: last 7d vs previous 7d ────────────────────────────────
   const all = data.mf_daily;
@@ -626,7 +826,7 @@ function renderNutrition(days) {
       labels,
       datasets: [
         {
-          label: "Protein",
+          label: "Protein" + avgOf,
           data: rows.map(r => r.protein_g ?? null),
           backgroundColor: ACCENT2 + "99",
           borderRadius: 2,
@@ -670,7 +870,7 @@ function renderNutrition(days) {
       labels,
       datasets: [
         {
-          label: "Calories",
+          label: "Calories" + avgOf,
           data: rows.map(r => r.kcal ?? null),
           backgroundColor: ACCENT + "99",
           borderRadius: 2,
@@ -1136,10 +1336,12 @@ function renderStrengthStandards(allTimePR, bwKg) {
 
 // ── Progressive overload ──────────────────────────────────────────────────────
 
-let _exMap = null;  // exercise → [{date, weight_kg, effective_kg, reps, e1rm, rir, isAssisted}]
+let _exMap = null;  // exercise → [{date, weight_kg, effective_kg, reps, e1rm, rir, is_assisted}]
 let _exOrder = [];  // sorted by session count desc
 let _relativeMode = false;  // ÷BW toggle state
 let _allTimePR = {};  // exercise → best PR entry (hoisted for use in both tabs)
+let _exSetCount = {};  // exercise → working-set count (PR list ranking)
+let _exSessions = {};  // exercise → session count (histories may be cut by retention)
 
 // Exponentially-weighted linear regression for trend detection.
 // Half-life = 4 sessions → recent data weighted ~2× more than 4 sessions ago.
@@ -1161,13 +1363,20 @@ function bayesianTrend(vals) {
   }, 0);
   const sigma2 = rss / Math.max(n - 2, 1);
   const tStat  = slope / Math.sqrt(sigma2 / Sxx);
-  let label = "stalled", cls = "pill-yellow";
-  if (tStat >  1.5) { label = "progressing ↑"; cls = "pill-green"; }
-  if (tStat < -1.5) { label = "regressing ↓";  cls = "pill-red";   }
+  const direction = tStat > 1.5 ? 1 : (tStat < -1.5 ? -1 : 0);
   // Trend line endpoints for chart overlay
   const y0 = my + slope * (0     - mx);
   const y1 = my + slope * (n - 1 - mx);
-  return { label, cls, trendLine: [y0, y1] };
+  return trendBadge({ direction, trend_line: [y0, y1] });
+}
+
+// Badge + trend line from a fit ({direction, trend_line}); parse.py emits these in data.trends
+function trendBadge(fit) {
+  if (!fit) return { label: "", cls: "", trendLine: null };
+  let label = "stalled", cls = "pill-yellow";
+  if (fit.direction > 0) { label = "progressing ↑"; cls = "pill-green"; }
+  if (fit.direction < 0) { label = "regressing ↓";  cls = "pill-red";   }
+  return { label, cls, trendLine: fit.trend_line };
 }
 
 // Module-level BW lookup (populated by buildExMap, used by renderProgressiveOverload)
@@ -1183,38 +1392,23 @@ function getBW(date) {
 function buildExMap() {
   if (_exMap) return;
   _exMap = {};
-  const counts = {};
 
-  // Build date → bodyweight lookup from body_comp (for assisted e1RM)
+  // Build date → bodyweight lookup from body_comp (for assisted / BW-relative views)
   if (data.body_comp) {
     for (const bc of data.body_comp) _bwByDate[bc.date] = bc.trend_kg;
     const dates = Object.keys(_bwByDate).sort();
     if (dates.length) _latestBW = _bwByDate[dates[dates.length - 1]];
   }
 
-  for (const w of data.workouts) {
-    const bw = getBW(w.date);
-    const best = {};
-    for (const s of w.sets) {
-      if (!s.weight_kg || !s.reps || s.set_type === "Drop") continue;
-      const ex = s.exercise;
-      const isAssisted = s.weight_kg < 0;
-      // For assisted: effective load = bodyweight − assistance; use latest BW if none found
-      const effectiveW = isAssisted
-        ? ((bw ?? _latestBW ?? 80) - Math.abs(s.weight_kg))
-        : s.weight_kg;
-      const e1rm = effectiveW * (1 + s.reps / 30);
-      if (!best[ex] || e1rm > best[ex].e1rm) {
-        best[ex] = { date: w.date, weight_kg: s.weight_kg, effective_kg: round1(effectiveW), reps: s.reps, e1rm, rir: s.rir, isAssisted };
-      }
-    }
-    for (const [ex, entry] of Object.entries(best)) {
-      if (!_exMap[ex]) _exMap[ex] = [];
-      _exMap[ex].push(entry);
-      counts[ex] = _exMap[ex].length;
-    }
+  // Session-best e1RM histories, PRs and credibility inputs are precomputed by parse.py
+  const byEx = data.exercises?.by_exercise || {};
+  for (const [ex, x] of Object.entries(byEx)) {
+    _exMap[ex] = x.history;
+    _allTimePR[ex] = x.pr;
+    _exSetCount[ex] = x.set_count;
+    _exSessions[ex] = x.sessions ?? x.history.length;
   }
-  _exOrder = Object.entries(counts).sort((a, b) => b[1] - a[1]).map(([ex]) => ex);
+  _exOrder = data.exercises?.order || [];
   computeCredibility();
 }
 
@@ -1229,92 +1423,32 @@ function classifyEquipment(ex) {
   return "other";
 }
 
-const EQUIP_TRUST = { free: 1.0, cable: 0.92, machine: 0.82, egym: 0.55, other: 0.78 };
-
-// MAD-based outlier detection (robust to outliers themselves)
-function flagOutliers(values) {
-  const n = values.length;
-  if (n < 4) return values.map(() => false);
-  const sorted = [...values].sort((a, b) => a - b);
-  const med = sorted[Math.floor(n / 2)];
-  const absDevs = values.map(v => Math.abs(v - med));
-  const mad = [...absDevs].sort((a, b) => a - b)[Math.floor(n / 2)];
-  const sigma = 1.4826 * mad; // MAD → σ equivalence under normal
-  if (sigma < 2) return values.map(() => false);
-  return values.map(v => Math.abs(v - med) > 2.5 * sigma);
-}
-
 let _exCred = {};
 
+// parse.py emits everything except the recency factor, which depends on today:
+// confidence = base × e^(−days since last session / 45), then blend robust peak ←
+// recency-weighted mean by confidence (high confidence → trust peak).
 function computeCredibility() {
   _exCred = {};
   const today = new Date();
+  const byEx = data.exercises?.by_exercise || {};
 
-  for (const [ex, history] of Object.entries(_exMap)) {
-    const n = history.length;
-    const e1rms = history.map(e => e.e1rm);
-    const dates = history.map(e => e.date);
-
-    // 1. Outlier detection
-    const outliers = flagOutliers(e1rms);
-
-    // 2. Clean values (non-outlier)
-    const cleanE1rms = [], cleanDates = [];
-    for (let i = 0; i < n; i++) {
-      if (!outliers[i]) { cleanE1rms.push(e1rms[i]); cleanDates.push(dates[i]); }
-    }
-
-    // 3. Recency-weighted mean (half-life 30 days)
-    const hl = Math.LN2 / 30;
-    let wSum = 0, wTotal = 0;
-    for (let i = 0; i < cleanE1rms.length; i++) {
-      const age = (today - new Date(cleanDates[i])) / 86400000;
-      const w = Math.exp(-hl * age);
-      wSum += w * cleanE1rms[i]; wTotal += w;
-    }
-    const weightedMean = wTotal > 0 ? wSum / wTotal : e1rms[e1rms.length - 1];
-
-    // 4. Robust peak: P90 of clean values
-    const sc = [...cleanE1rms].sort((a, b) => a - b);
-    const robustPeak = sc.length >= 2 ? sc[Math.min(Math.floor(sc.length * 0.9), sc.length - 1)] : (sc[0] || Math.max(...e1rms));
-
-    // 5. Component factors
-    const equipType = classifyEquipment(ex);
-    const equipFactor = EQUIP_TRUST[equipType];
-    const sessionFactor = 1 - Math.exp(-n / 5);
-    const daysSinceLast = (today - new Date(dates[dates.length - 1])) / 86400000;
+  for (const [ex, x] of Object.entries(byEx)) {
+    const c = x.credibility;
+    const daysSinceLast = (today - new Date(c.last_date)) / 86400000;
     const recencyFactor = Math.exp(-daysSinceLast / 45);
-
-    // Consistency (CV of clean values)
-    let cv = 0;
-    if (cleanE1rms.length >= 3) {
-      const mean = cleanE1rms.reduce((a, b) => a + b, 0) / cleanE1rms.length;
-      const std = Math.sqrt(cleanE1rms.reduce((s, v) => s + (v - mean) ** 2, 0) / cleanE1rms.length);
-      cv = mean > 0 ? std / mean : 0;
-    }
-    const consistencyFactor = 1 / (1 + cv * 4);
-
-    // 6. Composite confidence (0–1)
-    const confidence = Math.min(1, sessionFactor * recencyFactor * equipFactor * consistencyFactor);
-
-    // 7. Bayesian estimate: blend robust peak ← weighted mean by confidence
-    //    High confidence → trust peak, low → shrink toward weighted mean
-    const credibleE1rm = round1(confidence * robustPeak + (1 - confidence) * weightedMean);
-
-    // 8. Confidence interval (±) from clean data std, penalized by equipment + sample size
-    const cleanStd = cleanE1rms.length >= 2
-      ? Math.sqrt(cleanE1rms.reduce((s, v) => s + (v - weightedMean) ** 2, 0) / cleanE1rms.length)
-      : robustPeak * 0.1;
-    const ci = round1((cleanStd / Math.sqrt(Math.max(cleanE1rms.length, 1))) / equipFactor * 1.96);
+    const confidence = Math.min(1, c.base_confidence * recencyFactor);
 
     _exCred[ex] = {
       confidence: round1(confidence * 100) / 100,
-      credibleE1rm, ci,
-      rawBest: round1(Math.max(...e1rms)),
-      weightedMean: round1(weightedMean),
-      equipType, equipFactor,
-      outliers,
-      outlierCount: outliers.filter(Boolean).length,
+      credibleE1rm: round1(confidence * c.robust_peak + (1 - confidence) * c.weighted_mean),
+      ci: c.ci,
+      rawBest: c.raw_best,
+      weightedMean: round1(c.weighted_mean),
+      equipType: c.equip_type,
+      equipFactor: c.equip_factor,
+      outliers: c.outliers,
+      outlierCount: c.outlier_count,
     };
   }
 }
@@ -1325,7 +1459,7 @@ function renderProgressiveOverload(exercise) {
   const history = _exMap[exercise];
   if (!history || history.length < 2) return;
 
-  const isAssisted = history.some(e => e.isAssisted);
+  const isAssisted = history.some(e => e.is_assisted);
   const labels = history.map(e => e.date.slice(5));
   const bwNow = data.summary?.trend_kg;
 
@@ -1334,8 +1468,9 @@ function renderProgressiveOverload(exercise) {
     ? history.map(e => round1(e.e1rm / (getBW(e.date) || bwNow || 80)))
     : history.map(e => round1(e.e1rm));
 
-  // Bayesian trend over all sessions (exponentially weighted regression)
-  const trend = bayesianTrend(e1rms);
+  // Bayesian trend over all sessions (exponentially weighted regression);
+  // absolute e1RM fits are precomputed by parse.py, ÷BW ones are fitted here
+  const trend = _relativeMode ? bayesianTrend(e1rms) : trendBadge(data.trends?.exercises?.[exercise]);
 
   const badge = document.getElementById("po-trend-badge");
   if (badge) {
@@ -1348,17 +1483,22 @@ function renderProgressiveOverload(exercise) {
   const cred = _exCred[exercise];
   const outlierFlags = cred ? cred.outliers : history.map(() => false);
 
-  // PR flags: each point that sets a new all-time high e1RM
-  let allTimeBest = -Infinity;
+  // PR flags: each point that sets a new all-time high e1RM (a history cut by
+  // retention starts from the best of the rolled-up sessions before it)
+  const earlierBest = data.exercises?.by_exercise?.[exercise]?.earlier_best_e1rm;
+  let allTimeBest = !_relativeMode && earlierBest != null ? round1(earlierBest) : -Infinity;
   const prFlags = e1rms.map(v => {
     if (v > allTimeBest) { allTimeBest = v; return true; }
     return false;
   });
 
-  // Trend line: two-point line from Bayesian regression
+  // Trend line: two-point line from Bayesian regression. parse.py fits every
+  // session, so a history cut by retention shows the last `labels.length` of them.
+  const nFit = _relativeMode ? labels.length : _exSessions[exercise];
+  const skip = nFit - labels.length;
   const trendData = trend.trendLine
     ? labels.map((_, i) => {
-        const frac = i / (labels.length - 1);
+        const frac = (skip + i) / (nFit - 1);
         return round1(trend.trendLine[0] + frac * (trend.trendLine[1] - trend.trendLine[0]));
       })
     : null;
@@ -1475,12 +1615,12 @@ function renderProgressiveOverload(exercise) {
     const confPct = cred ? Math.round(cred.confidence * 100) : null;
     const confCls = confPct >= 60 ? "trend-good" : confPct >= 35 ? "trend-warn" : "trend-bad";
     const confLine = confPct !== null
-      ? `Confidence: <span class="${confCls}" data-tip="Composite of ${history.length} sessions × ${cred.equipType} equipment × recency × consistency">${confPct}%</span>` : "";
+      ? `Confidence: <span class="${confCls}" data-tip="Composite of ${_exSessions[exercise]} sessions × ${cred.equipType} equipment × recency × consistency">${confPct}%</span>` : "";
     const outlierLine = cred && cred.outlierCount
       ? `<span class="po-stat" style="color:var(--red);font-size:0.68rem" data-tip="MAD-based detection: values >2.5σ from median flagged as suspect">${cred.outlierCount} suspect point${cred.outlierCount > 1 ? "s" : ""} excluded from estimate</span>` : "";
 
     statsEl.innerHTML = `
-      <span class="po-stat">Sessions: <span>${history.length}</span></span>
+      <span class="po-stat">Sessions: <span>${_exSessions[exercise]}</span></span>
       <span class="po-stat">${credLine}</span>
       <span class="po-stat">${confLine}</span>
       <span class="po-stat">${latestLine}</span>
@@ -1529,7 +1669,7 @@ function setupProgressiveOverload() {
   if (!catRow || !listEl) return;
 
   // Annotate each exercise with its category
-  const exWithCat = _exOrder.map(ex => ({ ex, cat: getExCat(ex), n: _exMap[ex].length }));
+  const exWithCat = _exOrder.map(ex => ({ ex, cat: getExCat(ex), n: _exSessions[ex] }));
 
   // Build category pills (only show categories that have exercises)
   const presentCats = ["all", ...Object.keys(EX_CAT_LABELS).filter(c => c !== "all" && exWithCat.some(e => e.cat === c))];
@@ -1861,8 +2001,7 @@ function renderStrengthTab() {
   setSparkCard("str-lower-val", "str-lower-delta", "str-lower-spark", series.lower);
   setSparkCard("str-total-val", "str-total-delta", "str-total-spark", series.total);
 
-  // Strength standards uses allTimePR — rendered after renderTraining populates _allTimePR
-  // Called again after renderTraining() in loadData, so this is safe.
+  // Strength standards uses allTimePR — populated by buildExMap above
   renderStrengthStandards(_allTimePR, data.summary?.trend_kg);
 }
 
@@ -1872,25 +2011,9 @@ function renderTraining() {
   const workouts = data.workouts;
   if (!workouts || !workouts.length) return;
 
-  buildExMap();  // ensure _exMap is populated before PR calculation
-
-  // ── Build all-time PR map: exercise → {weight_kg, reps, e1rm, date} ───────
-  const allTimePR  = _allTimePR;  // use module-level so Strength tab can access it
-  const setCount   = {};  // exercise → total set count (for ranking)
-
-  for (const w of workouts) {
-    for (const s of w.sets) {
-      if (!s.weight_kg || !s.reps || s.set_type === "Drop") continue;
-      const ex = s.exercise;
-      setCount[ex] = (setCount[ex] || 0) + 1;
-      // Use effective weight from _exMap if available (handles assisted correctly)
-      const mapEntry = _exMap?.[ex]?.find(e => e.date === w.date);
-      const e1rm = mapEntry ? mapEntry.e1rm : s.weight_kg * (1 + s.reps / 30);
-      if (!allTimePR[ex] || e1rm > allTimePR[ex].e1rm) {
-        allTimePR[ex] = { weight_kg: s.weight_kg, reps: s.reps, e1rm, date: w.date, isAssisted: s.weight_kg < 0 };
-      }
-    }
-  }
+  buildExMap();  // populates _allTimePR / _exSetCount from data.exercises
+  const allTimePR = _allTimePR;
+  const setCount  = _exSetCount;
 
   // ── RIR trend + session volume charts ────────────────────────────────────
   const recent30 = workouts.slice(-30);
@@ -1986,7 +2109,7 @@ function renderTraining() {
       const e1rm = cred ? cred.credibleE1rm : Math.round(pr.e1rm);
       const rawBest = Math.round(pr.e1rm);
       const isSuspect = cred && cred.outlierCount > 0 && rawBest !== Math.round(cred.credibleE1rm);
-      const weightStr = pr.isAssisted
+      const weightStr = pr.is_assisted
         ? `${Math.abs(pr.weight_kg)} kg↑ × ${pr.reps}`
         : `${pr.weight_kg} kg × ${pr.reps}`;
 
@@ -2030,20 +2153,15 @@ function renderTraining() {
     prList.querySelectorAll(".pr-row[data-exercise]").forEach(row => {
       row.addEventListener("click", () => {
         const ex = row.dataset.exercise;
-        document.querySelectorAll(".tab").forEach(b => b.classList.remove("active"));
-        document.querySelectorAll(".tab-content").forEach(s => s.classList.remove("active"));
-        const strengthTab = document.querySelector('[data-tab="strength"]');
-        const strengthSection = document.getElementById("strength");
-        if (strengthTab) strengthTab.classList.add("active");
-        if (strengthSection) strengthSection.classList.add("active");
-        if (_exMap?.[ex]) {
+        activateTab("strength").then(() => {
+          if (!_exMap?.[ex]) return;
           _activeEx = ex;
           document.querySelectorAll(".ex-list-item").forEach(el =>
             el.classList.toggle("active", el.dataset.ex === ex)
           );
           renderProgressiveOverload(ex);
           document.getElementById("po-chart")?.scrollIntoView({ behavior: "smooth", block: "center" });
-        }
+        });
       });
     });
   }
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Local dashboard server: serves public/ plus a windowed JSON API over data.json.
+
+  GET /api                                     sections and their date keys
+  GET /api/<section>                           one top-level section of data.json
+  GET /api/<section>?days=30                   rows dated within the last 30 days
+  GET /api/<section>?from=2025-01-01&to=...    rows in an inclusive date range
+
+Date-keyed sections (body_comp, mf_daily, workouts, weight, push_pull_weekly,
+rolling, ...) are indexed once per data.json and sliced by bisection; `days` uses
+the same cutoff as filterLast() in app.js. Responses carry ETag/Last-Modified,
+answer conditional GETs with 304, and are gzipped when the client accepts it;
+/data.json itself gets the same treatment. data.json is reloaded when parse.py
+replaces it.
+
+Usage:
+  python serve.py                    # http://localhost:8080
+  python serve.py --port 9000 --bind 0.0.0.0
+  python serve.py --bench            # load benchmark against a throwaway server
+"""
+
+import argparse
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_cls, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = Path(__file__).resolve().parent
+PUBLIC_DIR = ROOT / "public"
+DATA_PATH = PUBLIC_DIR / "data.json"
+
+GZIP_MIN_BYTES = 1024  # smaller bodies aren't worth the header + CPU
+GZIP_LEVEL = 6
+RESPONSE_CACHE_SIZE = 256  # encoded responses kept per data.json version
+
+# section → date field of its rows. "rolling" (parallel lists over "dates") and
+# "workouts" (per-session lists over "dates" plus per-set columns) are columnar.
+DATE_KEYS = {
+    "mf_daily": "date",
+    "muscle_sets": "date",
+    "muscle_volume": "date",
+    "weight": "date",
+    "body_comp": "date",
+    "hc_body_fat": "date",
+    "cardio": "date",
+    "push_pull_weekly": "week_start",
+    "volume_rolling": "date",
+}
+NEWEST_FIRST = {"cardio"}  # row sections parse.py emits in descending date order
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ── Data store ────────────────────────────────────────────────────────────────
+
+class Snapshot:
+    """
+    One loaded data.json: raw bytes, parsed document, date indexes, version and
+    mtime, plus the encoded responses built from it. Only the response cache
+    changes after construction, so a request that holds a snapshot reads one
+    consistent document even if a reload swaps in the next one meanwhile.
+    """
+
+    def __init__(self, raw: bytes, mtime: float):
+        self.raw = raw
+        self.data = json.loads(raw)
+        self.dates = {}
+        for name, key in DATE_KEYS.items():
+            rows = self.data.get(name)
+            if isinstance(rows, list):
+                dates = [r[key] for r in rows]
+                self.dates[name] = dates[::-1] if name in NEWEST_FIRST else dates
+        for name in ("rolling", "workouts"):
+            if isinstance(self.data.get(name), dict):
+                self.dates[name] = self.data[name]["dates"]
+        for name, dates in self.dates.items():  # a window bisects these, so order must hold
+            if any(a > b for a, b in zip(dates, dates[1:])):
+                order = "descending" if name in NEWEST_FIRST else "ascending"
+                raise ApiError(500, f"{name!r} in data.json isn't in {order} date order")
+        self.version = hashlib.sha1(raw).hexdigest()[:16]
+        self.mtime = mtime
+        self._responses: dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def query(self, section: str, params: dict):
+        """One section, sliced to the days/from/to window in params."""
+        if section not in self.data:
+            raise ApiError(404, f"unknown section {section!r}")
+        value = self.data[section]
+        days, lo, hi = params.get("days"), params.get("from"), params.get("to")
+        if days is None and lo is None and hi is None:
+            return value
+        if section not in self.dates:
+            raise ApiError(400, f"{section!r} isn't date-indexed; drop days/from/to")
+        if days is not None:
+            if lo is not None:
+                raise ApiError(400, "use either days or from/to")
+            try:
+                n = int(days)
+            except ValueError:
+                raise ApiError(400, f"days must be an integer, got {days!r}") from None
+            lo = (date_cls.today() - timedelta(days=n)).isoformat()
+        for v in (lo, hi):
+            if v is not None:
+                try:
+                    date_cls.fromisoformat(v)
+                except ValueError:
+                    raise ApiError(400, f"dates must be YYYY-MM-DD, got {v!r}") from None
+        index = self.dates[section]
+        i = bisect_left(index, lo) if lo is not None else 0
+        j = bisect_right(index, hi) if hi is not None else len(index)
+        if section in NEWEST_FIRST:  # index is reversed: ascending i:j is n-j:n-i of the rows
+            i, j = len(index) - j, len(index) - i
+        if section == "rolling":
+            value = {k: _slice_rolling(k, v, i, j) for k, v in value.items()}
+        elif section == "workouts":
+            value = _slice_workouts(value, i, j)
+        else:
+            value = value[i:j]
+        return value
+
+    def response(self, section: str | None, params: dict) -> tuple[str, bytes, bytes | None]:
+        """(etag, json body, gzipped body or None), cached in this snapshot; None = all of data.json."""
+        today = date_cls.today().isoformat() if "days" in params else ""
+        key = (section, tuple(sorted(params.items())), today)
+        hit = self._responses.get(key)
+        if hit is not None:
+            return hit
+        if section is None:
+            body = self.raw
+        else:
+            body = json.dumps(self.query(section, params), separators=(",", ":")).encode()
+        packed = gzip.compress(body, GZIP_LEVEL, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        tag = hashlib.sha1(repr(key).encode()).hexdigest()[:8]
+        hit = (f'"{self.version}-{tag}"', body, packed)
+        with self._lock:
+            if len(self._responses) >= RESPONSE_CACHE_SIZE:
+                self._responses.pop(next(iter(self._responses)))
+            self._responses[key] = hit
+        return hit
+
+    def sections(self) -> dict:
+        return {
+            name: {"date_key": DATE_KEYS.get(name, "dates" if name in self.dates else None),
+                   "rows": len(self.dates[name]) if name in self.dates else None}
+            for name in self.data
+        }
+
+
+class DataStore:
+    """
+    The current data.json as a Snapshot. Each request stats the file (cheap) and
+    reloads it when size/mtime change; parse.py replaces it atomically, so a
+    reload never sees a partial write. Handlers take the snapshot refresh()
+    returns and read only that for the rest of the request.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._current: tuple[tuple, Snapshot] | None = None  # (file stat, snapshot), swapped as one
+        self.reloads = 0
+
+    def refresh(self) -> Snapshot:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            raise ApiError(503, f"{self.path.name} not found — run parse.py first") from None
+        stat = (st.st_size, st.st_mtime_ns)
+        current = self._current
+        if current is not None and current[0] == stat:
+            return current[1]
+        with self._lock:
+            if self._current is None or self._current[0] != stat:
+                self._current = (stat, Snapshot(self.path.read_bytes(), st.st_mtime))
+                self.reloads += 1
+            return self._current[1]
+
+
+def _slice_rolling(name: str, v, i: int, j: int):
+    if name == "dates":
+        return v[i:j]
+    if isinstance(v, dict):  # {"7": [...], "14": [...]}
+        return {w: s[i:j] for w, s in v.items()}
+    return v  # "windows"
+
+
+def _slice_workouts(w: dict, i: int, j: int) -> dict:
+    """Sessions i:j and their sets (contiguous, since sets are ordered by session)."""
+    sets = w["sets"]
+    a, b = bisect_left(sets["workout"], i), bisect_left(sets["workout"], j)
+    out = {k: v[i:j] if k in ("dates", "workout_name", "duration_sec") else v
+           for k, v in w.items() if k != "sets"}
+    out["sets"] = {k: v[a:b] for k, v in sets.items()}
+    out["sets"]["workout"] = [k - i for k in out["sets"]["workout"]]
+    return out
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+
+class DashboardHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response sets Content-Length
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    store: DataStore = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/api" or url.path.startswith("/api/"):
+            self.handle_api(url.path[len("/api/"):].strip("/"), url.query)
+        elif url.path == "/" + self.store.path.name:
+            self.handle_api(None, "")  # the full document, with the same ETag/gzip handling
+        else:
+            super().do_GET()
+
+    def handle_api(self, section: str | None, query: str) -> None:
+        try:
+            snap = self.store.refresh()
+            if section == "":
+                self.send_json(200, snap.sections())
+                return
+            params = {k: v[-1] for k, v in parse_qs(query).items() if k in ("days", "from", "to")}
+            etag, body, packed = snap.response(section, params)
+        except ApiError as e:
+            self.send_json(e.status, {"error": str(e)})
+            return
+
+        # a days=N window moves at midnight without data.json changing, so only the
+        # ETag (which includes today's date) can validate it: no Last-Modified
+        mtime = None if "days" in params else snap.mtime
+        if self.not_modified(etag, mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            if mtime is not None:
+                self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        use_gzip = packed is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        if mtime is not None:
+            self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        self.send_header("Cache-Control", "no-cache")  # always revalidate; 304s are cheap
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        out = packed if use_gzip else body
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def not_modified(self, etag: str, mtime: float | None) -> bool:
+        """Conditional GET check; mtime=None ignores If-Modified-Since."""
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:  # If-None-Match wins over If-Modified-Since (RFC 9110)
+            return etag in (t.strip() for t in inm.split(",")) or inm.strip() == "*"
+        ims = self.headers.get("If-Modified-Since")
+        if ims is None or mtime is None:
+            return False
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since.timestamp()
+
+    def send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(bind: str, port: int, data_path: Path = DATA_PATH,
+                directory: Path = PUBLIC_DIR, quiet: bool = False) -> ThreadingHTTPServer:
+    store = DataStore(data_path)
+    handler = type("Handler", (DashboardHandler,), {"store": store})
+    server = ThreadingHTTPServer((bind, port), partial(handler, directory=str(directory)))
+    server.daemon_threads = True
+    server.quiet = quiet
+    server.store = store
+    return server
+
+
+# ── Load benchmark ────────────────────────────────────────────────────────────
+
+BENCH_CONCURRENCY = (1, 4, 16)
+
+
+def bench_paths(store: DataStore) -> list[tuple[str, str]]:
+    """(label, path) pairs: what the dashboard fetches today vs the windowed API."""
+    dates = store.refresh().dates.get("workouts") or [date_cls.today().isoformat()]
+    lo = dates[max(0, len(dates) - 30)]
+    return [
+        ("data.json", "/data.json"),
+        ("body_comp?days=30", "/api/body_comp?days=30"),
+        ("body_comp?from&to", f"/api/body_comp?from={lo}&to={dates[-1]}"),
+        ("workouts?from&to", f"/api/workouts?from={lo}&to={dates[-1]}"),
+        ("summary", "/api/summary"),
+    ]
+
+
+def _client(port: int, paths: list[str], n: int, conditional: bool) -> tuple[list, int, int]:
+    """One keep-alive client issuing n requests round-robin; returns (latencies, bytes, 304s)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    etags, lat, nbytes, n304 = {}, [], 0, 0
+    try:
+        for k in range(n):
+            path = paths[k % len(paths)]
+            headers = {"Accept-Encoding": "gzip"}
+            if conditional and path in etags:
+                headers["If-None-Match"] = etags[path]
+            t0 = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            res = conn.getresponse()
+            body = res.read()
+            lat.append(time.perf_counter() - t0)
+            if res.status == 304:
+                n304 += 1
+            elif res.status != 200:
+                raise RuntimeError(f"{path}: HTTP {res.status}")
+            if res.getheader("ETag"):
+                etags[path] = res.getheader("ETag")
+            nbytes += len(body)
+    finally:
+        conn.close()
+    return lat, nbytes, n304
+
+
+def _pct(sorted_lat: list, q: float) -> float:
+    return sorted_lat[min(len(sorted_lat) - 1, int(q * len(sorted_lat)))] * 1000
+
+
+def run_bench(requests: int, data_path: Path) -> None:
+    server = make_server("127.0.0.1", 0, data_path, data_path.parent, quiet=True)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        targets = bench_paths(server.store)
+        print(f"=== serve.py load benchmark ({data_path}, {data_path.stat().st_size / 1024:.0f} KB) ===")
+        print(f"  {requests} requests per client, keep-alive, Accept-Encoding: gzip\n")
+        print(f"  {'endpoint':<20} {'mode':<12} {'clients':>7} {'req/s':>9} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB/req':>8}")
+        for label, path in targets:
+            for conditional in (False, True):
+                for clients in BENCH_CONCURRENCY:
+                    with ThreadPoolExecutor(clients) as pool:
+                        t0 = time.perf_counter()
+                        results = list(pool.map(lambda _: _client(port, [path], requests, conditional),
+                                                range(clients)))
+                        elapsed = time.perf_counter() - t0
+                    lat = sorted(x for r in results for x in r[0])
+                    total_bytes = sum(r[1] for r in results)
+                    mode = "revalidate" if conditional else "full"
+                    print(f"  {label:<20} {mode:<12} {clients:>7} {len(lat) / elapsed:>9.0f} "
+                          f"{_pct(lat, .5):>8.2f} {_pct(lat, .95):>8.2f} {_pct(lat, .99):>8.2f} "
+                          f"{total_bytes / len(lat) / 1024:>8.1f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Serve public/ with a windowed, cacheable JSON API.")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--bind", default="127.0.0.1", help="address to listen on (0.0.0.0 for the LAN)")
+    p.add_argument("--data", type=Path, default=DATA_PATH, help="data.json to serve (default: public/data.json)")
+    p.add_argument("--quiet", action="store_true", help="don't log requests")
+    p.add_argument("--bench", action="store_true",
+                   help="run the concurrent-request load benchmark on a throwaway port and exit")
+    p.add_argument("--requests", type=int, default=200, help="with --bench: requests per client")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.bench:
+        run_bench(args.requests, args.data)
+        return
+    server = make_server(args.bind, args.port, args.data, args.data.parent, args.quiet)
+    print(f"Serving {args.data.parent}/ and /api on http://{args.bind}:{args.port}/ — Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
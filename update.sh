@@ -18,7 +18,7 @@ echo "Parsing data..."
 uv run python parse.py
 
 echo "Committing and pushing..."
-git add public/data.json workout-config.json
+git add -A public workout-config.json  # data.json, manifest.json, new/pruned patches, shards
 git commit -m "data: $(date +%Y-%m-%d)" --allow-empty
 git push
 